@@ -0,0 +1,214 @@
+"""
+access.py – a user's role on a project, resolved once
+
+Every project-scoped guard asks the same question – is this user the
+project's owner, a member (with which role), or neither – so it is
+answered here with one query (projects LEFT JOIN project_members) and
+reused:
+
+ - within a request: memoized on the request's Session (Session.info)
+ - across requests: a small TTL cache (ACCESS_CACHE_TTL seconds, default 5;
+   0 disables it)
+ - invalidated by ORM flushes that touch a Project or ProjectMember (again
+   on commit); other workers pick a change up within the TTL
+
+Callers keep their own status codes and messages; this module only says
+who the user is to the project.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import and_, event, select
+from sqlalchemy.orm import Session
+
+import models
+
+OWNER = "owner"
+CACHE_TTL = float(os.getenv("ACCESS_CACHE_TTL", "5"))
+CACHE_MAX_ENTRIES = int(os.getenv("ACCESS_CACHE_MAX_ENTRIES", "10000"))
+
+_MEMO_KEY = "access_memo"
+_TASKS_KEY = "access_tasks"
+_CHANGES_KEY = "access_changes"
+
+
+@dataclass(frozen=True)
+class Access:
+    project_id: int
+    owner_id: int
+    role: Optional[str]  # OWNER, the membership role, or None
+
+    @property
+    def is_owner(self) -> bool:
+        return self.role == OWNER
+
+    @property
+    def is_member(self) -> bool:
+        """Owner or any membership – may read the project."""
+        return self.role is not None
+
+
+def _access(project_id: int, owner_id: int, member_role: Optional[str], user_id: int) -> Access:
+    role = OWNER if owner_id == user_id else member_role
+    return Access(project_id=project_id, owner_id=owner_id, role=role)
+
+
+def _member_join(user_id: int):
+    return and_(models.ProjectMember.project_id == models.Project.id,
+                models.ProjectMember.user_id == user_id)
+
+
+# ---------- shared TTL cache ----------
+
+_lock = threading.Lock()
+_cache: "OrderedDict[Tuple[int, int], Tuple[float, Access]]" = OrderedDict()
+_epoch = 0  # bumped by every invalidation; a lookup that raced one is not cached
+_stats = {"hits": 0, "misses": 0, "memo_hits": 0}
+
+
+def _cache_get(key: Tuple[int, int]) -> Optional[Access]:
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return value
+
+
+def _cache_put(key: Tuple[int, int], value: Access, epoch: int) -> None:
+    if CACHE_TTL <= 0:
+        return
+    with _lock:
+        if epoch != _epoch:
+            return
+        _cache[key] = (time.monotonic() + CACHE_TTL, value)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def invalidate(project_ids: Optional[Set[int]] = None) -> None:
+    """Drop cached roles for these projects (all projects if None)."""
+    global _epoch
+    with _lock:
+        _epoch += 1
+        if project_ids is None:
+            _cache.clear()
+            return
+        for key in [k for k in _cache if k[0] in project_ids]:
+            del _cache[key]
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "entries": len(_cache)}
+
+
+# ---------- resolution ----------
+
+def _memo(db: Session) -> Dict[Tuple[int, int], Optional[Access]]:
+    return db.info.setdefault(_MEMO_KEY, {})
+
+
+def for_project(db: Session, user_id: int, project_id: int) -> Optional[Access]:
+    """The user's access to a project, or None if the project does not exist."""
+    memo = _memo(db)
+    key = (project_id, user_id)
+    if key in memo:
+        _count("memo_hits")
+        return memo[key]
+    access = _cache_get(key)
+    if access is not None:
+        _count("hits")
+    else:
+        _count("misses")
+        epoch = _epoch
+        row = db.execute(
+            select(models.Project.owner_id, models.ProjectMember.role)
+            .outerjoin(models.ProjectMember, _member_join(user_id))
+            .where(models.Project.id == project_id)
+        ).first()
+        if row is not None:
+            access = _access(project_id, row.owner_id, row.role, user_id)
+            _cache_put(key, access, epoch)
+    memo[key] = access
+    return access
+
+
+def for_task(db: Session, user_id: int, task_id: int) -> Optional[Access]:
+    """Access to the task's project, or None if the task does not exist.
+
+    Tasks are looked up on every request (they can be deleted at any time);
+    the project's access is cached as a side effect.
+    """
+    tasks = db.info.setdefault(_TASKS_KEY, {})
+    if task_id in tasks:
+        return for_project(db, user_id, tasks[task_id])
+    _count("misses")
+    epoch = _epoch
+    row = db.execute(
+        select(models.Task.project_id, models.Project.owner_id, models.ProjectMember.role)
+        .join(models.Project, models.Project.id == models.Task.project_id)
+        .outerjoin(models.ProjectMember, _member_join(user_id))
+        .where(models.Task.id == task_id)
+    ).first()
+    if row is None:
+        return None
+    tasks[task_id] = row.project_id
+    access = _access(row.project_id, row.owner_id, row.role, user_id)
+    _memo(db)[(row.project_id, user_id)] = access
+    _cache_put((row.project_id, user_id), access, epoch)
+    return access
+
+
+# ---------- ORM change capture ----------
+
+def _capture(session: Session, flush_context) -> None:
+    changed = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.ProjectMember):
+            changed.add(obj.project_id)
+        elif isinstance(obj, models.Project):
+            changed.add(obj.id)
+    if changed:
+        session.info.pop(_MEMO_KEY, None)
+        session.info.setdefault(_CHANGES_KEY, set()).update(changed)
+        invalidate(changed)
+
+
+def _apply_on_commit(session: Session) -> None:
+    changed = session.info.pop(_CHANGES_KEY, None)
+    if changed:
+        # Again: a reader may have cached the pre-commit row in between
+        invalidate(changed)
+
+
+def _discard_on_rollback(session: Session, previous_transaction) -> None:
+    if session.info.pop(_CHANGES_KEY, None):
+        session.info.pop(_MEMO_KEY, None)
+
+
+def install_listeners() -> None:
+    """Invalidate from every ORM session (idempotent)."""
+    if not event.contains(Session, "after_flush", _capture):
+        event.listen(Session, "after_flush", _capture)
+        event.listen(Session, "after_commit", _apply_on_commit)
+        event.listen(Session, "after_soft_rollback", _discard_on_rollback)
+
+
+# On import: any process that caches roles must also invalidate them
+install_listeners()
@@ -0,0 +1,142 @@
+"""Assistant reply cache with in-flight request coalescing.
+
+Replies are keyed by a hash of the system prompt plus the normalized
+conversation. Identical requests that arrive while one is already waiting on
+Gemini share that single upstream call instead of issuing their own. If
+the caller running that call goes away, one of the waiting callers takes
+over and runs it again.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "512"))
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+class _LeaderCancelled(Exception):
+    """Set on a shared call whose leader was cancelled; a follower re-runs it."""
+
+
+class ResponseCache:
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS,
+                 max_entries: int = CACHE_MAX_ENTRIES) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.takeovers = 0
+
+    @staticmethod
+    def key(system_prompt: str, conversation: list) -> str:
+        normalized = [
+            [m["role"], [_normalize(p.get("text", "")) for p in m["parts"]]]
+            for m in conversation
+        ]
+        raw = json.dumps([_normalize(system_prompt), normalized], separators=(",", ":"))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """get() that counts towards the hit rate (for callers that put() later)."""
+        value = self.get(key) if self.enabled else None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get_or_compute(self, key: str,
+                             compute: Callable[[], Awaitable[str]]) -> str:
+        """Cached value, a shared in-flight result, or a fresh compute()."""
+        if not self.enabled:
+            return await compute()
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+        while pending is not None:
+            try:
+                # shield: one follower disconnecting must not cancel the shared call
+                return await asyncio.shield(pending)
+            except _LeaderCancelled:
+                # The first follower to wake finds no call in flight and leads
+                pending = self._inflight.get(key)
+                if pending is None:
+                    self.takeovers += 1
+                    return await self._lead(key, compute)
+        self.misses += 1
+        return await self._lead(key, compute)
+
+    async def _lead(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            # The leader's client went away; a follower takes the call over
+            fut.set_exception(_LeaderCancelled())
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()
+            raise
+        else:
+            fut.set_result(value)
+            self.put(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "takeovers": self.takeovers,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            "ttl_seconds": self.ttl,
+            "max_entries": self.max_entries,
+        }
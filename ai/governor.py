@@ -0,0 +1,291 @@
+"""Upstream governor for Gemini calls.
+
+Wraps each upstream attempt with:
+ - a max-in-flight limit plus a bounded wait queue; waiters give up at their
+   deadline instead of holding the client connection indefinitely
+ - retries with full-jitter exponential backoff on 429 / 5xx / network errors
+ - a circuit breaker that fails fast after consecutive failures and lets a
+   single probe through once the cool-down has passed; a probe that neither
+   succeeds nor fails within the request deadline counts as a failure, and
+   one that is cancelled before upstream answers frees the probe for another
+"""
+
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+import httpx
+
+MAX_IN_FLIGHT = int(os.getenv("AI_MAX_IN_FLIGHT", "8"))
+MAX_QUEUE = int(os.getenv("AI_MAX_QUEUE", "32"))
+QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", "10"))
+REQUEST_DEADLINE = float(os.getenv("AI_REQUEST_DEADLINE", "60"))
+MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "2"))
+BACKOFF_BASE = float(os.getenv("AI_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("AI_BACKOFF_MAX", "8"))
+BREAKER_THRESHOLD = int(os.getenv("AI_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("AI_BREAKER_COOLDOWN", "30"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when the governor refuses or gives up on a call."""
+
+    def __init__(self, reason: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN,
+                 probe_timeout: float = REQUEST_DEADLINE) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_out = False
+        self._probe_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if (self.state == self.HALF_OPEN and self._probe_out
+                and now - self._probe_at >= self.probe_timeout):
+            self.record_failure()  # the probe never reported back
+        if self.state == self.OPEN and now - self.opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+            self._probe_out = False
+        if self.state == self.HALF_OPEN and not self._probe_out:
+            self._probe_out = True
+            self._probe_at = now
+            return True
+        return False
+
+    @property
+    def probing(self) -> bool:
+        """True right after allow() handed out the half-open probe."""
+        return self.state == self.HALF_OPEN and self._probe_out
+
+    def retry_after(self) -> float:
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def abandon_probe(self) -> None:
+        """The half-open probe never reached upstream; let another one try."""
+        if self.state == self.HALF_OPEN:
+            self._probe_out = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_out = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_out = False
+
+
+class UpstreamGovernor:
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, max_queue: int = MAX_QUEUE,
+                 queue_timeout: float = QUEUE_TIMEOUT, deadline: float = REQUEST_DEADLINE,
+                 max_retries: int = MAX_RETRIES) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected_queue_full = 0
+        self.rejected_open = 0
+        self.timed_out = 0
+        self.retries = 0
+        self.calls = 0
+
+    @staticmethod
+    def _retryable(result) -> bool:
+        if isinstance(result, httpx.Response):
+            return result.status_code in RETRYABLE_STATUS
+        return isinstance(result, (httpx.TransportError, asyncio.TimeoutError))
+
+    @staticmethod
+    def _retry_after(res: httpx.Response) -> Optional[float]:
+        try:
+            return float(res.headers.get("retry-after", ""))
+        except ValueError:
+            return None
+
+    async def _acquire(self, deadline_at: float) -> None:
+        if self.waiting >= self.max_queue and self._slots.locked():
+            self.rejected_queue_full += 1
+            raise UpstreamUnavailable("AI request queue is full", retry_after=1.0)
+        self.waiting += 1
+        acquired = False
+        try:
+            timeout = min(self.queue_timeout, deadline_at - time.monotonic())
+            async with asyncio.timeout(max(0.0, timeout)):
+                await self._slots.acquire()
+                acquired = True
+        except TimeoutError:
+            if acquired:
+                self._slots.release()
+            self.timed_out += 1
+            raise UpstreamUnavailable("Timed out waiting for an AI slot", retry_after=1.0)
+        except BaseException:
+            # Cancelled with the permit in hand: hand it back
+            if acquired:
+                self._slots.release()
+            raise
+        finally:
+            self.waiting -= 1
+
+    async def call(self, send: Callable[[float], Awaitable[httpx.Response]]) -> httpx.Response:
+        """Run send(timeout) under the limits; returns the final response.
+
+        Non-retryable responses (e.g. 400) are returned as-is; retryable ones
+        are returned after the last attempt so callers keep their error path.
+        """
+        deadline_at = time.monotonic() + self.deadline
+        self.calls += 1
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.rejected_open += 1
+                raise UpstreamUnavailable("AI upstream is failing; circuit open",
+                                          retry_after=self.breaker.retry_after())
+            probe = self.breaker.probing
+            try:
+                await self._acquire(deadline_at)
+            except BaseException:
+                if probe:
+                    self.breaker.abandon_probe()
+                raise
+            self.in_flight += 1
+            try:
+                remaining = deadline_at - time.monotonic()
+                result = await asyncio.wait_for(send(remaining), timeout=remaining)
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                result = e
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled before upstream answered: no verdict either way
+                if probe:
+                    self.breaker.abandon_probe()
+                raise
+            finally:
+                self.in_flight -= 1
+                self._slots.release()
+
+            if not self._retryable(result):
+                self.breaker.record_success()
+                return result
+            self.breaker.record_failure()
+
+            backoff = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * random.random()
+            if isinstance(result, httpx.Response):
+                backoff = max(backoff, self._retry_after(result) or 0.0)
+            if attempt >= self.max_retries or time.monotonic() + backoff >= deadline_at:
+                if isinstance(result, Exception):
+                    raise UpstreamUnavailable(f"AI upstream error: {result!r}")
+                return result
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(backoff)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator["_Slot"]:
+        """Hold one in-flight slot without retries (streaming responses).
+
+        The caller reports the upstream response with the yielded handle's
+        report() so the breaker learns. Transport errors and timeouts raised
+        inside count as failures; leaving without a report (cancelled, or an
+        error of the caller's own) frees a half-open probe for another call.
+        """
+        if not self.breaker.allow():
+            self.rejected_open += 1
+            raise UpstreamUnavailable("AI upstream is failing; circuit open",
+                                      retry_after=self.breaker.retry_after())
+        probe = self.breaker.probing
+        try:
+            await self._acquire(time.monotonic() + self.deadline)
+        except BaseException:
+            if probe:
+                self.breaker.abandon_probe()
+            raise
+        self.calls += 1
+        self.in_flight += 1
+        handle = _Slot(self)
+        try:
+            yield handle
+        except BaseException as e:
+            if self._retryable(e):
+                self.breaker.record_failure()
+            elif probe and not handle.reported:
+                self.breaker.abandon_probe()
+            raise
+        else:
+            if probe and not handle.reported:
+                self.breaker.abandon_probe()
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def report(self, result) -> None:
+        if self._retryable(result):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def snapshot(self) -> dict:
+        b = self.breaker
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "calls": self.calls,
+            "retries": self.retries,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_circuit_open": self.rejected_open,
+            "queue_timeouts": self.timed_out,
+            "breaker": {
+                "state": b.state,
+                "consecutive_failures": b.failures,
+                "trips": b.trips,
+                "retry_after_seconds": round(b.retry_after(), 1) if b.state != b.CLOSED else 0.0,
+            },
+        }
+
+
+class _Slot:
+    """Handle yielded by UpstreamGovernor.slot()."""
+
+    __slots__ = ("governor", "reported")
+
+    def __init__(self, governor: UpstreamGovernor) -> None:
+        self.governor = governor
+        self.reported = False
+
+    def report(self, result) -> None:
+        self.reported = True
+        self.governor.report(result)
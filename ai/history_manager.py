@@ -1,28 +1,234 @@
-from collections import defaultdict
-from typing import List, Dict
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+
+log = logging.getLogger("teamsync.ai")
+
+MAX_CONVERSATIONS = int(os.getenv("AI_HISTORY_MAX_CONVERSATIONS", "1000"))
+IDLE_TTL_SECONDS = float(os.getenv("AI_HISTORY_IDLE_TTL", "3600"))
+TOKEN_BUDGET = int(os.getenv("AI_HISTORY_TOKEN_BUDGET", "4000"))
+SUMMARY_SNIPPET_CHARS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars per token, plus per-message overhead)."""
+    return len(text) // 4 + 4
+
+
+class _Conversation:
+    __slots__ = ("messages", "summary", "tokens", "last_used")
+
+    def __init__(self) -> None:
+        self.messages: List[dict] = []
+        self.summary = ""
+        self.tokens = 0
+        self.last_used = time.monotonic()
 
 
 class HistoryManager:
-    """Simple in-memory per-user conversation history manager.
+    """Bounded per-user conversation history manager.
 
     Each message is stored in the Gemini-compatible format:
     {"role": <"user"|"model"|"system">, "parts": [{"text": <str>}]}
 
-    Note: This is process-local and not persistent. Consider replacing with
-    a DB/Redis-backed implementation for production or multiple workers.
+    Memory stays flat: conversations are kept in LRU order, dropped after
+    IDLE_TTL_SECONDS of inactivity or beyond MAX_CONVERSATIONS, and each one
+    is held to TOKEN_BUDGET by folding its oldest turns into a short running
+    summary (see get_summary). An optional store (DBHistoryStore) persists
+    turns so evicted conversations – or ones started on another worker – can
+    be reloaded.
     """
 
-    def __init__(self) -> None:
-        self.histories: Dict[str, List[dict]] = defaultdict(list)
+    def __init__(self, max_conversations: int = MAX_CONVERSATIONS,
+                 idle_ttl: float = IDLE_TTL_SECONDS,
+                 token_budget: int = TOKEN_BUDGET,
+                 store: Optional["DBHistoryStore"] = None) -> None:
+        self.histories: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+        self.token_budget = token_budget
+        self.store = store
+
+    def _evict_idle(self) -> None:
+        # LRU order is also last-used order, so idle entries sit at the front
+        cutoff = time.monotonic() - self.idle_ttl
+        while self.histories:
+            user_id, conv = next(iter(self.histories.items()))
+            if conv.last_used >= cutoff and len(self.histories) <= self.max_conversations:
+                break
+            self.histories.popitem(last=False)
+
+    def _install(self, user_id: str, summary: str, messages: List[dict]) -> _Conversation:
+        conv = _Conversation()
+        conv.summary = summary
+        for msg in messages:
+            conv.messages.append(msg)
+            conv.tokens += estimate_tokens(msg["parts"][0]["text"])
+        self.histories[user_id] = conv
+        return conv
+
+    async def _get(self, user_id: str) -> _Conversation:
+        conv = self.histories.get(user_id)
+        if conv is None and self.store is not None:
+            # Persisted turns load on the store's thread, never on the event loop
+            summary, messages = await self.store.load_async(user_id, self.token_budget)
+            conv = self.histories.get(user_id)  # another request may have loaded it meanwhile
+            if conv is None:
+                conv = self._install(user_id, summary, messages)
+        elif conv is None:
+            conv = self._install(user_id, "", [])
+        self.histories.move_to_end(user_id)
+        conv.last_used = time.monotonic()
+        self._evict_idle()
+        return conv
 
-    def add_message(self, user_id: str, role: str, text: str) -> None:
+    def _trim(self, user_id: str, conv: _Conversation) -> None:
+        """Fold the oldest turns into the summary until within budget."""
+        folded = []
+        while conv.tokens > self.token_budget and len(conv.messages) > 1:
+            msg = conv.messages.pop(0)
+            text = msg["parts"][0]["text"]
+            conv.tokens -= estimate_tokens(text)
+            folded.append(f"{msg['role']}: {text[:SUMMARY_SNIPPET_CHARS]}")
+        # Gemini expects the conversation to open with a user turn
+        while conv.messages and conv.messages[0]["role"] != "user":
+            msg = conv.messages.pop(0)
+            text = msg["parts"][0]["text"]
+            conv.tokens -= estimate_tokens(text)
+            folded.append(f"{msg['role']}: {text[:SUMMARY_SNIPPET_CHARS]}")
+        if not folded:
+            return
+        summary = "\n".join(filter(None, [conv.summary, *folded]))
+        # token_budget chars ~ a quarter of the token budget (~4 chars per token); newest lines last
+        max_chars = self.token_budget
+        conv.summary = summary[-max_chars:]
+        if self.store is not None:
+            # Folded turns live on in the summary only; a reload must not bring them back
+            self.store.save_summary(user_id, conv.summary, keep=len(conv.messages))
+
+    async def add_message(self, user_id: str, role: str, text: str) -> None:
         """Store a message for the given user in Gemini format."""
-        self.histories[user_id].append({"role": role, "parts": [{"text": text}]})
+        conv = await self._get(user_id)
+        conv.messages.append({"role": role, "parts": [{"text": text}]})
+        conv.tokens += estimate_tokens(text)
+        if self.store is not None:
+            self.store.append(user_id, role, text)
+        self._trim(user_id, conv)
 
-    def get_history(self, user_id: str) -> List[dict]:
+    async def get_history(self, user_id: str) -> List[dict]:
         """Return the conversation history for a user (empty list if none)."""
-        return self.histories[user_id]
+        return (await self._get(user_id)).messages
+
+    async def get_summary(self, user_id: str) -> str:
+        """Condensed text of turns trimmed from the history ("" if none)."""
+        return (await self._get(user_id)).summary
 
     def clear_history(self, user_id: str) -> None:
         """Clear a user's conversation history."""
-        self.histories[user_id] = []
+        self.histories.pop(user_id, None)
+        if self.store is not None:
+            self.store.clear(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "conversations": len(self.histories),
+            "messages": sum(len(c.messages) for c in self.histories.values()),
+            "tokens": sum(c.tokens for c in self.histories.values()),
+        }
+
+
+class DBHistoryStore:
+    """Persists turns in assistant_messages (enable with AI_HISTORY_BACKEND=db).
+
+    Writes and loads share a single background thread, so they run in order
+    (a load sees every turn queued before it) and never on the event loop.
+    """
+
+    SUMMARY_ROLE = "summary"
+
+    def __init__(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-history")
+
+    def _session(self):
+        from database import SessionLocal  # local import keeps ai/ free of app wiring
+        return SessionLocal()
+
+    def _write(self, fn) -> None:
+        db = self._session()
+        try:
+            fn(db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            log.warning("History persistence failed: %s", e)
+        finally:
+            db.close()
+
+    def append(self, conversation_id: str, role: str, text: str) -> None:
+        from models import AssistantMessage
+        self._executor.submit(self._write, lambda db: db.add(AssistantMessage(
+            conversation_id=conversation_id, role=role, content=text
+        )))
+
+    def save_summary(self, conversation_id: str, summary: str, keep: int) -> None:
+        """Replace the summary and drop all but the newest `keep` turns."""
+        from models import AssistantMessage
+
+        def write(db):
+            turns = db.query(AssistantMessage).filter(
+                AssistantMessage.conversation_id == conversation_id,
+                AssistantMessage.role != self.SUMMARY_ROLE,
+            )
+            if keep > 0:
+                # Runs after the append queued before it, so the newest rows are the kept turns
+                oldest_kept = turns.with_entities(AssistantMessage.id).order_by(
+                    AssistantMessage.id.desc()
+                ).offset(keep - 1).limit(1).scalar()
+                turns = turns.filter(AssistantMessage.id < (oldest_kept or 0))
+            turns.delete(synchronize_session=False)
+            db.query(AssistantMessage).filter_by(
+                conversation_id=conversation_id, role=self.SUMMARY_ROLE
+            ).delete()
+            db.add(AssistantMessage(
+                conversation_id=conversation_id, role=self.SUMMARY_ROLE, content=summary
+            ))
+        self._executor.submit(self._write, write)
+
+    def clear(self, conversation_id: str) -> None:
+        from models import AssistantMessage
+        self._executor.submit(self._write, lambda db: db.query(AssistantMessage).filter_by(
+            conversation_id=conversation_id
+        ).delete())
+
+    async def load_async(self, conversation_id: str, token_budget: int):
+        """Return (summary, newest messages that fit the budget, oldest first)."""
+        return await asyncio.wrap_future(
+            self._executor.submit(self._load, conversation_id, token_budget)
+        )
+
+    def _load(self, conversation_id: str, token_budget: int):
+        from models import AssistantMessage
+        db = self._session()
+        try:
+            rows = db.query(AssistantMessage.role, AssistantMessage.content).filter(
+                AssistantMessage.conversation_id == conversation_id
+            ).order_by(AssistantMessage.id.desc()).limit(200).all()
+        finally:
+            db.close()
+        summary, messages, tokens, full = "", [], 0, False
+        for role, content in rows:
+            if role == self.SUMMARY_ROLE:
+                summary = summary or content
+                continue
+            tokens += estimate_tokens(content)
+            full = full or tokens > token_budget
+            if not full:
+                messages.append({"role": role, "parts": [{"text": content}]})
+        messages.reverse()
+        while messages and messages[0]["role"] != "user":
+            messages.pop(0)
+        return summary, messages
@@ -0,0 +1,142 @@
+"""App-lifetime pooled HTTP client for upstream AI calls.
+
+One httpx.AsyncClient is created at startup and closed at shutdown, so
+requests reuse keep-alive (and HTTP/2 when `h2` is installed) connections
+instead of paying TCP + TLS setup per call.
+"""
+
+import os
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("AI_READ_TIMEOUT", "90"))
+MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.getenv("AI_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("AI_KEEPALIVE_EXPIRY", "30"))
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class UpstreamStats:
+    """Latency / outcome counters for upstream calls (event loop only)."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.latency_seconds_total = 0.0
+        self.latency_seconds_max = 0.0
+        self.status_counts: Dict[int, int] = {}
+
+    def observe(self, seconds: float, status: Optional[int]) -> None:
+        self.requests += 1
+        self.latency_seconds_total += seconds
+        self.latency_seconds_max = max(self.latency_seconds_max, seconds)
+        if status is None:
+            self.errors += 1
+        else:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+
+_client: Optional[httpx.AsyncClient] = None
+stats = UpstreamStats()
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=_http2_available(),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+async def startup() -> None:
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def shutdown() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def timeout_within(remaining: float) -> httpx.Timeout:
+    """Per-request timeout that never outlives a caller's deadline."""
+    return httpx.Timeout(max(0.1, min(READ_TIMEOUT, remaining)),
+                         connect=min(CONNECT_TIMEOUT, max(0.1, remaining)))
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared client; created lazily if the startup hook has not run."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    """POST through the shared pool, recording latency and status."""
+    started = perf_counter()
+    status = None
+    stats.in_flight += 1
+    try:
+        res = await get_client().post(url, **kwargs)
+        status = res.status_code
+        return res
+    finally:
+        stats.in_flight -= 1
+        stats.observe(perf_counter() - started, status)
+
+
+@asynccontextmanager
+async def stream(method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+    """Streaming request through the shared pool; latency covers the full body."""
+    started = perf_counter()
+    status = None
+    stats.in_flight += 1
+    try:
+        async with get_client().stream(method, url, **kwargs) as res:
+            status = res.status_code
+            yield res
+    finally:
+        stats.in_flight -= 1
+        stats.observe(perf_counter() - started, status)
+
+
+def snapshot() -> dict:
+    pool = {"max_connections": MAX_CONNECTIONS, "max_keepalive": MAX_KEEPALIVE}
+    if _client is not None:
+        # httpcore's pool exposes its live connections
+        conns = getattr(getattr(_client._transport, "_pool", None), "connections", [])
+        pool.update(
+            http2=_http2_available(),
+            open=len(conns),
+            idle=sum(1 for c in conns if c.is_idle()),
+        )
+    s = stats
+    return {
+        "requests": s.requests,
+        "errors": s.errors,
+        "in_flight": s.in_flight,
+        "latency_ms_avg": round(1000 * s.latency_seconds_total / s.requests, 1) if s.requests else 0.0,
+        "latency_ms_max": round(1000 * s.latency_seconds_max, 1),
+        "status_counts": {str(k): v for k, v in sorted(s.status_counts.items())},
+        "pool": pool,
+    }
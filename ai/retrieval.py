@@ -0,0 +1,328 @@
+"""Project-aware BM25 retrieval for grounding the assistant.
+
+Task titles/descriptions and comments are indexed per project in memory.
+A project's index is built from the DB the first time it is searched and then
+kept current from ORM flushes (applied on commit), so /ai/chat can inject the
+top-k matching snippets instead of whole projects. One thread builds a given
+project at a time; a build that a commit may have raced is redone.
+"""
+
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, or_
+from sqlalchemy.orm import Session
+
+TOP_K = int(os.getenv("AI_RETRIEVAL_TOP_K", "5"))
+MAX_INDEXED_PROJECTS = int(os.getenv("AI_RETRIEVAL_MAX_PROJECTS", "200"))
+SNIPPET_CHARS = 300
+BUILD_ATTEMPTS = 3
+
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+_TOKEN_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it of on or our that the this "
+    "to was we what when where which who why with you your".split()
+)
+
+DocKey = Tuple[str, int]  # ("task" | "comment", id)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower())
+            if len(t) > 1 and t not in _STOPWORDS]
+
+
+class ProjectIndex:
+    """Incremental BM25 postings for one project."""
+
+    def __init__(self) -> None:
+        self.postings: Dict[str, Dict[DocKey, int]] = {}
+        self.doc_terms: Dict[DocKey, Counter] = {}
+        self.doc_len: Dict[DocKey, int] = {}
+        self.doc_text: Dict[DocKey, str] = {}
+        self.doc_task: Dict[DocKey, int] = {}
+        self.total_len = 0
+
+    def add(self, key: DocKey, task_id: int, text: str) -> None:
+        self.remove(key)
+        terms = Counter(tokenize(text))
+        if not terms:
+            return
+        self.doc_terms[key] = terms
+        self.doc_text[key] = text
+        self.doc_task[key] = task_id
+        self.doc_len[key] = sum(terms.values())
+        self.total_len += self.doc_len[key]
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[key] = tf
+
+    def remove(self, key: DocKey) -> None:
+        terms = self.doc_terms.pop(key, None)
+        if terms is None:
+            return
+        self.doc_text.pop(key, None)
+        self.doc_task.pop(key, None)
+        self.total_len -= self.doc_len.pop(key)
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(key, None)
+                if not docs:
+                    del self.postings[term]
+
+    def remove_task(self, task_id: int) -> None:
+        for key in [k for k, t in self.doc_task.items() if t == task_id]:
+            self.remove(key)
+
+    def search(self, query_terms: Iterable[str], k: int) -> List[Tuple[float, DocKey]]:
+        n = len(self.doc_terms)
+        if not n:
+            return []
+        avg_len = self.total_len / n
+        scores: Dict[DocKey, float] = {}
+        for term in set(query_terms):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for key, tf in docs.items():
+                dl = self.doc_len[key]
+                norm = tf * (_BM25_K1 + 1) / (tf + _BM25_K1 * (1 - _BM25_B + _BM25_B * dl / avg_len))
+                scores[key] = scores.get(key, 0.0) + idf * norm
+        return sorted(((s, key) for key, s in scores.items()), reverse=True)[:k]
+
+
+class RetrievalIndex:
+    """Per-project indexes, lazily built and bounded in LRU order."""
+
+    def __init__(self, max_projects: int = MAX_INDEXED_PROJECTS) -> None:
+        self.max_projects = max_projects
+        self.projects: "OrderedDict[int, ProjectIndex]" = OrderedDict()
+        self.task_project: Dict[int, int] = {}
+        self._lock = threading.RLock()
+        self._build_locks: Dict[int, threading.Lock] = {}
+        self._building: Set[int] = set()
+        self._stale: Set[int] = set()  # builds a commit or invalidate() raced
+
+    # ----- building -----
+
+    def _build(self, db: Session, project_id: int) -> ProjectIndex:
+        import models
+        idx = ProjectIndex()
+        tasks = db.query(models.Task.id, models.Task.title, models.Task.description).filter(
+            models.Task.project_id == project_id
+        ).all()
+        for tid, title, desc in tasks:
+            idx.add(("task", tid), tid, _task_text(title, desc))
+        comments = db.query(models.Comment.id, models.Comment.task_id, models.Comment.content).join(
+            models.Task, models.Comment.task_id == models.Task.id
+        ).filter(models.Task.project_id == project_id).all()
+        for cid, tid, content in comments:
+            idx.add(("comment", cid), tid, content)
+        return idx
+
+    def ensure(self, db: Session, project_id: int) -> ProjectIndex:
+        with self._lock:
+            idx = self.projects.get(project_id)
+            if idx is not None:
+                self.projects.move_to_end(project_id)
+                return idx
+            build_lock = self._build_locks.setdefault(project_id, threading.Lock())
+        with build_lock:
+            for _ in range(BUILD_ATTEMPTS):
+                with self._lock:
+                    cached = self.projects.get(project_id)
+                    if cached is not None:  # built by another thread meanwhile
+                        return cached
+                    self._stale.discard(project_id)
+                    self._building.add(project_id)
+                try:
+                    idx = self._build(db, project_id)
+                finally:
+                    with self._lock:
+                        self._building.discard(project_id)
+                with self._lock:
+                    if project_id in self._stale:
+                        continue  # a commit landed mid-build; its change may be missing
+                    self.projects[project_id] = idx
+                    self._build_locks.pop(project_id, None)
+                    for tid in set(idx.doc_task.values()):
+                        self.task_project[tid] = project_id
+                    while len(self.projects) > self.max_projects:
+                        self.invalidate(next(iter(self.projects)))
+                    return idx
+        # Still changing under every build: answer from the last one, uncached
+        return idx
+
+    def invalidate(self, project_id: Optional[int] = None) -> None:
+        """Drop one project's index (or all); it is rebuilt on next search."""
+        with self._lock:
+            if project_id is None:
+                self.projects.clear()
+                self.task_project.clear()
+                self._stale.update(self._building)
+                return
+            if project_id in self._building:
+                self._stale.add(project_id)
+            self.projects.pop(project_id, None)
+            for tid in [t for t, p in self.task_project.items() if p == project_id]:
+                del self.task_project[tid]
+
+    # ----- incremental updates -----
+
+    def apply(self, changes: List[tuple]) -> None:
+        """Apply (op, kind, id, task_id, project_id, text) tuples from a commit.
+
+        op is upsert, delete or moved (a task now in project_id).
+        """
+        with self._lock:
+            for op, kind, doc_id, task_id, project_id, text in changes:
+                if kind == "task":
+                    previous = self.task_project.get(doc_id)
+                    if op == "upsert" and previous is not None and project_id not in (None, previous):
+                        # Moved, but the flush did not see the old value (it
+                        # was expired): same as a "delete" + "moved" pair
+                        old_idx = self.projects.get(previous)
+                        if old_idx is not None:
+                            old_idx.remove_task(doc_id)
+                        del self.task_project[doc_id]
+                        op = "moved"
+                    project_id = project_id or previous
+                else:
+                    project_id = self.task_project.get(task_id)
+                if self._building:
+                    # A comment on an unindexed task could belong to any build
+                    self._stale.update(self._building if project_id is None
+                                       else self._building & {project_id})
+                if op == "moved":
+                    # Its comments are not in the change list: rebuild lazily
+                    self.invalidate(project_id)
+                    continue
+                idx = self.projects.get(project_id)
+                if idx is None:
+                    continue  # not indexed yet – built fresh on first search
+                if op == "delete":
+                    if kind == "task":
+                        idx.remove_task(doc_id)
+                        self.task_project.pop(doc_id, None)
+                    else:
+                        idx.remove((kind, doc_id))
+                else:
+                    idx.add((kind, doc_id), task_id, text)
+                    if kind == "task":
+                        self.task_project[doc_id] = project_id
+
+    # ----- search -----
+
+    def search(self, db: Session, project_ids: Iterable[int], query: str,
+               k: int = TOP_K) -> List[dict]:
+        import models
+        terms = tokenize(query)
+        if not terms:
+            return []
+        hits = []
+        for pid in project_ids:
+            idx = self.ensure(db, pid)
+            with self._lock:
+                hits.extend((score, pid, key, idx.doc_text[key], idx.doc_task[key])
+                            for score, key in idx.search(terms, k))
+        hits.sort(key=lambda h: h[0], reverse=True)
+        hits = hits[:k]
+        titles = dict(db.query(models.Task.id, models.Task.title).filter(
+            models.Task.id.in_({h[4] for h in hits})
+        ).all()) if hits else {}
+        return [
+            {"project_id": pid, "kind": key[0], "id": key[1], "task_id": tid,
+             "task_title": titles.get(tid, ""), "text": text[:SNIPPET_CHARS],
+             "score": round(score, 3)}
+            for score, pid, key, text, tid in hits
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "projects": len(self.projects),
+                "documents": sum(len(i.doc_terms) for i in self.projects.values()),
+                "terms": sum(len(i.postings) for i in self.projects.values()),
+            }
+
+
+def _task_text(title: Optional[str], description: Optional[str]) -> str:
+    return f"{title or ''}\n{description or ''}".strip()
+
+
+index = RetrievalIndex()
+
+
+def accessible_project_ids(db: Session, user_id: int) -> List[int]:
+    import models
+    return [pid for (pid,) in db.query(models.Project.id).outerjoin(
+        models.ProjectMember,
+        (models.ProjectMember.project_id == models.Project.id)
+        & (models.ProjectMember.user_id == user_id)
+    ).filter(or_(
+        models.Project.owner_id == user_id,
+        models.ProjectMember.id.isnot(None)
+    )).distinct().all()]
+
+
+def format_context(snippets: List[dict]) -> str:
+    lines = []
+    for s in snippets:
+        label = "Task" if s["kind"] == "task" else "Comment on task"
+        lines.append(f"- [{label} #{s['task_id']} \"{s['task_title']}\", project {s['project_id']}] "
+                     + " ".join(s["text"].split()))
+    return "\n".join(lines)
+
+
+# ---------- ORM change capture ----------
+
+_CHANGES_KEY = "retrieval_changes"
+
+
+def _capture(session: Session, flush_context) -> None:
+    import models
+    changes = session.info.setdefault(_CHANGES_KEY, [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, models.Task):
+            moved_from = [p for p in inspect(obj).attrs.project_id.history.deleted
+                          if p is not None and p != obj.project_id]
+            if moved_from:
+                # Out of the old project's index (with its comments), and the
+                # new project's index is rebuilt to pick the comments up
+                changes.append(("delete", "task", obj.id, obj.id, moved_from[0], ""))
+                changes.append(("moved", "task", obj.id, obj.id, obj.project_id, ""))
+                continue
+            changes.append(("upsert", "task", obj.id, obj.id, obj.project_id,
+                            _task_text(obj.title, obj.description)))
+        elif isinstance(obj, models.Comment):
+            changes.append(("upsert", "comment", obj.id, obj.task_id, None, obj.content))
+    for obj in session.deleted:
+        if isinstance(obj, models.Task):
+            changes.append(("delete", "task", obj.id, obj.id, obj.project_id, ""))
+        elif isinstance(obj, models.Comment):
+            changes.append(("delete", "comment", obj.id, obj.task_id, None, ""))
+
+
+def _apply_on_commit(session: Session) -> None:
+    changes = session.info.pop(_CHANGES_KEY, None)
+    if changes:
+        index.apply(changes)
+
+
+def _discard_on_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(_CHANGES_KEY, None)
+
+
+def install_listeners() -> None:
+    """Keep indexes current from every ORM session (idempotent)."""
+    if not event.contains(Session, "after_flush", _capture):
+        event.listen(Session, "after_flush", _capture)
+        event.listen(Session, "after_commit", _apply_on_commit)
+        event.listen(Session, "after_soft_rollback", _discard_on_rollback)
@@ -0,0 +1,164 @@
+"""Map-reduce project summaries.
+
+A project's tasks (with their comments) are split, in task id order, into
+segments that end at anchor tasks – picked by a hash of the task id, about
+one in AI_SUMMARY_ANCHOR_TASKS – and each segment is packed into chunks that
+fit one prompt. Chunks are summarized concurrently (bounded), then the
+partial summaries are reduced into one. Partial summaries are cached by chunk
+content hash; since segment boundaries do not depend on task sizes, a new
+comment re-summarizes only the chunks of that task's segment, and new tasks
+only the last segment. The final summary is cached by the hash of all chunks,
+which changes exactly when the project's tasks or comments do.
+"""
+
+import asyncio
+import hashlib
+import os
+from typing import Awaitable, Callable, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from ai.cache import ResponseCache
+from ai.history_manager import estimate_tokens
+
+CHUNK_TOKENS = int(os.getenv("AI_SUMMARY_CHUNK_TOKENS", "3000"))
+ANCHOR_TASKS = int(os.getenv("AI_SUMMARY_ANCHOR_TASKS", "12"))
+CONCURRENCY = int(os.getenv("AI_SUMMARY_CONCURRENCY", "4"))
+SUMMARY_TTL = float(os.getenv("AI_SUMMARY_TTL", "86400"))
+MAX_COMMENT_CHARS = 1000
+
+MAP_PROMPT = (
+    "Summarize the activity in these project tasks and comments. Note progress, "
+    "decisions, blockers and open questions. Use at most 8 short bullet points."
+)
+REDUCE_PROMPT = (
+    "Combine these partial summaries of one project into a single summary: overall "
+    "status, key progress, blockers / risks and next steps. Be concise."
+)
+
+# prompt text -> reply text
+Generate = Callable[[str, str], Awaitable[str]]
+
+chunk_cache = ResponseCache(ttl=SUMMARY_TTL, max_entries=4096)
+summary_cache = ResponseCache(ttl=SUMMARY_TTL, max_entries=512)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _is_anchor(task_id: int, every: int) -> bool:
+    """Segment boundary after this task; stable as other tasks change."""
+    return int(_hash(f"task:{task_id}")[:8], 16) % max(1, every) == 0
+
+
+def _task_block(task, comments: List[Tuple[int, str]]) -> List[str]:
+    """Lines for one task; long comment threads may span several chunks."""
+    tid, title, desc, status = task
+    lines = [f"Task #{tid} [{status}] {title}"]
+    if desc:
+        lines.append(f"  Description: {' '.join(desc.split())}")
+    for _, content in comments:
+        lines.append(f"  - {' '.join(content.split())[:MAX_COMMENT_CHARS]}")
+    return lines
+
+
+def build_chunks(db: Session, project_id: int, budget: int = CHUNK_TOKENS,
+                 anchor_every: int = ANCHOR_TASKS) -> List[str]:
+    import models
+    tasks = db.query(models.Task.id, models.Task.title, models.Task.description,
+                     models.Task.status).filter(
+        models.Task.project_id == project_id
+    ).order_by(models.Task.id).all()
+    comments = {}
+    for tid, cid, content in db.query(models.Comment.task_id, models.Comment.id,
+                                      models.Comment.content).join(
+        models.Task, models.Comment.task_id == models.Task.id
+    ).filter(models.Task.project_id == project_id).order_by(models.Comment.id):
+        comments.setdefault(tid, []).append((cid, content))
+
+    # Packing restarts at every anchor, so growth in one task can only move
+    # chunk boundaries up to the end of its own segment.
+    chunks, current, used = [], [], 0
+    for task in tasks:
+        lines = _task_block(task, comments.get(task[0], []))
+        costs = [estimate_tokens(line) for line in lines]
+        if current and used + sum(costs) > budget:
+            chunks.append("\n".join(current))
+            current, used = [], 0
+        for line, cost in zip(lines, costs):
+            if current and used + cost > budget:  # a single oversized thread
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(line)
+            used += cost
+        if _is_anchor(task[0], anchor_every) and current:
+            chunks.append("\n".join(current))
+            current, used = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+async def _bounded_gather(jobs: List[Callable[[], Awaitable[str]]], limit: int) -> List[str]:
+    sem = asyncio.Semaphore(max(1, limit))
+
+    async def run(job):
+        async with sem:
+            return await job()
+
+    return await asyncio.gather(*(run(job) for job in jobs))
+
+
+def _pack(items: List[str], budget: int) -> List[List[str]]:
+    """Group items up to ~budget tokens, at least two per group so folding shrinks."""
+    groups, current, used = [], [], 0
+    for item in items:
+        cost = estimate_tokens(item)
+        if len(current) >= 2 and used + cost > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def _reduce(generate: Generate, partials: List[str], budget: int) -> str:
+    """Fold partial summaries, a prompt-sized group at a time, until one remains."""
+    while len(partials) > 1:
+        groups = _pack(partials, budget)
+        partials = await _bounded_gather(
+            [lambda g=g: generate(REDUCE_PROMPT, "\n\n".join(g)) for g in groups], CONCURRENCY
+        )
+    return partials[0]
+
+
+async def summarize(chunks: List[str], generate: Generate,
+                    project_id: int) -> Tuple[str, dict]:
+    """Summary for the given chunks plus stats on how much was reused."""
+    stats = {"chunks": len(chunks), "chunks_summarized": 0, "cached": False}
+    if not chunks:
+        return "This project has no tasks yet.", stats
+    hashes = [_hash(c) for c in chunks]
+    version = _hash(f"{project_id}:" + ",".join(hashes))
+
+    async def map_one(chunk: str, key: str) -> str:
+        async def fresh() -> str:
+            stats["chunks_summarized"] += 1
+            return await generate(MAP_PROMPT, chunk)
+        return await chunk_cache.get_or_compute(key, fresh)
+
+    async def compute() -> str:
+        partials = await _bounded_gather(
+            [lambda c=c, h=h: map_one(c, h) for c, h in zip(chunks, hashes)], CONCURRENCY
+        )
+        return await _reduce(generate, partials, CHUNK_TOKENS)
+
+    stats["cached"] = summary_cache.get(version) is not None
+    return await summary_cache.get_or_compute(version, compute), stats
+
+
+def cache_stats() -> dict:
+    return {"chunks": chunk_cache.stats(), "summaries": summary_cache.stats()}
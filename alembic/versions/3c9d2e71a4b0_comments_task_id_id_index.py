@@ -0,0 +1,28 @@
+"""comments (task_id, id) index
+
+Revision ID: 3c9d2e71a4b0
+Revises: fa8b04136c39
+Create Date: 2026-10-19 10:12:41.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d2e71a4b0'
+down_revision: Union[str, Sequence[str], None] = 'fa8b04136c39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_comments_task_id_id', 'comments', ['task_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_comments_task_id_id', table_name='comments')
@@ -0,0 +1,196 @@
+"""
+assets.py – fingerprinted static assets with immutable caching
+
+build() copies every file under static/ to static/dist/ under a
+content-hashed name (js/auth.js -> js/auth.3f9c2a1b7e.js), writes .gz and
+(if the Brotli package is installed) .br siblings for text assets, and
+records the mapping in static/dist/manifest.json. It runs at startup and
+only writes files whose hash is new, or ahead of time:
+
+    python assets.py
+
+Every file is written to a temp name and renamed into place, so workers
+building at the same time never serve or read a half-written file. Hashed
+files referenced by neither the new nor the previous manifest are deleted
+(the previous generation stays for pages rendered before a deploy).
+
+Templates link assets with `{{ asset_url('js/auth.js') }}`. A hashed URL
+changes whenever the content does, so HashedStaticFiles serves /static/dist/
+with `Cache-Control: public, max-age=31536000, immutable` (browsers never
+revalidate) and everything else under /static with `no-cache` (revalidate
+via ETag). Either way the precompressed variant matching Accept-Encoding is
+sent when one exists.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+from typing import Dict, Optional
+
+from starlette.staticfiles import StaticFiles
+
+from compression import brotli, parse_accept_encoding
+
+log = logging.getLogger("teamsync.assets")
+
+STATIC_DIR = "static"
+DIST = "dist"
+HASH_LENGTH = 10
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = (".js", ".css", ".svg", ".json", ".html", ".txt", ".map")
+
+_manifest: Dict[str, str] = {}
+
+
+def _digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            h.update(block)
+    return h.hexdigest()[:HASH_LENGTH]
+
+
+def _hashed_name(rel: str, digest: str) -> str:
+    stem, ext = os.path.splitext(rel)
+    return f"{stem}.{digest}{ext}"
+
+
+def _tmp_path(path: str) -> str:
+    return f"{path}.{os.getpid()}.tmp"
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = _tmp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _write_variants(path: str) -> None:
+    with open(path, "rb") as f:
+        data = f.read()
+    variants = {".gz": lambda: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = lambda: brotli.compress(data, quality=11)
+    for suffix, make in variants.items():
+        if os.path.exists(path + suffix):
+            continue
+        packed = make()
+        if len(packed) < len(data):
+            _write_atomic(path + suffix, packed)
+
+
+def _read_manifest(dist: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(dist, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _prune(dist: str, keep: set) -> int:
+    """Delete hashed files (and variants) not in `keep`; returns the count."""
+    removed = 0
+    for root, _, files in os.walk(dist):
+        for name in files:
+            if name == "manifest.json" or name.endswith(".tmp"):  # .tmp: another worker mid-write
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, dist).replace(os.sep, "/")
+            if rel.endswith((".gz", ".br")):
+                rel = rel[:-3]
+            if rel not in keep:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+    return removed
+
+
+def build(static_dir: str = STATIC_DIR) -> Dict[str, str]:
+    """Hash, copy and precompress static files; returns and installs the manifest."""
+    dist = os.path.join(static_dir, DIST)
+    previous = _read_manifest(dist)
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == os.path.abspath(static_dir) and DIST in dirs:
+            dirs.remove(DIST)
+        for name in files:
+            if name.startswith(".") or name.endswith((".gz", ".br")):
+                continue
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, static_dir).replace(os.sep, "/")
+            hashed = _hashed_name(rel, _digest(src))
+            target = os.path.join(dist, hashed)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(src, _tmp_path(target))
+                os.replace(_tmp_path(target), target)
+            if name.endswith(COMPRESSIBLE):
+                _write_variants(target)
+            manifest[rel] = hashed
+    os.makedirs(dist, exist_ok=True)
+    _write_atomic(os.path.join(dist, "manifest.json"),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode())
+    removed = _prune(dist, set(manifest.values()) | set(previous.values()))
+    _manifest.clear()
+    _manifest.update(manifest)
+    log.info("Static manifest: %d assets (%d stale files removed)", len(manifest), removed)
+    return manifest
+
+
+def asset_url(path: str) -> str:
+    """Fingerprinted URL for a file under static/ (plain URL if unknown)."""
+    hashed = _manifest.get(path)
+    if hashed is None:
+        return f"/static/{path}"
+    return f"/static/{DIST}/{hashed}"
+
+
+class HashedStaticFiles(StaticFiles):
+    """StaticFiles with immutable caching for dist/ and precompressed variants."""
+
+    async def get_response(self, path: str, scope):
+        variant = None
+        if scope["method"] in ("GET", "HEAD") and path.endswith(COMPRESSIBLE):
+            variant = self._variant(path, scope)
+        if variant is not None:
+            # Its own ETag / Last-Modified, so If-None-Match works per encoding
+            full_path, stat, encoding = variant
+            response = self.file_response(full_path, stat, scope)
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            if media_type.startswith("text/"):
+                media_type += "; charset=utf-8"
+            response.headers["Content-Type"] = media_type
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response = await super().get_response(path, scope)
+            if response.status_code not in (200, 304):
+                return response
+        if path.endswith(COMPRESSIBLE):
+            response.headers["Vary"] = "Accept-Encoding"
+        immutable = path.replace(os.sep, "/").startswith(f"{DIST}/")
+        response.headers["Cache-Control"] = IMMUTABLE if immutable else "no-cache"
+        return response
+
+    def _variant(self, path: str, scope) -> Optional[tuple]:
+        headers = dict(scope.get("headers") or [])
+        accepted = parse_accept_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        wildcard = accepted.get("*", 0.0)
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if accepted.get(encoding, wildcard) <= 0:
+                continue
+            full_path, stat = self.lookup_path(path + suffix)
+            if stat is not None:
+                return full_path, stat, encoding
+        return None
+
+
+if __name__ == "__main__":
+    built = build()
+    print(f"{len(built)} assets -> {os.path.join(STATIC_DIR, DIST)}/manifest.json")
@@ -0,0 +1,227 @@
+"""
+bench/assistant_bench.py – load test for /ai/chat and /ai/chat/stream
+
+Simulates concurrent users, each sending a series of assistant messages, and
+reports throughput, latency percentiles (time-to-first-token for streams),
+errors by status and the app's RSS before / after the run.
+
+Against a running app (pointed at bench/fake_gemini.py via GEMINI_BASE_URL):
+
+    python bench/assistant_bench.py --app http://127.0.0.1:8000 --pid <uvicorn pid>
+
+Or let the script start the fake upstream and the app on a temp SQLite DB:
+
+    python bench/assistant_bench.py --spawn --users 50 --messages 10 --stream
+
+Use --repeat to send identical prompts (exercises the reply cache) and
+--json to emit a machine-readable report.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import List, Optional
+
+import httpx
+
+from common import free_port, rss_mb, summary_ms
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ---------- process helpers ----------
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{' '.join(proc.args)} exited with {proc.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def spawn(args) -> tuple:
+    """Start fake_gemini + the app; returns (app_url, app_process, processes)."""
+    fake_port, app_port = free_port(), free_port()
+    fake = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "bench", "fake_gemini.py"), "--port", str(fake_port),
+         "--latency-ms", str(args.upstream_latency_ms), "--error-rate", str(args.upstream_error_rate)],
+        cwd=ROOT,
+    )
+    db_path = os.path.join(tempfile.mkdtemp(prefix="teamsync-bench-"), "bench.db")
+    env = dict(os.environ,
+               USE_SQLITE="1", SQLITE_PATH=f"sqlite:///{db_path}",
+               GEMINI_API_KEY="fake", GEMINI_BASE_URL=f"http://127.0.0.1:{fake_port}/v1beta")
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,  # per-request print() noise
+    )
+    url = f"http://127.0.0.1:{app_port}"
+    try:
+        _wait_ready(f"http://127.0.0.1:{fake_port}/stats", fake)
+        _wait_ready(f"{url}/health/db", app)
+    except RuntimeError:
+        for p in (fake, app):
+            p.terminate()
+        raise
+    return url, app, [fake, app]
+
+
+# ---------- load ----------
+
+class Results:
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.first_token: List[float] = []
+        self.statuses = {}
+        self.failures = 0
+
+    def record(self, status, latency: float, ttft: Optional[float] = None) -> None:
+        key = str(status)
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        if status == 200:
+            self.latencies.append(latency)
+            if ttft is not None:
+                self.first_token.append(ttft)
+        else:
+            self.failures += 1
+
+
+async def _signup(client: httpx.AsyncClient, n: int) -> dict:
+    email = f"bench-{uuid.uuid4().hex[:10]}-{n}@example.com"
+    r = await client.post("/auth/signup", json={"name": f"bench{n}", "email": email, "password": "bench-pw"})
+    r.raise_for_status()
+    client.cookies.clear()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def _one(client, headers, payload, stream: bool, results: Results) -> None:
+    started = time.perf_counter()
+    try:
+        if not stream:
+            r = await client.post("/ai/chat", json=payload, headers=headers)
+            results.record(r.status_code, time.perf_counter() - started)
+            return
+        ttft, status = None, None
+        async with client.stream("POST", "/ai/chat/stream", json=payload, headers=headers) as r:
+            status = r.status_code
+            async for line in r.aiter_lines():
+                if line.startswith("event: token") and ttft is None:
+                    ttft = time.perf_counter() - started
+                elif line.startswith("event: error"):
+                    status = "sse-error"
+        results.record(status, time.perf_counter() - started, ttft)
+    except httpx.HTTPError as e:
+        results.record(type(e).__name__, time.perf_counter() - started)
+
+
+async def run_load(app_url: str, users: int, messages: int, stream: bool,
+                   repeat: bool, auth: bool, timeout: float) -> tuple:
+    results = Results()
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+        headers = await asyncio.gather(*(_signup(client, i) for i in range(users))) if auth \
+            else [{}] * users
+
+        async def user(n: int) -> None:
+            uid = f"bench-user-{n}-{uuid.uuid4().hex[:6]}"
+            for m in range(messages):
+                text = "What should the team focus on this sprint?" if repeat \
+                    else f"[{uid} #{m}] What should the team focus on this sprint?"
+                await _one(client, headers[n], {"user_id": uid, "message": text}, stream, results)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(users)))
+        elapsed = time.perf_counter() - started
+        try:
+            # Operator endpoint: METRICS_TOKEN when the app sets one, else any signed-in user
+            token = os.getenv("METRICS_TOKEN")
+            diag_headers = {"Authorization": f"Bearer {token}"} if token \
+                else headers[0] if auth else await _signup(client, users)
+            r = await client.get("/ai/diagnostics", headers=diag_headers)
+            diagnostics = r.json() if r.status_code == 200 else None
+        except (httpx.HTTPError, ValueError):
+            diagnostics = None
+    return results, elapsed, diagnostics
+
+
+# ---------- CLI ----------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="http://127.0.0.1:8000", help="TeamSync base URL")
+    parser.add_argument("--pid", type=int, help="app process id, for RSS readings")
+    parser.add_argument("--spawn", action="store_true", help="start fake_gemini and the app locally")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5, help="messages per user")
+    parser.add_argument("--stream", action="store_true", help="use /ai/chat/stream")
+    parser.add_argument("--repeat", action="store_true", help="identical prompts (cache hits)")
+    parser.add_argument("--auth", action="store_true", help="sign users in (enables retrieval grounding)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--upstream-latency-ms", type=float, default=200, help="with --spawn")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0, help="with --spawn")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    procs = []
+    app_url, pid = args.app, args.pid
+    try:
+        if args.spawn:
+            app_url, app_proc, procs = spawn(args)
+            pid = app_proc.pid
+        rss_before = rss_mb(pid)
+        results, elapsed, diagnostics = asyncio.run(run_load(
+            app_url, args.users, args.messages, args.stream, args.repeat, args.auth, args.timeout
+        ))
+        rss_after = rss_mb(pid)
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait(timeout=10)
+
+    total = sum(results.statuses.values())
+    report = {
+        "endpoint": "/ai/chat/stream" if args.stream else "/ai/chat",
+        "users": args.users,
+        "requests": total,
+        "ok": len(results.latencies),
+        "failed": results.failures,
+        "statuses": results.statuses,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": summary_ms(results.latencies),
+        "first_token_ms": summary_ms(results.first_token) if args.stream else None,
+        "rss_mb": {"before": rss_before, "after": rss_after},
+        "diagnostics": diagnostics,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['endpoint']}: {total} requests from {args.users} users in {report['elapsed_s']}s "
+          f"-> {report['throughput_rps']} req/s")
+    print(f"  ok={report['ok']} failed={report['failed']} statuses={results.statuses}")
+    lat = report["latency_ms"]
+    print(f"  latency ms  p50={lat['p50']} p95={lat['p95']} p99={lat['p99']} max={lat['max']}")
+    if args.stream:
+        ft = report["first_token_ms"]
+        print(f"  first token p50={ft['p50']} p95={ft['p95']} p99={ft['p99']} max={ft['max']}")
+    if rss_before is not None:
+        print(f"  app RSS MB  before={rss_before} after={rss_after}")
+    if diagnostics:
+        print(f"  upstream: {diagnostics.get('upstream', {}).get('requests')} calls, "
+              f"cache hit rate {diagnostics.get('cache', {}).get('hit_rate')}")
+
+
+if __name__ == "__main__":
+    main()
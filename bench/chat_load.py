@@ -0,0 +1,306 @@
+"""
+bench/chat_load.py – WebSocket fan-out load test for /chat/ws/{room_id}
+
+Opens --rooms x --sockets-per-room authenticated sockets (a share of them
+deliberately slow readers), publishes from --publishers-per-room sockets at
+--rate messages/s per room, then reports:
+
+ - delivery latency distribution (fast and slow readers separately)
+ - messages not delivered (expected vs received per socket) and the
+   server's own dropped / slow-disconnect counters from /chat/metrics
+ - server RSS per connection (needs --pid of the app worker)
+ - event loop lag: ping -> pong round trips through the server, plus the
+   server's sampled loop lag from /metrics
+
+    uvicorn main:app --port 8000 &
+    python bench/chat_load.py --rooms 50 --sockets-per-room 100 --rate 20 \
+        --slow-ratio 0.05 --duration 30 --pid $!
+
+Rooms are named "load-<n>" (non-numeric, so no project lookup). All sockets
+share one token from --token, --email/--password, or a freshly signed-up
+user. Needs the `websockets` package (also what uvicorn uses to serve them).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+try:
+    from websockets.asyncio.client import connect as ws_connect
+    from websockets.exceptions import ConnectionClosed
+except ImportError:  # pragma: no cover - optional dependency of this tool
+    raise SystemExit("bench/chat_load.py needs the websockets package: pip install -r requirements.txt")
+
+from common import rss_mb, summary_ms
+
+
+# ---------- helpers ----------
+
+def _raise_fd_limit() -> None:
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+async def _token(client: httpx.AsyncClient, args) -> str:
+    if args.token:
+        return args.token
+    if args.email:
+        r = await client.post("/auth/login", json={"email": args.email, "password": args.password})
+    else:
+        email = f"chat-load-{uuid.uuid4().hex[:10]}@example.com"
+        r = await client.post("/auth/signup", json={"name": "Chat Load", "email": email,
+                                                   "password": args.password})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+_LAG_RE = re.compile(r"^teamsync_event_loop_lag_(max_seconds|seconds_sum|seconds_count) ([0-9.e+-]+)$", re.M)
+
+
+async def _server_lag(client: httpx.AsyncClient, headers: dict) -> Dict[str, float]:
+    try:
+        text = (await client.get("/metrics", headers=headers)).text
+    except httpx.HTTPError:
+        return {}
+    return {k: float(v) for k, v in _LAG_RE.findall(text)}
+
+
+async def _chat_metrics(client: httpx.AsyncClient, headers: dict) -> dict:
+    try:
+        res = await client.get("/chat/metrics", headers=headers)
+        res.raise_for_status()
+        return res.json()
+    except (httpx.HTTPError, ValueError):
+        return {}
+
+
+# ---------- sockets ----------
+
+class Socket:
+    def __init__(self, room: str, slow: bool) -> None:
+        self.room = room
+        self.slow = slow
+        self.ws = None
+        self.received = 0
+        self.latencies: List[float] = []
+        self.closed_by_server: Optional[int] = None
+        self.pongs: List[float] = []
+        self._ping_sent: Optional[float] = None
+
+
+async def _open(url: str, sock: Socket, max_queue: int) -> Optional[float]:
+    started = time.perf_counter()
+    try:
+        sock.ws = await ws_connect(url, ping_interval=None, max_queue=max_queue, open_timeout=30)
+    except Exception as e:  # refused, rejected handshake (4401/4403), timeout
+        sock.closed_by_server = getattr(getattr(e, "rcvd", None), "code", -1)
+        return None
+    return time.perf_counter() - started
+
+
+async def _reader(sock: Socket, slow_delay: float) -> None:
+    try:
+        async for raw in sock.ws:
+            data = json.loads(raw)
+            kind = data.get("type")
+            if kind == "message":
+                try:
+                    sent = json.loads(data["message"])["t"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                sock.received += 1
+                sock.latencies.append(time.perf_counter() - sent)
+                if sock.slow:
+                    await asyncio.sleep(slow_delay)
+            elif kind == "ping":
+                await sock.ws.send(json.dumps({"type": "pong"}))
+            elif kind == "pong" and sock._ping_sent is not None:
+                sock.pongs.append(time.perf_counter() - sock._ping_sent)
+                sock._ping_sent = None
+    except ConnectionClosed as e:
+        if e.rcvd is not None:
+            sock.closed_by_server = e.rcvd.code
+
+
+async def _publisher(sock: Socket, rate: float, stop_at: float, published: Dict[str, int]) -> None:
+    seq = 0
+    interval = 1 / rate if rate > 0 else None
+    while interval and time.perf_counter() < stop_at and sock.closed_by_server is None:
+        # Exponential gaps: Poisson arrivals rather than lock-step bursts
+        await asyncio.sleep(random.expovariate(1 / interval))
+        seq += 1
+        try:
+            await sock.ws.send(json.dumps({"message": json.dumps({"t": time.perf_counter(), "seq": seq})}))
+        except ConnectionClosed:
+            return
+        published[sock.room] = published.get(sock.room, 0) + 1
+
+
+async def _pinger(sock: Socket, stop_at: float) -> None:
+    while time.perf_counter() < stop_at and sock.closed_by_server is None:
+        await asyncio.sleep(0.5)
+        if sock._ping_sent is None:
+            sock._ping_sent = time.perf_counter()
+            try:
+                await sock.ws.send(json.dumps({"type": "ping"}))
+            except ConnectionClosed:
+                return
+
+
+async def _client_lag(stop_at: float, samples: List[float]) -> None:
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        await asyncio.sleep(0.1)
+        samples.append(max(0.0, time.perf_counter() - started - 0.1))
+
+
+# ---------- run ----------
+
+async def run(args) -> dict:
+    base = args.app.rstrip("/")
+    ws_base = re.sub(r"^http", "ws", base)
+    rnd = random.Random(args.seed)
+    async with httpx.AsyncClient(base_url=base, timeout=30) as client:
+        token = await _token(client, args)
+        # METRICS_TOKEN when the app sets one, else the user's JWT (/chat/metrics needs a user)
+        metrics_headers = {"Authorization": f"Bearer {args.metrics_token or token}"}
+        chat_before = await _chat_metrics(client, metrics_headers)
+        lag_before = await _server_lag(client, metrics_headers)
+        rss_before = rss_mb(args.pid)
+
+        rooms = [f"load-{uuid.uuid4().hex[:6]}-{n}" for n in range(args.rooms)]
+        sockets = [Socket(room, rnd.random() < args.slow_ratio)
+                   for room in rooms for _ in range(args.sockets_per_room)]
+        sem = asyncio.Semaphore(args.connect_concurrency)
+
+        async def open_one(sock: Socket) -> Optional[float]:
+            async with sem:
+                return await _open(f"{ws_base}/chat/ws/{sock.room}?token={token}", sock,
+                                   1 if sock.slow else args.max_queue)
+
+        connect_started = time.perf_counter()
+        connect_times = [t for t in await asyncio.gather(*(open_one(s) for s in sockets)) if t is not None]
+        connect_elapsed = time.perf_counter() - connect_started
+        live = [s for s in sockets if s.ws is not None]
+        await asyncio.sleep(1)  # let join broadcasts settle before measuring memory
+        rss_connected = rss_mb(args.pid)
+
+        readers = [asyncio.create_task(_reader(s, args.slow_delay_ms / 1000)) for s in live]
+        published: Dict[str, int] = {}
+        stop_at = time.perf_counter() + args.duration
+        fast_by_room: Dict[str, List[Socket]] = {}
+        for s in live:
+            if not s.slow:
+                fast_by_room.setdefault(s.room, []).append(s)
+        pubs = [s for room_socks in fast_by_room.values() for s in room_socks[:args.publishers_per_room]]
+        per_pub_rate = args.rate / max(1, args.publishers_per_room)
+        client_lag: List[float] = []
+        tasks = [asyncio.create_task(_publisher(s, per_pub_rate, stop_at, published)) for s in pubs]
+        if pubs:
+            tasks.append(asyncio.create_task(_pinger(pubs[0], stop_at)))
+        tasks.append(asyncio.create_task(_client_lag(stop_at, client_lag)))
+        await asyncio.gather(*tasks)
+        await asyncio.sleep(args.drain)
+
+        rss_end = rss_mb(args.pid)
+        chat_after = await _chat_metrics(client, metrics_headers)
+        lag_after = await _server_lag(client, metrics_headers)
+        await asyncio.gather(*(s.ws.close() for s in live), return_exceptions=True)
+        for t in readers:
+            t.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+
+    fast = [s for s in live if not s.slow]
+    slow = [s for s in live if s.slow]
+    expected = sum(published.get(s.room, 0) for s in live)
+    received = sum(s.received for s in live)
+
+    def _delta(key: str) -> Optional[int]:
+        if key in chat_after and key in chat_before:
+            return chat_after[key] - chat_before[key]
+        return None
+
+    lag_count = lag_after.get("seconds_count", 0) - lag_before.get("seconds_count", 0)
+    lag_sum = lag_after.get("seconds_sum", 0) - lag_before.get("seconds_sum", 0)
+    per_conn = None
+    if rss_before is not None and rss_connected is not None and live:
+        per_conn = round((rss_connected - rss_before) * 1024 / len(live), 1)
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("token", "password")},
+        "connections": {
+            "attempted": len(sockets), "open": len(live), "slow_readers": len(slow),
+            "connect_s": round(connect_elapsed, 2), "connect_ms": summary_ms(connect_times),
+            "closed_by_server": sum(1 for s in live if s.closed_by_server is not None),
+        },
+        "messages": {
+            "published": sum(published.values()),
+            "publish_rate_rps": round(sum(published.values()) / args.duration, 1),
+            "deliveries_expected": expected,
+            "deliveries_received": received,
+            "undelivered": expected - received,
+            "undelivered_fast_readers": sum(published.get(s.room, 0) - s.received for s in fast),
+            "server_dropped": _delta("dropped"),
+            "server_slow_disconnects": _delta("slow_disconnects"),
+            "server_delivered": _delta("delivered"),
+        },
+        "delivery_latency_ms": {
+            "fast_readers": summary_ms([x for s in fast for x in s.latencies]),
+            "slow_readers": summary_ms([x for s in slow for x in s.latencies]),
+        },
+        "event_loop": {
+            "ping_rtt_ms": summary_ms([x for s in pubs[:1] for x in s.pongs]),
+            "server_lag_ms_avg": round(1000 * lag_sum / lag_count, 2) if lag_count else None,
+            "server_lag_ms_max_1m": round(1000 * lag_after["max_seconds"], 2) if "max_seconds" in lag_after else None,
+            "client_lag_ms_max": round(1000 * max(client_lag, default=0.0), 2),
+        },
+        "server_memory": {
+            "rss_mb_before": rss_before, "rss_mb_connected": rss_connected, "rss_mb_end": rss_end,
+            "kb_per_connection": per_conn,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="http://127.0.0.1:8000")
+    parser.add_argument("--pid", type=int, help="app worker pid, for RSS per connection")
+    parser.add_argument("--token", help="JWT to use for every socket")
+    parser.add_argument("--email", help="log in as this user instead of signing up a new one")
+    parser.add_argument("--password", default="chat-load-pass")
+    parser.add_argument("--metrics-token", help="the app's METRICS_TOKEN, if it sets one")
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--sockets-per-room", type=int, default=50)
+    parser.add_argument("--publishers-per-room", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=10, help="messages/s per room")
+    parser.add_argument("--slow-ratio", type=float, default=0.05, help="share of slow readers")
+    parser.add_argument("--slow-delay-ms", type=float, default=200, help="pause per message for slow readers")
+    parser.add_argument("--max-queue", type=int, default=64, help="client frame buffer for fast readers")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of publishing")
+    parser.add_argument("--drain", type=float, default=3, help="seconds to wait for in-flight messages")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    _raise_fd_limit()
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+bench/common.py – helpers shared by the bench scripts
+
+Ports, process RSS and latency summaries; imported as `common` by scripts
+run from the repo root (python bench/<script>.py puts bench/ on sys.path).
+"""
+
+import socket
+from typing import List, Optional
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Resident set size of a process (psutil if installed, else /proc)."""
+    if not pid:
+        return None
+    try:
+        import psutil
+        return round(psutil.Process(pid).memory_info().rss / 2**20, 1)
+    except ImportError:
+        pass
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summary_ms(values: List[float]) -> dict:
+    """p50/p95/p99/max of durations given in seconds, in ms."""
+    return {
+        "p50": round(percentile(values, 50) * 1000, 1),
+        "p95": round(percentile(values, 95) * 1000, 1),
+        "p99": round(percentile(values, 99) * 1000, 1),
+        "max": round(max(values, default=0.0) * 1000, 1),
+    }
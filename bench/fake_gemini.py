@@ -0,0 +1,162 @@
+"""
+bench/fake_gemini.py – local stand-in for the Gemini REST API
+
+Serves generateContent and streamGenerateContent (alt=sse) with configurable
+latency, streaming pace and error injection, so the assistant path can be
+load-tested without API quota:
+
+    python bench/fake_gemini.py --port 8100 --latency-ms 300 --error-rate 0.02
+    GEMINI_BASE_URL=http://127.0.0.1:8100/v1beta GEMINI_API_KEY=fake uvicorn main:app
+
+Every option can also be set through FAKE_GEMINI_* env vars. GET /stats
+returns request counts; POST /config changes settings on a running server.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+from dataclasses import asdict, dataclass
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def _env(name: str, default: str) -> str:
+    return os.getenv(f"FAKE_GEMINI_{name}", default)
+
+
+@dataclass
+class Settings:
+    latency_ms: float = float(_env("LATENCY_MS", "200"))      # before the first byte
+    jitter_ms: float = float(_env("JITTER_MS", "50"))
+    reply_words: int = int(_env("REPLY_WORDS", "60"))
+    stream_chunks: int = int(_env("STREAM_CHUNKS", "10"))
+    chunk_delay_ms: float = float(_env("CHUNK_DELAY_MS", "30"))  # between SSE chunks
+    error_rate: float = float(_env("ERROR_RATE", "0"))          # 500/503 responses
+    throttle_rate: float = float(_env("THROTTLE_RATE", "0"))    # 429 responses
+    hang_rate: float = float(_env("HANG_RATE", "0"))            # never answer (timeouts)
+
+
+settings = Settings()
+counters = {"requests": 0, "streams": 0, "errors": 0, "throttled": 0, "hung": 0, "in_flight": 0}
+app = FastAPI(title="Fake Gemini")
+
+_WORDS = ("team task project sprint deadline review update plan blocker status "
+          "design release feedback priority owner risk milestone progress").split()
+
+
+def _reply_text(prompt: str) -> str:
+    rnd = random.Random(prompt)  # same prompt -> same reply, like a cacheable model
+    return " ".join(rnd.choice(_WORDS) for _ in range(settings.reply_words))
+
+
+def _prompt_of(body: dict) -> str:
+    try:
+        return body["contents"][-1]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        return ""
+
+
+def _candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]},
+                            "finishReason": "STOP"}]}
+
+
+async def _pause(ms: float) -> None:
+    if ms > 0:
+        await asyncio.sleep(ms / 1000)
+
+
+async def _inject_fault():
+    """Maybe hang or return an error response, before any body is produced."""
+    roll = random.random()
+    if roll < settings.hang_rate:
+        counters["hung"] += 1
+        await asyncio.sleep(3600)
+    roll -= settings.hang_rate
+    if roll < settings.throttle_rate:
+        counters["throttled"] += 1
+        return JSONResponse({"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+                            status_code=429, headers={"Retry-After": "1"})
+    roll -= settings.throttle_rate
+    if roll < settings.error_rate:
+        counters["errors"] += 1
+        status = random.choice((500, 503))
+        return JSONResponse({"error": {"code": status, "status": "UNAVAILABLE"}}, status_code=status)
+    return None
+
+
+@app.post("/v1beta/models/{model_action}")
+async def models_endpoint(model_action: str, request: Request):
+    model, _, action = model_action.partition(":")
+    if action not in ("generateContent", "streamGenerateContent"):
+        raise HTTPException(404, f"Unknown action {action!r}")
+    if not request.query_params.get("key"):
+        return JSONResponse({"error": {"code": 403, "message": "API key missing"}}, status_code=403)
+    body = await request.json()
+    counters["requests"] += 1
+    counters["in_flight"] += 1
+    try:
+        await _pause(settings.latency_ms + random.uniform(-1, 1) * settings.jitter_ms)
+        fault = await _inject_fault()
+    except BaseException:
+        counters["in_flight"] -= 1
+        raise
+    if fault is not None:
+        counters["in_flight"] -= 1
+        return fault
+    text = _reply_text(_prompt_of(body))
+
+    if action == "generateContent":
+        counters["in_flight"] -= 1
+        return _candidate(text)
+
+    counters["streams"] += 1
+    words = text.split(" ")
+    n = max(1, min(settings.stream_chunks, len(words)))
+    step = -(-len(words) // n)
+
+    async def sse():
+        try:
+            for i in range(0, len(words), step):
+                piece = " ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+                yield f"data: {json.dumps(_candidate(piece))}\r\n\r\n"
+                await _pause(settings.chunk_delay_ms)
+        finally:
+            counters["in_flight"] -= 1
+
+    return StreamingResponse(sse(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def stats():
+    return {"settings": asdict(settings), "counters": counters}
+
+
+@app.post("/config")
+async def configure(changes: dict):
+    for name, value in changes.items():
+        if not hasattr(settings, name):
+            raise HTTPException(400, f"Unknown setting {name!r}")
+        setattr(settings, name, type(getattr(settings, name))(value))
+    return asdict(settings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    for name, value in asdict(settings).items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(value), default=value)
+    args = parser.parse_args()
+    for name in asdict(settings):
+        setattr(settings, name, getattr(args, name))
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
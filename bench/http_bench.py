@@ -0,0 +1,290 @@
+"""
+bench/http_bench.py – end-to-end API benchmark over seeded data
+
+Drives the main user flows against a running app at a fixed concurrency:
+
+    login      POST /auth/login
+    dashboard  GET  /projects
+    board      GET  /projects/{id}/tasks
+    patch      PATCH /tasks/{id}
+    comment    POST /tasks/{id}/comments
+    analytics  GET  /projects/{id}/analytics
+
+Each virtual user logs in as a different seeded user (bench/seed.py), then
+runs weighted scenarios on its own projects until --duration elapses.
+Throughput and latency percentiles per scenario are written as JSON, and
+--baseline compares them with an earlier run:
+
+    python bench/seed.py --users 500 --manifest bench/seed.json
+    uvicorn main:app --port 8000 &
+    python bench/http_bench.py --manifest bench/seed.json --concurrency 32 \
+        --label sqlite --out bench/results-sqlite.json --baseline bench/baseline-sqlite.json
+
+Run the same commands with DATABASE_URL set (app and seed) for Postgres.
+With --fail-on-regression the exit code is 1 when p50/p99 latency or
+throughput moved more than --tolerance percent in the wrong direction.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_WEIGHTS = "dashboard=2,board=4,patch=2,comment=2,analytics=1"
+SCENARIOS = ("login", "dashboard", "board", "patch", "comment", "analytics")
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = {name: [] for name in SCENARIOS}
+        self.errors: Dict[str, Dict[str, int]] = {name: {} for name in SCENARIOS}
+
+    def add(self, name: str, seconds: float, status) -> None:
+        if status == 200:
+            self.samples[name].append(seconds)
+        else:
+            errs = self.errors[name]
+            errs[str(status)] = errs.get(str(status), 0) + 1
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _timed(rec: Recorder, name: str, request) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        res = await request
+    except httpx.HTTPError as e:
+        rec.add(name, time.perf_counter() - started, type(e).__name__)
+        return None
+    rec.add(name, time.perf_counter() - started, res.status_code)
+    return res
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, email: str, password: str,
+                 rec: Recorder, rnd: random.Random) -> None:
+        self.client, self.email, self.password = client, email, password
+        self.rec, self.rnd = rec, rnd
+        self.headers: Dict[str, str] = {}
+        self.projects: List[int] = []
+        self.tasks: Dict[int, List[int]] = {}
+
+    async def login(self) -> bool:
+        res = await _timed(self.rec, "login", self.client.post(
+            "/auth/login", json={"email": self.email, "password": self.password}))
+        if res is None or res.status_code != 200:
+            return False
+        self.headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+        await self.dashboard()
+        return bool(self.projects)
+
+    async def dashboard(self) -> None:
+        res = await _timed(self.rec, "dashboard", self.client.get("/projects", headers=self.headers))
+        if res is not None and res.status_code == 200:
+            self.projects = [p["id"] for p in res.json()]
+
+    async def board(self) -> None:
+        pid = self.rnd.choice(self.projects)
+        res = await _timed(self.rec, "board", self.client.get(f"/projects/{pid}/tasks", headers=self.headers))
+        if res is not None and res.status_code == 200:
+            self.tasks[pid] = [t["id"] for t in res.json()]
+
+    def _pick_task(self) -> Optional[int]:
+        boards = [ids for ids in self.tasks.values() if ids]
+        return self.rnd.choice(self.rnd.choice(boards)) if boards else None
+
+    async def patch(self) -> None:
+        tid = self._pick_task()
+        if tid is None:
+            return await self.board()
+        status = self.rnd.choice(("pending", "in-progress", "done"))
+        await _timed(self.rec, "patch", self.client.patch(
+            f"/tasks/{tid}", json={"status": status}, headers=self.headers))
+
+    async def comment(self) -> None:
+        tid = self._pick_task()
+        if tid is None:
+            return await self.board()
+        await _timed(self.rec, "comment", self.client.post(
+            f"/tasks/{tid}/comments", json={"content": "Benchmark comment"}, headers=self.headers))
+
+    async def analytics(self) -> None:
+        pid = self.rnd.choice(self.projects)
+        await _timed(self.rec, "analytics", self.client.get(
+            f"/projects/{pid}/analytics", headers=self.headers))
+
+
+async def run(args, weights: Dict[str, float]) -> tuple:
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.app, timeout=args.timeout, limits=limits) as client:
+        names, w = zip(*weights.items())
+
+        async def worker(n: int) -> None:
+            rnd = random.Random(args.seed * 1000 + n)
+            email = args.email_pattern.format(n=rnd.randrange(args.users))
+            user = VirtualUser(client, email, args.password, rec, rnd)
+            if not await user.login():
+                return
+            while time.perf_counter() < deadline:
+                await getattr(user, rnd.choices(names, weights=w)[0])()
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(n) for n in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    return rec, elapsed
+
+
+def summarize(rec: Recorder, elapsed: float) -> dict:
+    out = {}
+    for name in SCENARIOS:
+        lat = rec.samples[name]
+        errors = sum(rec.errors[name].values())
+        if not lat and not errors:
+            continue
+        out[name] = {
+            "requests": len(lat) + errors,
+            "errors": rec.errors[name],
+            "throughput_rps": round(len(lat) / elapsed, 2),
+            "latency_ms": {
+                "mean": round(1000 * sum(lat) / len(lat), 2) if lat else 0.0,
+                "p50": round(1000 * percentile(lat, 50), 2),
+                "p90": round(1000 * percentile(lat, 90), 2),
+                "p99": round(1000 * percentile(lat, 99), 2),
+                "max": round(1000 * max(lat, default=0.0), 2),
+            },
+        }
+    ok = sum(len(v) for v in rec.samples.values())
+    out["total"] = {
+        "requests": ok + sum(sum(e.values()) for e in rec.errors.values()),
+        "throughput_rps": round(ok / elapsed, 2),
+    }
+    return out
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Human-readable deltas; returns the regressions beyond tolerance."""
+    regressions = []
+    cur, base = current["results"], baseline.get("results", {})
+    print(f"\nvs baseline {baseline.get('meta', {}).get('label')} "
+          f"({baseline.get('meta', {}).get('timestamp')}), tolerance {tolerance}%")
+    print(f"{'scenario':<11}{'metric':<16}{'baseline':>10}{'current':>10}{'change':>9}")
+    for name, stats in cur.items():
+        if name not in base:
+            continue
+        pairs = [("throughput_rps", base[name]["throughput_rps"], stats["throughput_rps"], True)]
+        if "latency_ms" in stats:
+            for q in ("p50", "p99"):
+                pairs.append((f"latency {q} ms", base[name]["latency_ms"][q], stats["latency_ms"][q], False))
+        for metric, old, new, higher_is_better in pairs:
+            change = (new - old) / old * 100 if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = "  !" if worse > tolerance else ""
+            if flag:
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.1f}%)")
+            print(f"{name:<11}{metric:<16}{old:>10}{new:>10}{change:>+8.1f}%{flag}")
+    return regressions
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    weights = {}
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS or name == "login":
+            raise SystemExit(f"unknown scenario in --weights: {name!r}")
+        weights[name] = float(value or 1)
+    return weights
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="http://127.0.0.1:8000")
+    parser.add_argument("--manifest", help="JSON written by bench/seed.py (credentials, user count)")
+    parser.add_argument("--users", type=int, help="seeded users to pick from (default: from manifest)")
+    parser.add_argument("--email-pattern", default="bench-user-{n}@example.com")
+    parser.add_argument("--password", default="bench-pass")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="scenario mix")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--label", default="", help="e.g. sqlite / postgres")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="percent")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    if args.manifest:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+        args.email_pattern = manifest["user_email_pattern"]
+        args.password = manifest["password"]
+        args.users = args.users or manifest["users"]
+        args.label = args.label or manifest.get("database", "")
+    if not args.users:
+        parser.error("--users or --manifest is required")
+
+    rec, elapsed = asyncio.run(run(args, _parse_weights(args.weights)))
+    report = {
+        "meta": {
+            "label": args.label,
+            "app": args.app,
+            "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 2),
+            "weights": args.weights,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+        },
+        "results": summarize(rec, elapsed),
+    }
+
+    print(f"{'scenario':<11}{'reqs':>7}{'rps':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name, s in report["results"].items():
+        if name == "total":
+            continue
+        lat = s["latency_ms"]
+        print(f"{name:<11}{s['requests']:>7}{s['throughput_rps']:>9}{lat['p50']:>9}"
+              f"{lat['p90']:>9}{lat['p99']:>9}{sum(s['errors'].values()):>8}")
+    total = report["results"]["total"]
+    print(f"{'total':<11}{total['requests']:>7}{total['throughput_rps']:>9}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance}%")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
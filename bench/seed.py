@@ -0,0 +1,204 @@
+"""
+bench/seed.py – synthetic dataset generator for benchmarks
+
+Bulk-inserts users, projects with skewed (Pareto) task counts, comments,
+memberships and attachment rows into the database configured by the usual
+env vars (DATABASE_URL, or USE_SQLITE=1 / SQLITE_PATH), using multi-row
+INSERTs in batches rather than the API.
+
+    USE_SQLITE=1 SQLITE_PATH=sqlite:///./bench.db python bench/seed.py --users 500
+    python bench/seed.py --users 2000 --tag pg --manifest bench/seed-pg.json
+
+Every seeded user is <tag>-user-<n>@example.com with the same password, so
+bench/http_bench.py can log in as any of them; the manifest records the
+counts and credentials. The same --seed gives the same dataset.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import insert  # noqa: E402
+
+from database import Base, SessionLocal, engine  # noqa: E402
+import models  # noqa: E402
+from utils import hash_password  # noqa: E402
+
+BATCH_SIZE = 5000
+
+_VERBS = "Design Implement Review Fix Document Test Refactor Deploy Plan Research".split()
+_NOUNS = ("login flow, billing page, search index, onboarding email, API client, dashboard "
+          "widgets, export job, mobile layout, audit log, rate limiter, cache layer").split(", ")
+_PHRASES = [
+    "Looks good to me, merging after CI passes.",
+    "Can we split this into two smaller tasks?",
+    "Blocked on the design review, pinging the team.",
+    "Pushed a first draft, feedback welcome.",
+    "This regressed last sprint, adding a test.",
+    "Moving to in-progress, should be done by Friday.",
+    "Need access to the staging database for this one.",
+    "Customer reported this again today.",
+]
+_ROLES = ("editor", "editor", "viewer", "admin")
+
+
+def _chunks(rows: List[dict], size: int = BATCH_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _insert_returning_ids(db, model, rows: List[dict]) -> List[int]:
+    """Multi-row INSERT ... RETURNING id, ids in the same order as rows."""
+    ids = []
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+    for batch in _chunks(rows):
+        ids.extend(db.execute(stmt, batch).scalars().all())
+    return ids
+
+
+def _insert(db, model, rows: List[dict]) -> None:
+    for batch in _chunks(rows):
+        db.execute(insert(model), batch)
+
+
+def _task_count(rnd: random.Random, mean: float, cap: int) -> int:
+    # Pareto(alpha=1.5) has mean 3 * xm: most boards are small, a few are huge
+    xm = mean / 3
+    return max(1, min(cap, int(rnd.paretovariate(1.5) * xm)))
+
+
+def seed(args) -> dict:
+    rnd = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    password_hash = hash_password(args.password)  # bcrypt once, shared by all users
+    counts = {}
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        user_ids = _insert_returning_ids(db, models.User, [
+            {"name": f"{args.tag.title()} User {n}", "email": f"{args.tag}-user-{n}@example.com",
+             "password": password_hash}
+            for n in range(args.users)
+        ])
+        counts["users"] = len(user_ids)
+
+        project_rows = []
+        for uid in user_ids:
+            for p in range(max(1, round(rnd.expovariate(1 / args.projects_per_user)))):
+                project_rows.append({"title": f"{rnd.choice(_NOUNS).title()} {p + 1}",
+                                     "description": "Seeded benchmark project", "owner_id": uid})
+        project_ids = _insert_returning_ids(db, models.Project, project_rows)
+        counts["projects"] = len(project_ids)
+
+        member_rows = []
+        for pid, proj in zip(project_ids, project_rows):
+            k = min(len(user_ids), round(rnd.expovariate(1 / args.members_per_project)))
+            for uid in rnd.sample(user_ids, k):
+                if uid != proj["owner_id"]:
+                    member_rows.append({"user_id": uid, "project_id": pid, "role": rnd.choice(_ROLES)})
+        _insert(db, models.ProjectMember, member_rows)
+        counts["memberships"] = len(member_rows)
+
+        statuses = [s.value for s in models.Status]
+        task_rows, task_owner = [], []
+        for pid, proj in zip(project_ids, project_rows):
+            for t in range(_task_count(rnd, args.tasks_mean, args.max_tasks)):
+                task_rows.append({
+                    "title": f"{rnd.choice(_VERBS)} {rnd.choice(_NOUNS)} #{t + 1}",
+                    "description": " ".join(rnd.sample(_PHRASES, 2)),
+                    "status": rnd.choices(statuses, weights=(5, 3, 4))[0],
+                    "due_date": now + timedelta(days=rnd.randint(-30, 60)) if rnd.random() < 0.6 else None,
+                    "project_id": pid,
+                })
+                task_owner.append(proj["owner_id"])
+        task_ids = _insert_returning_ids(db, models.Task, task_rows)
+        counts["tasks"] = len(task_ids)
+
+        comment_rows, attachment_rows = [], []
+        for tid, owner in zip(task_ids, task_owner):
+            for _ in range(int(rnd.expovariate(1 / args.comments_per_task)) if args.comments_per_task else 0):
+                comment_rows.append({
+                    "content": rnd.choice(_PHRASES), "task_id": tid,
+                    "user_id": owner if rnd.random() < 0.5 else rnd.choice(user_ids),
+                    "timestamp": now - timedelta(minutes=rnd.randint(0, 60 * 24 * 90)),
+                })
+            if rnd.random() < args.attachment_ratio:
+                attachment_rows.append({"filename": "spec.pdf", "task_id": tid,
+                                        "filepath": "uploads/seed-placeholder.txt"})
+            if len(comment_rows) >= BATCH_SIZE:
+                _insert(db, models.Comment, comment_rows)
+                counts["comments"] = counts.get("comments", 0) + len(comment_rows)
+                comment_rows = []
+        _insert(db, models.Comment, comment_rows)
+        counts["comments"] = counts.get("comments", 0) + len(comment_rows)
+        _insert(db, models.FileAttachment, attachment_rows)
+        counts["attachments"] = len(attachment_rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if attachment_rows:
+        os.makedirs(os.path.join(ROOT, "uploads"), exist_ok=True)
+        with open(os.path.join(ROOT, "uploads", "seed-placeholder.txt"), "w") as f:
+            f.write("placeholder attachment for seeded benchmark data\n")
+
+    sizes = sorted(((n, pid) for pid, n in _per_project(task_rows, project_ids).items()), reverse=True)
+    return {
+        "tag": args.tag,
+        "seed": args.seed,
+        "database": engine.url.get_backend_name(),
+        "password": args.password,
+        "user_email_pattern": f"{args.tag}-user-{{n}}@example.com",
+        "users": args.users,
+        "counts": counts,
+        "largest_projects": [{"project_id": pid, "tasks": n} for n, pid in sizes[:5]],
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def _per_project(task_rows: List[dict], project_ids: List[int]) -> dict:
+    sizes = dict.fromkeys(project_ids, 0)
+    for row in task_rows:
+        sizes[row["project_id"]] += 1
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--projects-per-user", type=float, default=2.0, help="mean")
+    parser.add_argument("--tasks-mean", type=float, default=40, help="mean tasks per project (Pareto)")
+    parser.add_argument("--max-tasks", type=int, default=5000, help="cap for the largest boards")
+    parser.add_argument("--comments-per-task", type=float, default=3.0, help="mean")
+    parser.add_argument("--members-per-project", type=float, default=2.0, help="mean")
+    parser.add_argument("--attachment-ratio", type=float, default=0.1, help="share of tasks with a file")
+    parser.add_argument("--tag", default="bench", help="email prefix; lets several datasets coexist")
+    parser.add_argument("--password", default="bench-pass")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--create-tables", action="store_true", help="run create_all first")
+    parser.add_argument("--manifest", help="write the dataset summary JSON here")
+    args = parser.parse_args()
+
+    if args.create_tables:
+        Base.metadata.create_all(bind=engine)
+    manifest = seed(args)
+    text = json.dumps(manifest, indent=2)
+    if args.manifest:
+        with open(args.manifest, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+bench/serialization_bench.py – encode time and wire size of list_tasks payloads
+
+In-process: builds board-shaped payloads (tasks with comments and
+attachments, like GET /projects/{id}/tasks) and times each stage of turning
+them into bytes, per request:
+
+    build      TaskOut / CommentOut objects (the old list_tasks path)
+    validate   the response_model pass (re-validate + dump to JSON types)
+    stdlib     json.dumps, what JSONResponse renders
+    orjson     responses.dumps (the app default when orjson is installed)
+    one-pass   responses.dumps straight from row dicts (list_tasks today)
+    gzip / br  CompressionMiddleware at its configured levels
+
+    python bench/serialization_bench.py --tasks 200 1000 5000
+
+Against a running app (bytes on the wire and latency per Accept-Encoding,
+for a board the token's user owns):
+
+    python bench/serialization_bench.py --app http://127.0.0.1:8000 --token <jwt> --project 12
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pydantic import TypeAdapter  # noqa: E402
+
+import compression  # noqa: E402
+import responses  # noqa: E402
+import schemas  # noqa: E402
+
+
+def _rows(n_tasks: int, comments_per_task: float, rnd: random.Random) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    tasks = []
+    for i in range(n_tasks):
+        tasks.append({
+            "id": i + 1,
+            "title": f"Implement feature #{i + 1}",
+            "description": "Pushed a first draft, feedback welcome. Blocked on the design review.",
+            "status": rnd.choice(("pending", "in-progress", "done")),
+            "due_date": now + timedelta(days=rnd.randint(-30, 60)) if rnd.random() < 0.6 else None,
+            "attachments": [{"id": i + 1, "filename": f"{i}_spec.pdf", "filepath": f"uploads/{i}_spec.pdf"}]
+            if rnd.random() < 0.1 else [],
+            "comments": [
+                {"id": i * 100 + c, "content": "Looks good to me, merging after CI passes.",
+                 "timestamp": now - timedelta(minutes=rnd.randint(0, 100000)), "user_name": f"User {c}"}
+                for c in range(int(rnd.expovariate(1 / comments_per_task)) if comments_per_task else 0)
+            ],
+        })
+    return tasks
+
+
+def _build(rows: List[dict]) -> List[schemas.TaskOut]:
+    return [schemas.TaskOut(
+        id=r["id"], title=r["title"], description=r["description"], status=r["status"],
+        due_date=r["due_date"], attachments=r["attachments"],
+        comments=[schemas.CommentOut(**c) for c in r["comments"]],
+    ) for r in rows]
+
+
+def _time(fn: Callable, repeat: int) -> float:
+    """Median seconds per call."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def run_inprocess(args) -> List[dict]:
+    adapter = TypeAdapter(List[schemas.TaskOut])
+    results = []
+    for n in args.tasks:
+        rows = _rows(n, args.comments_per_task, random.Random(args.seed))
+        models = _build(rows)
+        content = adapter.dump_python(adapter.validate_python(models), mode="json")
+        stdlib_body = json.dumps(content, ensure_ascii=False, allow_nan=False,
+                                 indent=None, separators=(",", ":")).encode("utf-8")
+        fast_body = responses.dumps(content)
+        timings = {
+            "build": _time(lambda: _build(rows), args.repeat),
+            "validate": _time(lambda: adapter.dump_python(adapter.validate_python(models), mode="json"), args.repeat),
+            "stdlib": _time(lambda: json.dumps(content, ensure_ascii=False, allow_nan=False,
+                                               separators=(",", ":")).encode("utf-8"), args.repeat),
+            "orjson": _time(lambda: responses.dumps(content), args.repeat),
+            "one-pass": _time(lambda: responses.dumps(rows), args.repeat),
+            "gzip": _time(lambda: compression.compress(fast_body, "gzip"), args.repeat),
+        }
+        sizes = {"json": len(fast_body), "gzip": len(compression.compress(fast_body, "gzip"))}
+        if compression.brotli:
+            timings["br"] = _time(lambda: compression.compress(fast_body, "br"), args.repeat)
+            sizes["br"] = len(compression.compress(fast_body, "br"))
+        results.append({
+            "tasks": n,
+            "comments": sum(len(r["comments"]) for r in rows),
+            "same_content": json.loads(stdlib_body) == json.loads(fast_body),
+            "ms": {k: round(v * 1000, 3) for k, v in timings.items()},
+            "bytes": sizes,
+            "orjson_speedup": round(timings["stdlib"] / timings["orjson"], 1) if timings["orjson"] else None,
+        })
+    return results
+
+
+def run_live(args) -> List[dict]:
+    import httpx
+
+    results = []
+    headers = {"Authorization": f"Bearer {args.token}"}
+    with httpx.Client(base_url=args.app, timeout=60) as client:
+        for encoding in ("identity", "gzip", "br"):
+            latencies, wire = [], None
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                with client.stream("GET", f"/projects/{args.project}/tasks",
+                                   headers={**headers, "Accept-Encoding": encoding}) as res:
+                    res.raise_for_status()
+                    raw = b"".join(res.iter_raw())
+                latencies.append(time.perf_counter() - started)
+                wire = len(raw)
+            results.append({
+                "accept_encoding": encoding,
+                "content_encoding": res.headers.get("content-encoding", "identity"),
+                "bytes_on_wire": wire,
+                "median_ms": round(statistics.median(latencies) * 1000, 2),
+                "server_timing": res.headers.get("server-timing"),
+            })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, nargs="+", default=[100, 1000, 5000], help="board sizes")
+    parser.add_argument("--comments-per-task", type=float, default=3.0, help="mean")
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--app", help="measure a running app instead (needs --token and --project)")
+    parser.add_argument("--token")
+    parser.add_argument("--project", type=int)
+    parser.add_argument("--json", action="store_true", help="print the raw JSON report")
+    args = parser.parse_args()
+
+    if args.app:
+        if not (args.token and args.project):
+            parser.error("--app needs --token and --project")
+        report = run_live(args)
+        if args.json:
+            print(json.dumps(report, indent=2))
+            return
+        print(f"{'accept':<10}{'encoding':<10}{'bytes':>10}{'median ms':>11}")
+        for r in report:
+            print(f"{r['accept_encoding']:<10}{r['content_encoding']:<10}{r['bytes_on_wire']:>10}{r['median_ms']:>11}")
+        return
+
+    report = run_inprocess(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    stages = [s for s in ("build", "validate", "stdlib", "orjson", "one-pass", "gzip", "br") if s in report[0]["ms"]]
+    print(f"encoder: {'orjson' if responses.orjson else 'stdlib (orjson not installed)'}, "
+          f"brotli: {'yes' if compression.brotli else 'no'}")
+    print(f"{'tasks':>6}{'comments':>10}" + "".join(f"{s + ' ms':>12}" for s in stages)
+          + f"{'json B':>11}{'gzip B':>10}" + (f"{'br B':>10}" if compression.brotli else ""))
+    for r in report:
+        print(f"{r['tasks']:>6}{r['comments']:>10}" + "".join(f"{r['ms'][s]:>12}" for s in stages)
+              + f"{r['bytes']['json']:>11}{r['bytes']['gzip']:>10}"
+              + (f"{r['bytes']['br']:>10}" if compression.brotli else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+bench/startup_bench.py – cold start: time to first response and import cost
+
+Spawns `uvicorn main:app` on a fresh temp SQLite DB several times and
+measures, per boot, the time from spawn until the first request succeeds
+(what a user waking a sleeping Render instance waits for), the app's own
+import time (teamsync_startup_import_seconds), RSS, and the first request
+to each lazily loaded router (the deferred part of the cost):
+
+    python bench/startup_bench.py --runs 5
+
+--warm reuses one DB across boots, so later boots take the schema
+fingerprint path instead of create_all. --imports prints an import-time
+profile of `import main` instead (python -X importtime, aggregated):
+
+    python bench/startup_bench.py --imports --top 25
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from common import free_port, rss_mb
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_PATHS = ("/ai/diagnostics", "/chat/metrics")  # the first answer (even a 401) pays the import
+_IMPORT_RE = re.compile(r"^teamsync_startup_import_seconds ([0-9.e+-]+)$", re.M)
+
+
+def _env(db_path: str) -> dict:
+    return dict(os.environ, USE_SQLITE="1", SQLITE_PATH=f"sqlite:///{db_path}", LOG_LEVEL="WARNING")
+
+
+# ---------- time to first response ----------
+
+def boot_once(db_path: str, path: str, timeout: float) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=_env(db_path), stdout=subprocess.DEVNULL,
+    )
+    try:
+        first = None
+        with httpx.Client(base_url=url, timeout=5) as client:
+            while time.perf_counter() - started < timeout:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"app exited with {proc.returncode}")
+                try:
+                    if client.get(path).status_code < 500:
+                        first = time.perf_counter() - started
+                        break
+                except httpx.TransportError:
+                    time.sleep(0.01)
+            if first is None:
+                raise RuntimeError(f"{url}{path} did not answer within {timeout}s")
+            match = _IMPORT_RE.search(client.get("/metrics").text)
+            rss_ready = rss_mb(proc.pid)
+            lazy = {}
+            for lazy_path in LAZY_PATHS:
+                t = time.perf_counter()
+                client.get(lazy_path)
+                lazy[lazy_path] = round((time.perf_counter() - t) * 1000, 1)
+        return {
+            "first_response_ms": round(first * 1000, 1),
+            "import_ms": round(float(match.group(1)) * 1000, 1) if match else None,
+            "rss_mb_ready": rss_ready,
+            "rss_mb_after_lazy": rss_mb(proc.pid),
+            "first_lazy_request_ms": lazy,
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def run_boots(args) -> dict:
+    tmp = tempfile.mkdtemp(prefix="teamsync-startup-")
+    boots = []
+    for i in range(args.runs):
+        db_path = os.path.join(tmp, "warm.db" if args.warm else f"cold{i}.db")
+        boots.append(boot_once(db_path, args.path, args.timeout))
+    firsts = [b["first_response_ms"] for b in boots]
+    return {
+        "path": args.path,
+        "warm_db": args.warm,
+        "first_response_ms": {"median": round(statistics.median(firsts), 1),
+                              "min": min(firsts), "max": max(firsts)},
+        "boots": boots,
+    }
+
+
+# ---------- import profile ----------
+
+def import_profile(top: int) -> dict:
+    """Aggregate `python -X importtime -c "import main"` (microseconds in, ms out)."""
+    tmp = tempfile.mkdtemp(prefix="teamsync-startup-")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=_env(os.path.join(tmp, "imports.db")), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    by_package: Dict[str, int] = {}
+    for name, self_us, _, _ in rows:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    direct = [r for r in rows if r[3] == 1]  # imported by main itself
+    total = next((r[2] for r in rows if r[0] == "main"), sum(r[1] for r in rows))
+
+    def ms(us: int) -> float:
+        return round(us / 1000, 1)
+
+    return {
+        "total_ms": ms(total),
+        "modules": len(rows),
+        "by_package_ms": {k: ms(v) for k, v in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]},
+        "main_imports_ms": {r[0]: ms(r[2]) for r in sorted(direct, key=lambda r: -r[2])[:top]},
+        "slowest_self_ms": {r[0]: ms(r[1]) for r in sorted(rows, key=lambda r: -r[1])[:top]},
+    }
+
+
+def _print_table(title: str, values: Dict[str, float]) -> None:
+    print(f"\n{title}")
+    for name, value in values.items():
+        print(f"  {name:<40}{value:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/health/db", help="first request to wait for")
+    parser.add_argument("--warm", action="store_true", help="reuse one DB across boots")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--imports", action="store_true", help="import-time profile of `import main`")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true", help="print the raw JSON report")
+    args = parser.parse_args()
+
+    report = import_profile(args.top) if args.imports else run_boots(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    if args.imports:
+        print(f"import main: {report['total_ms']} ms across {report['modules']} modules")
+        _print_table("cumulative ms per module imported by main", report["main_imports_ms"])
+        _print_table("self ms per top-level package", report["by_package_ms"])
+        _print_table("slowest modules (self ms)", report["slowest_self_ms"])
+        return
+    s = report["first_response_ms"]
+    print(f"time to first {report['path']} response: median {s['median']} ms (min {s['min']}, max {s['max']}), "
+          f"{'warm' if report['warm_db'] else 'fresh'} DB")
+    print(f"{'boot':>4}{'first ms':>10}{'import ms':>11}{'rss MB':>8}  first lazy request ms")
+    for i, b in enumerate(report["boots"], 1):
+        lazy = ", ".join(f"{p} {v}" for p, v in b["first_lazy_request_ms"].items())
+        print(f"{i:>4}{b['first_response_ms']:>10}{str(b['import_ms']):>11}{str(b['rss_mb_ready']):>8}  {lazy}")
+
+
+if __name__ == "__main__":
+    main()
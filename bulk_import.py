@@ -0,0 +1,285 @@
+"""
+bulk_import.py – streaming CSV / NDJSON import of projects & tasks
+
+Rows are read lazily, validated in batches against schemas.TaskImportRow and
+written with a single multi-row INSERT per batch (or Postgres COPY), so large
+boards import without the per-task commit/refresh of the form endpoint.
+
+Row fields: title (required), description, status, due_date and – when no
+target project is given – project (project title, created if missing).
+
+CLI usage:
+    python bulk_import.py tasks.ndjson --owner-email me@example.com
+    python bulk_import.py board.csv --owner-email me@example.com --project-id 3
+"""
+
+import csv
+import io
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import models, schemas
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ("csv", "ndjson")
+
+_TASK_COLUMNS = ("title", "description", "status", "due_date", "project_id")
+
+
+# ---------- Parsing ----------
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> str:
+    """Pick csv/ndjson from an explicit value or the file extension."""
+    fmt = (explicit or "").lower()
+    if not fmt and filename:
+        name = filename.lower()
+        if name.endswith((".ndjson", ".jsonl", ".json")):
+            fmt = "ndjson"
+        elif name.endswith(".csv"):
+            fmt = "csv"
+    if fmt not in FORMATS:
+        raise ValueError("Unknown import format; use csv or ndjson")
+    return fmt
+
+
+def iter_rows(stream: io.TextIOBase, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield (row_number, raw_row) lazily; malformed rows yield an Exception.
+
+    Text is decoded as it is read, so bytes that are not valid UTF-8 end the
+    import: the row where decoding failed is reported and nothing after it is
+    read (earlier batches stay committed).
+    """
+    if fmt == "csv":
+        lines = iter(csv.DictReader(stream))
+        n = 1  # DictReader numbers data rows after the header line
+    else:
+        lines = iter(stream)
+        n = 0
+    while True:
+        n += 1
+        try:
+            raw = next(lines)
+        except StopIteration:
+            return
+        except UnicodeDecodeError as e:
+            yield n, ValueError(f"file is not valid UTF-8 ({e.reason}); "
+                                "this row and the rest of the file were not imported")
+            return
+        except csv.Error as e:
+            yield n, e
+            continue
+        if fmt == "csv":
+            yield n, raw
+            continue
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            yield n, json.loads(line)
+        except ValueError as e:
+            yield n, e
+
+
+def _clean(raw: dict) -> dict:
+    # CSV gives "" for missing cells – treat those as absent so defaults apply
+    return {
+        (k or "").strip(): v for k, v in raw.items()
+        if v is not None and not (isinstance(v, str) and not v.strip())
+    }
+
+
+def _error_text(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}"
+            for err in exc.errors()
+        )
+    return str(exc)
+
+
+# ---------- Writing ----------
+
+def _resolve_projects(db: Session, owner_id: int, titles: Iterable[str],
+                      cache: Dict[str, int]) -> int:
+    """Map project titles to ids for this owner, creating missing ones."""
+    wanted = {t for t in titles if t not in cache}
+    if not wanted:
+        return 0
+    for pid, title in db.query(models.Project.id, models.Project.title).filter(
+        models.Project.owner_id == owner_id,
+        models.Project.title.in_(wanted)
+    ):
+        cache.setdefault(title, pid)
+    missing = [t for t in wanted if t not in cache]
+    new = [models.Project(title=t, owner_id=owner_id) for t in missing]
+    if new:
+        db.add_all(new)
+        db.flush()
+        for proj in new:
+            cache[proj.title] = proj.id
+    return len(new)
+
+
+def _copy_tasks(db: Session, rows: List[dict]) -> None:
+    """Postgres fast path: stream the batch through COPY ... FROM STDIN."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for r in rows:
+        due = r["due_date"]
+        writer.writerow([
+            r["title"], r["description"], r["status"],
+            due.isoformat() if due else None, r["project_id"],
+        ])
+    buf.seek(0)
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY tasks ({', '.join(_TASK_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buf
+        )
+    finally:
+        cursor.close()
+
+
+def _write_batch(db: Session, rows: List[dict], use_copy: bool) -> None:
+    if use_copy:
+        _copy_tasks(db, rows)
+    else:
+        # executemany – SQLAlchemy packs this into multi-row INSERT statements
+        db.execute(insert(models.Task), rows)
+    db.commit()
+
+
+# ---------- Import ----------
+
+def import_tasks(
+    db: Session,
+    owner_id: int,
+    rows: Iterable[Tuple[int, object]],
+    project_id: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    use_copy: bool = False,
+) -> schemas.ImportReport:
+    """Validate and insert rows batch by batch, collecting per-row errors.
+
+    With project_id every row lands in that project (caller checks access);
+    otherwise each row's `project` title is resolved for owner_id.
+    Invalid rows are reported on their own; valid rows are written in
+    batches that commit independently, so a database error (constraint,
+    COPY failure) fails the rows of that one batch and no others.
+    """
+    if use_copy and db.get_bind().dialect.name != "postgresql":
+        use_copy = False
+    report = schemas.ImportReport()
+    project_ids: Dict[str, int] = {}
+    pending: List[Tuple[int, schemas.TaskImportRow]] = []
+
+    def record_error(row: int, message: str) -> None:
+        report.failed += 1
+        if len(report.errors) < MAX_REPORTED_ERRORS:
+            report.errors.append(schemas.ImportRowError(row=row, error=message))
+        else:
+            report.errors_truncated = True
+
+    def flush() -> None:
+        if not pending:
+            return
+        known = set(project_ids)
+        try:
+            created = 0
+            if project_id is None:
+                created = _resolve_projects(
+                    db, owner_id, (r.project for _, r in pending), project_ids
+                )
+            batch = [
+                {
+                    "title": r.title,
+                    "description": r.description,
+                    "status": r.status.value,
+                    "due_date": r.due_date,
+                    "project_id": project_id or project_ids[r.project],
+                }
+                for _, r in pending
+            ]
+            _write_batch(db, batch, use_copy)
+            report.inserted += len(batch)
+            report.projects_created += created
+        except Exception as e:
+            db.rollback()
+            # Projects created for this batch were rolled back with it
+            for title in set(project_ids) - known:
+                del project_ids[title]
+            for n, _ in pending:
+                record_error(n, f"Batch insert failed: {e}")
+        pending.clear()
+
+    for n, raw in rows:
+        if isinstance(raw, Exception):
+            record_error(n, f"Malformed row: {raw}")
+            continue
+        if not isinstance(raw, dict):
+            record_error(n, "Row must be an object")
+            continue
+        try:
+            row = schemas.TaskImportRow.model_validate(_clean(raw))
+            if project_id is None and not row.project:
+                raise ValueError("project: required when importing without a target project")
+        except (ValidationError, ValueError) as e:
+            record_error(n, _error_text(e))
+            continue
+        pending.append((n, row))
+        if len(pending) >= batch_size:
+            flush()
+    flush()
+    return report
+
+
+# ---------- CLI ----------
+
+def main(argv=None) -> int:
+    import argparse
+    import sys
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk import tasks from CSV or NDJSON")
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--owner-email", required=True, help="user that owns the imported projects")
+    parser.add_argument("--project-id", type=int, help="import every row into this project")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--copy", action="store_true", help="use Postgres COPY when available")
+    args = parser.parse_args(argv)
+
+    fmt = detect_format(None if args.path == "-" else args.path, args.format)
+    db = SessionLocal()
+    try:
+        owner = db.query(models.User).filter(models.User.email == args.owner_email).first()
+        if not owner:
+            print(f"❌ No user with email {args.owner_email}")
+            return 1
+        if args.project_id is not None and not db.query(models.Project).filter_by(
+            id=args.project_id, owner_id=owner.id
+        ).first():
+            print(f"❌ Project {args.project_id} not found for {args.owner_email}")
+            return 1
+        stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+        with stream:
+            report = import_tasks(
+                db, owner.id, iter_rows(stream, fmt),
+                project_id=args.project_id,
+                batch_size=args.batch_size,
+                use_copy=args.copy,
+            )
+    finally:
+        db.close()
+    print(report.model_dump_json(indent=2))
+    return 0 if not report.failed else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+"""
+compression.py – Accept-Encoding negotiated gzip / brotli for API responses
+
+CompressionMiddleware compresses complete (single-message) response bodies
+of at least COMPRESS_MIN_SIZE bytes with the best encoding the client
+accepts: br when the `brotli` package is installed, else gzip. Streaming
+responses (SSE, file downloads), bodies that already carry a
+Content-Encoding, and already-compressed media types pass through untouched.
+
+JSON compresses 5-10x, so on large boards the bytes saved on the wire are
+worth far more than the few milliseconds of CPU; small bodies are not worth
+it and stay as they are.
+"""
+
+import gzip
+import os
+from typing import Dict, Optional
+
+import anyio.to_thread
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))  # 4-5: near gzip speed, smaller output
+THREAD_MIN_SIZE = 256 * 1024  # compress bigger bodies off the event loop
+
+_SKIP_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip",
+               "application/pdf", "text/event-stream")
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """{"gzip": 1.0, "br": 0.8, ...}; a q=0 entry means "not acceptable"."""
+    out = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        out[name] = q
+    return out
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    options = [e for e in (("br",) if brotli else ()) + ("gzip",)
+               if accepted.get(e, wildcard) > 0]
+    if not options:
+        return None
+    # Highest q wins; on a tie the list order prefers br
+    return max(options, key=lambda e: accepted.get(e, wildcard))
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MIN_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message  # hold until we have seen the body
+                return
+            if message["type"] != "http.response.body":  # e.g. debug, pathsend, trailers
+                if start is not None:
+                    passthrough = True
+                    await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            response_headers = {k.lower(): v for k, v in start.get("headers", [])}
+            content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+            if (message.get("more_body") or len(body) < self.minimum_size
+                    or b"content-encoding" in response_headers
+                    or content_type.startswith(_SKIP_TYPES)):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= THREAD_MIN_SIZE:
+                compressed = await anyio.to_thread.run_sync(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            new_headers = [(k, v) for k, v in start.get("headers", [])
+                           if k.lower() not in (b"content-length", b"vary")]
+            vary = response_headers.get(b"vary")
+            new_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"),
+            ]
+            await send({**start, "headers": new_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -8,9 +8,13 @@ Enhancements:
  - Removes hard‑coded secrets from source (encourage env usage)
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateIndex, CreateTable
+import hashlib
+import logging
 import os
 from urllib.parse import quote_plus, urlparse, parse_qsl, urlencode, urlunparse
 from dotenv import load_dotenv
@@ -102,6 +106,51 @@ def get_db():
     finally:
         db.close()
 
+# -------------------------------
+# Startup schema check: skip create_all when the DDL has not changed
+# -------------------------------
+# Kept out of Base.metadata so Alembic never manages it
+SCHEMA_TABLE = "schema_fingerprint"
+_schema_meta = MetaData()
+_schema_state = Table(
+    SCHEMA_TABLE, _schema_meta,
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+)
+
+
+def schema_fingerprint(metadata) -> str:
+    """sha256 of the DDL create_all would emit for this engine's dialect."""
+    h = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        h.update(str(CreateTable(table).compile(dialect=engine.dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            h.update(str(CreateIndex(index).compile(dialect=engine.dialect)).encode())
+    return h.hexdigest()
+
+
+def ensure_schema(metadata) -> bool:
+    """create_all unless the stored fingerprint matches; True if it ran.
+
+    The check is one SELECT, where create_all inspects every table (one
+    round trip each on Postgres).
+    """
+    fingerprint = schema_fingerprint(metadata)
+    try:
+        with engine.connect() as conn:
+            stored = conn.execute(select(_schema_state.c.fingerprint).where(_schema_state.c.id == 1)).scalar()
+    except DBAPIError:  # table not created yet
+        stored = None
+    if stored == fingerprint:
+        return False
+    metadata.create_all(bind=engine)
+    _schema_meta.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(_schema_state.delete())
+        conn.execute(_schema_state.insert().values(id=1, fingerprint=fingerprint))
+    return True
+
+
 # Utility: quick runtime summary (only printed once when imported in dev)
 if os.getenv("PRINT_DB_INFO", "0") == "1":
-    print(f"[DB] Using {DB_KIND} database -> {DATABASE_URL}")
+    logging.getLogger("teamsync.db").info("Using %s database -> %s", DB_KIND, DATABASE_URL)
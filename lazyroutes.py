@@ -0,0 +1,86 @@
+"""
+lazyroutes.py – import rarely used routers on their first request
+
+The assistant (httpx, governor, retrieval, summarizer) and chat (pub/sub,
+write-behind store) routers serve a small share of requests but add tens of
+milliseconds to every cold start. LazyRouter stands in for such a router:
+a placeholder route claims its path prefixes, and the first HTTP or
+WebSocket request under them imports the module, swaps the real routes in
+at the placeholder's position and is then routed normally. The OpenAPI
+schema loads everything first so /docs stays complete.
+
+LAZY_ROUTERS=0 imports them all at startup instead.
+"""
+
+import importlib
+import logging
+import os
+import sys
+from time import perf_counter
+from types import ModuleType
+from typing import List, Optional, Sequence
+
+from starlette.routing import BaseRoute, Match, NoMatchFound
+
+ENABLED = os.getenv("LAZY_ROUTERS", "1") == "1"
+
+log = logging.getLogger("teamsync.startup")
+
+_placeholders: List["LazyRouter"] = []
+
+
+class LazyRouter(BaseRoute):
+    """Placeholder for `module.router`, mounted under `prefixes`."""
+
+    def __init__(self, app, module: str, prefixes: Sequence[str]) -> None:
+        self.app = app
+        self.module = module
+        self.prefixes = tuple(prefixes)
+
+    def matches(self, scope):
+        if scope["type"] in ("http", "websocket") and scope["path"].startswith(self.prefixes):
+            return Match.FULL, {}
+        return Match.NONE, {}
+
+    async def handle(self, scope, receive, send):
+        self.load()
+        # Route again; the placeholder is gone, so the real route matches
+        await self.app.router(scope, receive, send)
+
+    def url_path_for(self, name, /, **path_params):
+        raise NoMatchFound(name, path_params)  # nothing reverses into lazy routers
+
+    def load(self) -> ModuleType:
+        """Import the module and replace this placeholder with its routes."""
+        started = perf_counter()
+        mod = importlib.import_module(self.module)
+        routes = self.app.router.routes
+        if self in routes:
+            count = len(routes)
+            self.app.include_router(mod.router)
+            added = routes[count:]
+            del routes[count:]
+            position = routes.index(self)
+            routes[position:position + 1] = added
+            self.app.openapi_schema = None
+            log.info("Loaded %s on demand in %.1f ms", self.module, (perf_counter() - started) * 1000)
+        return mod
+
+
+def include(app, module: str, prefixes: Sequence[str]) -> None:
+    """app.include_router(module.router), deferred until first use when ENABLED."""
+    route = LazyRouter(app, module, prefixes)
+    app.router.routes.append(route)
+    _placeholders.append(route)
+    if not ENABLED:
+        route.load()
+
+
+def load_all() -> None:
+    for route in _placeholders:
+        route.load()
+
+
+def loaded(module: str) -> Optional[ModuleType]:
+    """The module if it has been imported, else None (for shutdown hooks, gauges)."""
+    return sys.modules.get(module)
@@ -0,0 +1,202 @@
+"""
+logs.py – structured, non-blocking logging
+
+setup() routes every stdlib logger through a bounded in-memory queue; a
+background QueueListener thread formats and writes the records, so a log
+call on the event loop costs a dict copy and a queue put, never a stdout
+write. When the queue is full records are dropped (and counted) rather
+than blocking the caller.
+
+ - LOG_FORMAT=json (default): one JSON object per line with ts, level,
+   logger, msg, request_id and any `extra={...}` fields; LOG_FORMAT=text
+   for local development
+ - RequestIdMiddleware: takes X-Request-ID from the client (or makes one),
+   echoes it on the response and stamps it on every record logged while
+   the request runs, including from threadpool code
+ - sampling: records logged with extra={"sampled": True} (per-request
+   access lines, AI request/reply traces) are kept for LOG_SAMPLE_RATE of
+   requests, decided per request id so a kept request logs completely;
+   warnings and errors are never sampled out
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+import zlib
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Optional
+
+from metrics import route_label
+
+LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+FORMAT = os.getenv("LOG_FORMAT", "json")
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "sampled",
+}
+
+
+def _keep(rid: Optional[str]) -> bool:
+    if SAMPLE_RATE >= 1:
+        return True
+    key = rid or uuid.uuid4().hex
+    return zlib.crc32(key.encode()) / 2**32 < SAMPLE_RATE
+
+
+# ---------- formatters ----------
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            out["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                out[key] = value
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        rid = getattr(record, "request_id", None)
+        line = f"[{record.levelname}] {record.name}: {record.getMessage()}" + (f" (rid={rid})" if rid else "")
+        extra = {k: v for k, v in vars(record).items() if k not in _RESERVED}
+        if extra:
+            line += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+# ---------- queue handler ----------
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Stamps the request id, applies sampling, never blocks."""
+
+    def __init__(self, q: queue.Queue) -> None:
+        super().__init__(q)
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render args / traceback now (the objects may change later), keep
+        # the record's extra fields for the formatter on the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        rid = request_id.get()
+        record.request_id = rid
+        if getattr(record, "sampled", False) and record.levelno < logging.WARNING and not _keep(rid):
+            self.sampled_out += 1
+            return
+        try:
+            self.enqueue(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put_nowait(record)
+
+
+handler: Optional[_QueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup() -> None:
+    """Install the queue handler on the root logger (idempotent)."""
+    global handler, _listener
+    if handler is not None:
+        return
+    q: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if FORMAT == "text" else JsonFormatter())
+    handler = _QueueHandler(q)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(LEVEL)
+    # httpx logs every request URL at INFO – Gemini calls carry the API key in it
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    _listener = logging.handlers.QueueListener(q, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """Flush what is queued and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def stats() -> dict:
+    if handler is None:
+        return {}
+    return {"queued": handler.queue.qsize(), "dropped": handler.dropped, "sampled_out": handler.sampled_out}
+
+
+# ---------- ASGI middleware ----------
+
+_access = logging.getLogger("teamsync.access")
+
+
+class RequestIdMiddleware:
+    """Request-id correlation plus a (sampled) access line per request."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        rid = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        token = request_id.set(rid)
+        started = perf_counter()
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", rid.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if scope["type"] == "http":
+                _access.info("request", extra={
+                    "sampled": True, "method": scope["method"], "route": route_label(scope),
+                    "status": status or 500, "duration_ms": round((perf_counter() - started) * 1000, 2),
+                })
+            request_id.reset(token)
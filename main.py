@@ -1,69 +1,137 @@
 """
 main.py – FastAPI app startup
 """
+from time import perf_counter
+
+_import_started = perf_counter()
+
 from dotenv import load_dotenv
+import logging
 import os
+
+# .env before any module that reads its settings at import time (logs, metrics)
+load_dotenv()
+
+import logs
+
+# Structured logging first, so import-time messages go through the queue too
+logs.setup()
+
 from fastapi import FastAPI, Request, Depends, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.openapi.utils import get_openapi
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 
 
 from models import Base
-from database import engine, get_db
+from database import engine, ensure_schema, get_db
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from auth import router as auth_router
 from routers import (
     users, projects, tasks, comments, members,
-    analytics, chat
+    analytics, imports, profiles
 )
-from routers import assistant
+import lazyroutes
+import access
+import metrics
+import querytrace
+import profiling
+import compression
+import assets
+from responses import FastJSONResponse
 
 
 
-# ---------- Load environment ----------
-load_dotenv()
+log = logging.getLogger("teamsync.startup")
+
+# ---------- Environment checks ----------
 if not os.getenv("GEMINI_API_KEY"):
     # Non-fatal warning; only features needing the key will fail later.
-    print("[WARN] GEMINI_API_KEY not set – assistant features may be limited.")
+    log.warning("GEMINI_API_KEY not set – assistant features may be limited.")
 
 # ---------- App & DB ----------
  
-app = FastAPI()
-
-# Simple timing middleware (dev) to inspect slow endpoints locally
-@app.middleware("http")
-async def add_process_time_header(request, call_next):
-    from time import perf_counter
-    start = perf_counter()
-    response = await call_next(request)
-    duration = (perf_counter() - start) * 1000
-    # Only attach for JSON/HTML (skip static) to keep noise low
-    if request.url.path.startswith(('/projects','/tasks','/dashboard','/members','/analytics','/profile')):
-        response.headers['X-Process-Time-ms'] = f"{duration:.1f}"
-    return response
+# orjson-backed by default (stdlib json when orjson is missing)
+app = FastAPI(default_response_class=FastJSONResponse)
+
+# Request / DB metrics for /metrics (also sets a Server-Timing header)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.install_db_events(engine)
+
+# QUERY_TRACE=1: fingerprint each request's SQL, log N+1 shapes / budget overruns
+if querytrace.ENABLED:
+    app.add_middleware(querytrace.QueryTraceMiddleware)
+    querytrace.install(engine)
+    for (method, route), max_queries in querytrace.ROUTE_BUDGETS.items():
+        querytrace.set_budget(method, route, max_queries)
+
+# PROFILE_TOKEN / PROFILE_SAMPLE_RATE: stack samples + allocations per request
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# gzip / brotli for bodies over COMPRESS_MIN_SIZE, per Accept-Encoding
+app.add_middleware(compression.CompressionMiddleware)
+
+# Outermost: request id on every log record and response, sampled access log
+app.add_middleware(logs.RequestIdMiddleware)
 
 # Log DB URL (without password) at startup for diagnostics
 @app.on_event("startup")
 async def startup_banner():
     try:
         safe_url = engine.url.render_as_string(hide_password=True)
-        print(f"[STARTUP] Using database: {safe_url}")
+        log.info("Using database: %s", safe_url)
         # Auto-create tables for local sqlite OR when explicitly requested
         backend = engine.url.get_backend_name()
         if backend.startswith('sqlite') or os.getenv('MIGRATE_ON_START') == '1':
-            from models import Base  # local import to avoid circulars
-            Base.metadata.create_all(bind=engine)
-            print("[STARTUP] Ensured database schema (auto create_all).")
+            if ensure_schema(Base.metadata):
+                log.info("Ensured database schema (auto create_all).")
+            else:
+                log.info("Database schema fingerprint unchanged, skipped create_all.")
     except Exception as e:
-        print(f"[STARTUP][WARN] Startup tasks failed: {e}")
+        log.warning("Startup tasks failed: %s", e)
+
+# Flush buffered chat messages and release pub/sub subscriptions on exit
+@app.on_event("shutdown")
+async def shutdown_chat():
+    chat = lazyroutes.loaded("routers.chat")
+    if chat is not None:
+        await chat.history_store.close()
+        await chat.manager.close()
+
+# Drain queued log records last
+@app.on_event("shutdown")
+async def shutdown_logging():
+    logs.shutdown()
+
+# Event loop lag sampling for /metrics
+@app.on_event("startup")
+async def startup_loop_monitor():
+    metrics.start_loop_monitor()
+
+@app.on_event("shutdown")
+async def shutdown_loop_monitor():
+    metrics.stop_loop_monitor()
+
+# Shared keep-alive HTTP client for the AI assistant (created on first use)
+@app.on_event("shutdown")
+async def shutdown_ai_client():
+    ai_http = lazyroutes.loaded("ai.http_client")
+    if ai_http is not None:
+        await ai_http.shutdown()
 
 # ---------- Static & Template Mount ----------
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Fingerprinted copies under static/dist/ (cheap when `python assets.py` ran at build time)
+try:
+    assets.build()
+except OSError as e:
+    log.warning("Static asset build failed, serving unhashed URLs: %s", e)
+app.mount("/static", assets.HashedStaticFiles(directory="static"), name="static")
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = assets.asset_url
 
 # ---------- Routers ----------
 app.include_router(auth_router)
@@ -72,9 +140,12 @@ app.include_router(projects.router)
 app.include_router(tasks.router)
 app.include_router(comments.router)
 app.include_router(members.router)
-app.include_router(assistant.router)
+# Imported on their first request (LAZY_ROUTERS=0 to load at startup)
+lazyroutes.include(app, "routers.assistant", ["/ai/"])
 app.include_router(analytics.router)
-app.include_router(chat.router)
+lazyroutes.include(app, "routers.chat", ["/chat/"])
+app.include_router(imports.router)
+app.include_router(profiles.router)
 
 # ---------- Health / Diagnostics ----------
 @app.get("/health/db")
@@ -84,10 +155,42 @@ def health_db(db: Session = Depends(get_db)):
         return {"status": "ok", "database": engine.url.render_as_string(hide_password=True)}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"DB error: {e}")
+
+# Chat socket gauges, sampled when /metrics is scraped (0 until chat is loaded)
+def _chat_gauge(fn):
+    def sample():
+        chat = lazyroutes.loaded("routers.chat")
+        return fn(chat.manager) if chat is not None else 0
+    return sample
+
+metrics.register_gauge("ws_connections", "Open chat WebSocket connections.",
+                       _chat_gauge(lambda m: sum(len(r) for r in m.rooms.values())))
+metrics.register_gauge("ws_rooms", "Chat rooms with at least one local connection.",
+                       _chat_gauge(lambda m: len(m.rooms)))
+metrics.register_gauge("ws_send_queue_depth", "Messages queued across chat connections.",
+                       _chat_gauge(lambda m: sum(c.queue.qsize() for r in m.rooms.values() for c in r.values())))
+metrics.register_gauge("log_records_dropped", "Log records dropped because the log queue was full.",
+                       lambda: logs.stats().get("dropped", 0))
+metrics.register_gauge("access_cache_entries", "Cached (project, user) roles.",
+                       lambda: access.stats()["entries"])
+metrics.register_gauge("access_cache_hits", "Role lookups answered from the cache (cumulative).",
+                       lambda: access.stats()["hits"])
+metrics.register_gauge("access_cache_misses", "Role lookups that queried the database (cumulative).",
+                       lambda: access.stats()["misses"])
+metrics.register_gauge("ws_dropped_messages", "Chat messages dropped for slow consumers (cumulative).",
+                       _chat_gauge(lambda m: m.metrics.dropped))
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    if not metrics.authorized(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Metrics token required")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # ---------- Custom Swagger with JWT Bearer ----------
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
+    lazyroutes.load_all()
     schema = get_openapi(
         title="TeamSync API",
         version="2.0.0",
@@ -146,4 +249,14 @@ async def analytics_page(request: Request):
 # Added missing profile page route so sidebar /profile navigation works
 @app.get("/profile", response_class=HTMLResponse)
 async def profile_page(request: Request):
-    return templates.TemplateResponse("profile.html", {"request": request})
\ No newline at end of file
+    return templates.TemplateResponse("profile.html", {"request": request})
+
+# Import-to-ready timing for cold starts (bench/startup_bench.py measures from spawn)
+_import_seconds = perf_counter() - _import_started
+metrics.register_gauge("startup_import_seconds", "Time spent importing and configuring the app module.",
+                       lambda: _import_seconds)
+
+@app.on_event("startup")
+async def startup_timing():
+    log.info("App ready: import %.0f ms, startup hooks done %.0f ms later",
+             _import_seconds * 1000, (perf_counter() - _import_started - _import_seconds) * 1000)
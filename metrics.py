@@ -0,0 +1,330 @@
+"""
+metrics.py – Prometheus metrics for HTTP, DB, threadpool and WebSocket load
+
+Collection is cheap enough to stay on in production: every thread writes to
+its own shard of plain dicts (no locks on the hot path) and shards are only
+summed when /metrics is scraped. Routes are labelled by their template
+(`/projects/{project_id}/tasks`), never the raw path, to bound cardinality.
+
+ - MetricsMiddleware: request count by status, latency histogram, in-flight
+   gauge, and per-request DB query count / time; also sets Server-Timing
+ - install_db_events(engine): SQLAlchemy cursor events feeding the above
+ - register_gauge(): sampled-at-scrape values (threadpool, chat sockets, ...)
+ - start_loop_monitor(): event loop lag, i.e. how late a timer fires
+"""
+
+import asyncio
+import contextvars
+import hmac
+import os
+import threading
+from bisect import bisect_left
+from collections import deque
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import anyio.to_thread
+from sqlalchemy import event
+
+PREFIX = "teamsync_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# name -> (type, help, buckets)
+_META: Dict[str, Tuple[str, str, Optional[tuple]]] = {
+    "http_requests_total": ("counter", "HTTP requests by route and status.", None),
+    "http_request_duration_seconds": ("histogram", "Time to response headers per route.", LATENCY_BUCKETS),
+    "http_requests_in_flight": ("gauge", "HTTP requests currently being handled.", None),
+    "db_queries_total": ("counter", "SQL statements executed.", None),
+    "db_query_duration_seconds": ("histogram", "Time per SQL statement.", QUERY_TIME_BUCKETS),
+    "db_queries_per_request": ("histogram", "SQL statements per HTTP request.", QUERY_COUNT_BUCKETS),
+    "db_time_per_request_seconds": ("histogram", "Time in SQL per HTTP request.", LATENCY_BUCKETS),
+    "event_loop_lag_seconds": ("histogram", "Event loop scheduling delay, sampled.", LATENCY_BUCKETS),
+}
+_UNLABELLED = {"http_requests_in_flight", "db_queries_total"}
+
+
+# ---------- per-thread shards ----------
+
+class _Shard:
+    __slots__ = ("values", "histograms")
+
+    def __init__(self) -> None:
+        self.values: Dict[Tuple[str, Labels], float] = {}
+        # per-bucket (non-cumulative) counts, then +Inf count, then sum
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+
+
+_shards: List[_Shard] = []
+_shards_lock = threading.Lock()  # only taken once per new thread
+_local = threading.local()
+
+
+def _shard() -> _Shard:
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def inc(name: str, labels: Labels = (), value: float = 1.0) -> None:
+    """Add to a counter (or gauge, with a negative value) in this thread's shard."""
+    values = _shard().values
+    key = (name, labels)
+    values[key] = values.get(key, 0.0) + value
+
+
+def observe(name: str, value: float, labels: Labels = ()) -> None:
+    buckets = _META[name][2]
+    histograms = _shard().histograms
+    key = (name, labels)
+    h = histograms.get(key)
+    if h is None:
+        h = histograms[key] = [0.0] * (len(buckets) + 2)
+    h[bisect_left(buckets, value)] += 1
+    h[-1] += value
+
+
+# ---------- scrape-time gauges ----------
+
+_gauges: List[Tuple[str, str, Callable[[], float]]] = []
+
+
+def register_gauge(name: str, help_text: str, fn: Callable[[], float]) -> None:
+    """Expose fn() as a gauge, sampled on each scrape (must be cheap, loop-safe)."""
+    _gauges.append((name, help_text, fn))
+
+
+def _threadpool() -> Dict[str, float]:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "in_use": limiter.borrowed_tokens,
+        "size": limiter.total_tokens,
+        "waiting": limiter.statistics().tasks_waiting,
+    }
+
+
+register_gauge("threadpool_threads_in_use", "Worker threads busy with sync endpoints / dependencies.",
+               lambda: _threadpool()["in_use"])
+register_gauge("threadpool_threads_max", "Worker thread limit (anyio default limiter).",
+               lambda: _threadpool()["size"])
+register_gauge("threadpool_tasks_waiting", "Calls queued for a worker thread (saturation).",
+               lambda: _threadpool()["waiting"])
+
+
+# ---------- event loop lag ----------
+
+LOOP_SAMPLE_INTERVAL = 0.5
+_loop_lag = deque(maxlen=120)  # last ~60s of samples
+_loop_task: Optional[asyncio.Task] = None
+
+
+async def _monitor_loop() -> None:
+    while True:
+        started = perf_counter()
+        await asyncio.sleep(LOOP_SAMPLE_INTERVAL)
+        lag = max(0.0, perf_counter() - started - LOOP_SAMPLE_INTERVAL)
+        _loop_lag.append(lag)
+        observe("event_loop_lag_seconds", lag)
+
+
+def start_loop_monitor() -> None:
+    global _loop_task
+    if _loop_task is None or _loop_task.done():
+        _loop_task = asyncio.get_running_loop().create_task(_monitor_loop())
+
+
+def stop_loop_monitor() -> None:
+    global _loop_task
+    if _loop_task is not None:
+        _loop_task.cancel()
+        _loop_task = None
+
+
+register_gauge("event_loop_lag_max_seconds", "Worst event loop lag over the last minute.",
+               lambda: max(_loop_lag, default=0.0))
+
+
+# ---------- rendering ----------
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def token_required() -> bool:
+    return bool(os.getenv("METRICS_TOKEN"))
+
+
+def authorized(authorization: Optional[str]) -> bool:
+    """True if METRICS_TOKEN is unset or the Authorization header carries it."""
+    token = os.getenv("METRICS_TOKEN")
+    if not token:
+        return True
+    # Constant-time: the comparison must not leak how much of the token matched
+    return authorization is not None and hmac.compare_digest(
+        authorization.encode(), f"Bearer {token}".encode()
+    )
+
+
+def render() -> str:
+    """Text exposition format (0.0.4); call from the event loop."""
+    with _shards_lock:
+        shards = list(_shards)
+    values: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], List[float]] = {}
+    for shard in shards:
+        for key, v in shard.values.copy().items():
+            values[key] = values.get(key, 0.0) + v
+        for key, h in shard.histograms.copy().items():
+            acc = histograms.setdefault(key, [0.0] * len(h))
+            for i, x in enumerate(list(h)):
+                acc[i] += x
+
+    lines = []
+    for name, (kind, help_text, buckets) in _META.items():
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        if kind != "histogram":
+            series = sorted((k[1], v) for k, v in values.items() if k[0] == name)
+            if not series and name in _UNLABELLED:
+                series = [((), 0.0)]
+            for labels, v in series:
+                lines.append(f"{PREFIX}{name}{_fmt_labels(labels)} {_fmt(v)}")
+            continue
+        for labels, h in sorted((k[1], h) for k, h in histograms.items() if k[0] == name):
+            cumulative = 0.0
+            for bound, count in zip(buckets + (float("inf"),), h[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _fmt(bound)
+                lines.append(f"{PREFIX}{name}_bucket{_fmt_labels(labels, (('le', le),))} {_fmt(cumulative)}")
+            lines.append(f"{PREFIX}{name}_sum{_fmt_labels(labels)} {_fmt(round(h[-1], 6))}")
+            lines.append(f"{PREFIX}{name}_count{_fmt_labels(labels)} {_fmt(cumulative)}")
+
+    for name, help_text, fn in _gauges:
+        try:
+            value = fn()
+        except Exception:
+            continue  # a broken collector must not break the scrape
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} gauge")
+        lines.append(f"{PREFIX}{name} {_fmt(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------- per-request DB accounting ----------
+
+class _RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Threadpool calls copy the context, so sync endpoints report into the same object
+_current: contextvars.ContextVar[Optional[_RequestStats]] = contextvars.ContextVar(
+    "metrics_request", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if not started:
+        return
+    elapsed = perf_counter() - started.pop()
+    inc("db_queries_total")
+    observe("db_query_duration_seconds", elapsed)
+    req = _current.get()
+    if req is not None:
+        req.queries += 1
+        req.db_seconds += elapsed
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_started"):
+        conn.info["metrics_started"].pop()
+
+
+def install_db_events(engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+# ---------- ASGI middleware ----------
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path_format", None) or getattr(route, "path", "<unknown>")
+    root = scope.get("app_root_path")
+    if root is not None and scope.get("root_path", "") != root:
+        return scope["root_path"][len(root):] + "/{path}"  # mounted app (static files)
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI (no BaseHTTPMiddleware task hop); WebSockets pass through."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = perf_counter()
+        req = _RequestStats()
+        token = _current.set(req)
+        status = 500
+        elapsed = None
+        inc("http_requests_in_flight")
+
+        async def send_wrapper(message):
+            nonlocal status, elapsed
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = perf_counter() - started
+                timing = (f'app;dur={elapsed * 1000:.1f}, '
+                          f'db;dur={req.db_seconds * 1000:.1f};desc="{req.queries} queries"')
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            inc("http_requests_in_flight", value=-1)
+            if elapsed is None:
+                elapsed = perf_counter() - started
+            route = route_label(scope)
+            labels = (("method", scope["method"]), ("route", route))
+            inc("http_requests_total", labels + (("status", str(status)),))
+            observe("http_request_duration_seconds", elapsed, labels)
+            observe("db_queries_per_request", req.queries, labels)
+            observe("db_time_per_request_seconds", req.db_seconds, labels)
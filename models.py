@@ -4,7 +4,7 @@ models.py – SQLAlchemy ORM models with cascades & enums
 
 from enum import Enum
 from sqlalchemy import (
-    Column, Integer, String, DateTime, Text, ForeignKey
+    Column, Integer, BigInteger, String, DateTime, Text, ForeignKey, Index
 )
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -115,3 +115,42 @@ class Comment(Base):
 
     user = relationship("User")
     task = relationship("Task", back_populates="comments")
+
+    # Keyset pagination / "since" polling walk comments per task by id
+    __table_args__ = (
+        Index("ix_comments_task_id_id", "task_id", "id"),
+    )
+
+
+# ---------- Chat ----------
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+
+    # Time-ordered id assigned when the message is relayed (realtime/store.py),
+    # so clients can resume from it before the row is flushed.
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    room_id = Column(String, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_chat_messages_room_id_id", "room_id", "id"),
+    )
+
+
+# ---------- Assistant ----------
+
+class AssistantMessage(Base):
+    __tablename__ = "assistant_messages"
+
+    id = Column(Integer, primary_key=True)
+    conversation_id = Column(String, nullable=False)
+    role = Column(String, nullable=False)  # user / model / summary
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_assistant_messages_conversation_id_id", "conversation_id", "id"),
+    )
@@ -0,0 +1,265 @@
+"""
+profiling.py – on-demand request profiling and allocation tracing
+
+A request is profiled when it carries `X-Profile-Token: <PROFILE_TOKEN>`, or
+at random for PROFILE_SAMPLE_RATE of requests (0.01 = 1%). While it runs:
+
+ - a sampling profiler thread snapshots every thread's Python stack each
+   PROFILE_INTERVAL_MS (idle loop / worker waits are skipped), so both async
+   endpoints and sync ones in the threadpool show up, at near-zero cost to
+   the request itself
+ - tracemalloc traces allocations; the top-N lines still holding memory at
+   the end of the request are kept, with the peak
+
+Each profile is saved in PROFILE_DIR as <id>.json (route, timings, top
+allocations) plus <id>.folded – collapsed stacks that flamegraph.pl,
+speedscope or inferno read directly. Only one request is profiled at a time;
+the sampler sees the whole process, so concurrent requests appear too
+(stacks are prefixed with the thread name). The response carries
+X-Profile-Id, and routers/profiles.py lists / serves the files.
+"""
+
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import anyio
+import anyio.to_thread
+
+from metrics import route_label
+
+TOKEN = os.getenv("PROFILE_TOKEN") or None
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "25"))
+KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+log = logging.getLogger("teamsync.profiling")
+
+HEADER = "x-profile-token"
+SKIP_PREFIXES = ("/metrics", "/admin/profiles", "/static", "/uploads")
+
+# Leaf frames of a thread that is waiting, not working
+_IDLE = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("base_events.py", "_run_once"),
+}
+
+
+def enabled() -> bool:
+    return bool(TOKEN) or SAMPLE_RATE > 0
+
+
+def authorized(token: Optional[str]) -> bool:
+    return bool(TOKEN) and token is not None and hmac.compare_digest(token.encode(), TOKEN.encode())
+
+
+# ---------- sampling profiler ----------
+
+class StackSampler(threading.Thread):
+    """Collapsed-stack counts for every thread but this one, every `interval`."""
+
+    def __init__(self, interval: float = INTERVAL) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+# ---------- allocation tracing ----------
+
+class AllocationTrace:
+    def __init__(self) -> None:
+        self._owner = not tracemalloc.is_tracing()  # PYTHONTRACEMALLOC may already be on
+        if self._owner:
+            tracemalloc.start()
+            self._baseline = None
+        else:
+            self._baseline = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+
+    def finish(self, limit: int = TOP_ALLOCATIONS) -> dict:
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        if self._owner:
+            tracemalloc.stop()
+            stats = snapshot.statistics("lineno")
+        else:
+            stats = snapshot.compare_to(self._baseline, "lineno")
+        top = []
+        for stat in stats[:limit]:
+            frame = stat.traceback[0]
+            size = getattr(stat, "size_diff", stat.size)
+            count = getattr(stat, "count_diff", stat.count)
+            top.append({"file": frame.filename, "line": frame.lineno, "kb": round(size / 1024, 1), "count": count})
+        return {"peak_kb": round(peak / 1024, 1), "retained_kb": round(current / 1024, 1), "top": top}
+
+
+# ---------- storage ----------
+
+def _paths(profile_id: str) -> Tuple[str, str]:
+    base = os.path.join(PROFILE_DIR, profile_id)
+    return base + ".json", base + ".folded"
+
+
+def _save(meta: dict, folded: str) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    meta_path, folded_path = _paths(meta["id"])
+    with open(folded_path, "w") as f:
+        f.write(folded)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    _prune()
+
+
+def _prune() -> None:
+    metas = sorted(n for n in os.listdir(PROFILE_DIR) if n.endswith(".json"))
+    for name in metas[:-KEEP] if KEEP > 0 else []:
+        for path in _paths(name[:-len(".json")]):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(route: Optional[str] = None, limit: int = 50) -> List[dict]:
+    """Newest first; summary fields only (no allocation list)."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for name in sorted((n for n in os.listdir(PROFILE_DIR) if n.endswith(".json")), reverse=True):
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if route and meta.get("route") != route:
+            continue
+        out.append({k: v for k, v in meta.items() if k != "allocations"})
+        if len(out) >= limit:
+            break
+    return out
+
+
+def profile_path(profile_id: str, kind: str) -> Optional[str]:
+    """Path of a stored profile's json / folded file, or None."""
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = _paths(profile_id)[0 if kind == "json" else 1]
+    return path if os.path.isfile(path) else None
+
+
+# ---------- ASGI middleware ----------
+
+_busy = False  # one profiled request at a time (the sampler is process-wide)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _busy
+        if scope["type"] != "http" or _busy or scope["path"].startswith(SKIP_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        requested = authorized(headers.get(HEADER.encode(), b"").decode("latin-1"))
+        if not requested and not (SAMPLE_RATE and random.random() < SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+
+        _busy = True
+        try:
+            await self._profile(scope, receive, send, requested)
+        finally:
+            _busy = False
+
+    async def _profile(self, scope, receive, send, requested: bool) -> None:
+        profile_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ]
+            await send(message)
+
+        allocations = AllocationTrace()
+        sampler = StackSampler()
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+
+            def finish() -> dict:
+                # Snapshotting every traced allocation takes a while: not on the loop
+                sampler.stop()
+                return allocations.finish()
+
+            # Shielded so a cancelled request still stops tracemalloc and the sampler
+            with anyio.CancelScope(shield=True):
+                allocation_stats = await anyio.to_thread.run_sync(finish)
+            meta = {
+                "id": profile_id,
+                "method": scope["method"],
+                "route": route_label(scope),
+                "path": scope["path"],
+                "status": status,
+                "trigger": "header" if requested else "sampled",
+                "duration_ms": round(elapsed * 1000, 2),
+                "samples": sampler.samples,
+                "interval_ms": round(sampler.interval * 1000, 2),
+                "allocations": allocation_stats,
+            }
+            try:
+                await anyio.to_thread.run_sync(_save, meta, sampler.folded())
+            except OSError as e:
+                log.warning("Could not save profile %s: %s", profile_id, e)
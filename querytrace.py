@@ -0,0 +1,200 @@
+"""
+querytrace.py – opt-in per-request SQL tracing, N+1 detection, query budgets
+
+Enable with QUERY_TRACE=1. Every SQL statement a request runs is reduced to
+a fingerprint (literals and IN-lists collapsed), so the same query shape run
+in a loop shows up as one fingerprint with a high count. After each request
+the middleware logs a warning (logger teamsync.querytrace):
+
+ - "N+1" when one fingerprint ran QUERY_TRACE_N1_THRESHOLD+ times
+ - "Query budget exceeded" when a route ran more statements than set_budget() allows
+
+Violations are also kept in `violations` for inspection. In tests, wrap calls
+in assert_max_queries() (works without QUERY_TRACE):
+
+    with querytrace.assert_max_queries(3):
+        client.get("/projects/1/analytics", headers=h)
+"""
+
+import contextvars
+import logging
+import os
+import re
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from metrics import route_label
+
+ENABLED = os.getenv("QUERY_TRACE", "0") == "1"
+N1_THRESHOLD = int(os.getenv("QUERY_TRACE_N1_THRESHOLD", "3"))
+
+log = logging.getLogger("teamsync.querytrace")
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST_RE = re.compile(r"\(\s*(?:\?|%\([^)]*\)s|%s|:\w+|__\[POSTCOMPILE_\w+\])"
+                            r"(?:\s*,\s*(?:\?|%\([^)]*\)s|%s|:\w+))*\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement shape with literals / placeholder lists collapsed to `?`."""
+    s = _COMMENT_RE.sub(" ", statement)
+    s = _STRING_RE.sub("?", s)
+    s = _NUMBER_RE.sub("?", s)
+    s = _PARAM_LIST_RE.sub("(?)", s)
+    return _SPACE_RE.sub(" ", s).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryTrace:
+    """Statements captured in one scope (a request, or a test block)."""
+
+    def __init__(self) -> None:
+        self.statements: List[Tuple[str, float]] = []  # (fingerprint, seconds)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.statements.append((fingerprint(statement), seconds))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def seconds(self) -> float:
+        return sum(t for _, t in self.statements)
+
+    def repeated(self, threshold: int = N1_THRESHOLD) -> List[Tuple[str, int]]:
+        """Fingerprints run at least `threshold` times – likely N+1 loops."""
+        counts = Counter(fp for fp, _ in self.statements)
+        return [(fp, n) for fp, n in counts.most_common() if n >= threshold]
+
+    def report(self) -> str:
+        counts = Counter(fp for fp, _ in self.statements)
+        lines = [f"{self.count} statements, {self.seconds * 1000:.1f} ms"]
+        lines += [f"  {n}x {fp[:200]}" for fp, n in counts.most_common()]
+        return "\n".join(lines)
+
+
+# Per-request trace (middleware) plus process-wide traces opened by tests;
+# TestClient runs the app in another thread, so tests cannot rely on context.
+_request_trace: contextvars.ContextVar[Optional[QueryTrace]] = contextvars.ContextVar(
+    "query_trace", default=None
+)
+_global_traces: List[QueryTrace] = []
+_global_lock = threading.Lock()
+
+# Statement budgets for the hot routes; main.py installs them and
+# tests/test_query_budgets.py asserts the same numbers
+ROUTE_BUDGETS: Dict[Tuple[str, str], int] = {
+    ("GET", "/projects/{project_id}/analytics"): 3,
+    ("PUT", "/projects/{project_id}/members/{user_id}"): 3,
+    ("GET", "/projects/{project_id}/tasks"): 5,
+    ("PATCH", "/tasks/{task_id}"): 7,
+}
+
+_budgets: Dict[Tuple[str, str], int] = {}
+violations: deque = deque(maxlen=200)  # (kind, method, route, detail)
+
+
+def set_budget(method: str, route: str, max_queries: int) -> None:
+    """Max statements per request for a route template, e.g. ("PATCH", "/tasks/{task_id}")."""
+    _budgets[(method.upper(), route)] = max_queries
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("querytrace_started", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("querytrace_started")
+    if not started:
+        return
+    elapsed = perf_counter() - started.pop()
+    trace = _request_trace.get()
+    if trace is not None:
+        trace.record(statement, elapsed)
+    if _global_traces:
+        with _global_lock:
+            for t in _global_traces:
+                t.record(statement, elapsed)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("querytrace_started"):
+        conn.info["querytrace_started"].pop()
+
+
+def install(engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def trace() -> Iterator[QueryTrace]:
+    """Capture every statement the process runs inside the block."""
+    from database import engine
+    install(engine)
+    t = QueryTrace()
+    with _global_lock:
+        _global_traces.append(t)
+    try:
+        yield t
+    finally:
+        with _global_lock:
+            _global_traces.remove(t)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, allow_repeats: bool = True) -> Iterator[QueryTrace]:
+    """Fail if the block runs more than max_queries statements (or, with
+    allow_repeats=False, any statement shape N1_THRESHOLD+ times)."""
+    with trace() as t:
+        yield t
+    if t.count > max_queries:
+        raise QueryBudgetExceeded(f"expected <= {max_queries} queries, ran {t.report()}")
+    if not allow_repeats and t.repeated():
+        raise QueryBudgetExceeded(f"repeated statement shapes (N+1): {t.report()}")
+
+
+class QueryTraceMiddleware:
+    """Trace each HTTP request; log N+1 patterns and budget overruns."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t = QueryTrace()
+        token = _request_trace.set(t)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_trace.reset(token)
+            self._check(scope, t)
+
+    @staticmethod
+    def _check(scope, t: QueryTrace) -> None:
+        method, route = scope["method"], route_label(scope)
+        for fp, n in t.repeated():
+            violations.append(("n+1", method, route, f"{n}x {fp}"))
+            log.warning("N+1 %s %s: %dx %s", method, route, n, fp[:200])
+        budget = _budgets.get((method, route))
+        if budget is not None and t.count > budget:
+            violations.append(("budget", method, route, f"{t.count} > {budget}"))
+            log.warning("Query budget exceeded %s %s: %d statements (budget %d)\n%s",
+                        method, route, t.count, budget, t.report())
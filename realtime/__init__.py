@@ -0,0 +1 @@
+# Makes 'realtime' a package for reliable imports across environments.
\ No newline at end of file
@@ -0,0 +1,346 @@
+"""realtime/pubsub.py – pluggable pub/sub backends for chat room fan-out.
+
+Every worker publishes room payloads (already-serialized JSON text) to the
+backend and holds one subscription per room that has local sockets; the
+backend hands each payload back through the `deliver(room_id, payload)`
+callback, including to the publishing worker itself.
+
+Backends (CHAT_PUBSUB):
+ - memory   – single process (default)
+ - postgres – LISTEN/NOTIFY on the app database (payloads < 8000 bytes)
+ - redis    – Redis PUBLISH/SUBSCRIBE (needs the optional `redis` package)
+
+The postgres and redis backends reconnect with exponential backoff when
+their connection drops and re-subscribe every room; messages published
+while a worker is disconnected are not replayed by the backend (clients
+resume from the history store with ?last_id=).
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+Deliver = Callable[[str, str], Awaitable[None]]
+
+CHANNEL_PREFIX = "teamsync_chat"
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+
+log = logging.getLogger("teamsync.chat")
+
+
+def _backoff(attempt: int) -> float:
+    return min(RECONNECT_MAX_DELAY, RECONNECT_MIN_DELAY * 2 ** attempt)
+
+
+class PubSubBackend:
+    """Interface shared by all backends."""
+
+    name = "base"
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def publish(self, room_id: str, payload: str) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self, room_id: str) -> None:
+        raise NotImplementedError
+
+    async def unsubscribe(self, room_id: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class InProcessPubSub(PubSubBackend):
+    """Delivers straight back into this process – one worker only."""
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self._rooms: Set[str] = set()
+
+    async def publish(self, room_id: str, payload: str) -> None:
+        if room_id in self._rooms:
+            await self._deliver(room_id, payload)
+
+    async def subscribe(self, room_id: str) -> None:
+        self._rooms.add(room_id)
+
+    async def unsubscribe(self, room_id: str) -> None:
+        self._rooms.discard(room_id)
+
+
+def _pg_channel(room_id: str) -> str:
+    # Room ids are free-form; channel names must be short SQL identifiers
+    return f"{CHANNEL_PREFIX}_{hashlib.sha1(room_id.encode()).hexdigest()[:20]}"
+
+
+class PostgresPubSub(PubSubBackend):
+    """LISTEN/NOTIFY over two dedicated psycopg2 connections.
+
+    The listener socket is watched with loop.add_reader, so receiving never
+    blocks the event loop; NOTIFY and (UN)LISTEN run on a single worker
+    thread, which also keeps publishes from this worker in order. A failed
+    publish reconnects and retries once; a dead listener is replaced in the
+    background and LISTENs on every subscribed channel again.
+    """
+
+    name = "postgres"
+    MAX_PAYLOAD = 7999  # Postgres rejects NOTIFY payloads of 8000+ bytes
+
+    def __init__(self, dsn: str, connect_args: Optional[dict] = None) -> None:
+        self._dsn = dsn
+        self._connect_args = connect_args or {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-pubsub")
+        self._channels: Dict[str, str] = {}  # channel -> room_id
+        self._listen_conn = None
+        self._notify_conn = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reconnecting: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+        conn = psycopg2.connect(self._dsn, **self._connect_args)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        self._loop = asyncio.get_running_loop()
+        self._closed = False
+        try:
+            self._notify_conn = await self._run(self._connect)
+            await self._run(self._open_listener)
+        except Exception:
+            await self._run(self._close_conns)
+            raise
+        self._loop.add_reader(self._listen_conn.fileno(), self._on_readable)
+
+    # The helpers below run on the executor thread
+
+    def _open_listener(self) -> None:
+        conn = self._connect()
+        for channel in list(self._channels):
+            self._execute(conn, f'LISTEN "{channel}"')
+        self._listen_conn = conn
+
+    @staticmethod
+    def _close_quietly(conn) -> None:
+        try:
+            if conn is not None:
+                conn.close()
+        except Exception:
+            pass
+
+    def _close_conns(self) -> None:
+        self._close_quietly(self._listen_conn)
+        self._close_quietly(self._notify_conn)
+        self._listen_conn = self._notify_conn = None
+
+    def _execute(self, conn, sql: str, params=None) -> None:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+
+    def _notify(self, channel: str, payload: str) -> None:
+        try:
+            self._execute(self._notify_conn, "SELECT pg_notify(%s, %s)", (channel, payload))
+        except Exception as e:
+            if self._notify_conn is not None and not self._notify_conn.closed:
+                raise  # a statement error, not a dead connection
+            log.warning("Chat NOTIFY connection lost (%s), reconnecting", e)
+            self._close_quietly(self._notify_conn)
+            self._notify_conn = self._connect()
+            self._execute(self._notify_conn, "SELECT pg_notify(%s, %s)", (channel, payload))
+
+    def _listen_execute(self, sql: str) -> bool:
+        try:
+            self._execute(self._listen_conn, sql)
+            return True
+        except Exception as e:
+            log.warning("Chat LISTEN connection failed: %s", e)
+            return False
+
+    # Event loop side
+
+    def _on_readable(self) -> None:
+        conn = self._listen_conn
+        try:
+            conn.poll()
+        except Exception as e:
+            log.warning("Chat LISTEN connection lost: %s", e)
+            self._schedule_reconnect()
+            return
+        while conn.notifies:
+            note = conn.notifies.pop(0)
+            room_id = self._channels.get(note.channel)
+            if room_id is not None:
+                self._loop.create_task(self._deliver(room_id, note.payload))
+
+    def _schedule_reconnect(self) -> None:
+        if self._closed or (self._reconnecting is not None and not self._reconnecting.done()):
+            return
+        if self._listen_conn is not None:
+            try:
+                self._loop.remove_reader(self._listen_conn.fileno())
+            except Exception:  # fd already gone
+                pass
+        self._reconnecting = self._loop.create_task(self._reconnect_listener())
+
+    async def _reconnect_listener(self) -> None:
+        attempt = 0
+        while not self._closed:
+            await asyncio.sleep(_backoff(attempt))
+            old = self._listen_conn
+            try:
+                await self._run(self._open_listener)
+            except Exception as e:
+                attempt += 1
+                log.warning("Chat LISTEN reconnect failed (attempt %d): %s", attempt, e)
+                continue
+            await self._run(self._close_quietly, old)
+            self._loop.add_reader(self._listen_conn.fileno(), self._on_readable)
+            log.info("Chat LISTEN reconnected, %d channels resubscribed", len(self._channels))
+            return
+
+    async def publish(self, room_id: str, payload: str) -> None:
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            raise ValueError("Chat payload too large for Postgres NOTIFY")
+        await self._run(self._notify, _pg_channel(room_id), payload)
+
+    async def subscribe(self, room_id: str) -> None:
+        channel = _pg_channel(room_id)
+        self._channels[channel] = room_id
+        # On failure the reconnect LISTENs on every channel in self._channels
+        if not await self._run(self._listen_execute, f'LISTEN "{channel}"'):
+            self._schedule_reconnect()
+
+    async def unsubscribe(self, room_id: str) -> None:
+        channel = _pg_channel(room_id)
+        self._channels.pop(channel, None)
+        if not await self._run(self._listen_execute, f'UNLISTEN "{channel}"'):
+            self._schedule_reconnect()
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+            self._reconnecting = None
+        if self._listen_conn is not None:
+            try:
+                self._loop.remove_reader(self._listen_conn.fileno())
+            except Exception:
+                pass
+        await self._run(self._close_conns)
+        self._executor.shutdown(wait=False)
+
+
+class RedisPubSub(PubSubBackend):
+    """Redis PUBLISH/SUBSCRIBE; any redis.asyncio-compatible client works."""
+
+    name = "redis"
+
+    def __init__(self, url: Optional[str] = None, client=None) -> None:
+        if client is None:
+            import redis.asyncio as aioredis  # optional dependency
+            client = aioredis.from_url(url or "redis://localhost:6379/0")
+        self._client = client
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._rooms: Set[str] = set()
+
+    @staticmethod
+    def _channel(room_id: str) -> str:
+        return f"{CHANNEL_PREFIX}:{room_id}"
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        self._pubsub = self._client.pubsub()
+
+    async def _resubscribe(self) -> None:
+        """Fresh PubSub connection subscribed to every current room."""
+        old, self._pubsub = self._pubsub, self._client.pubsub()
+        try:
+            await old.aclose()
+        except Exception:
+            pass
+        if self._rooms:
+            await self._pubsub.subscribe(*(self._channel(r) for r in self._rooms))
+
+    async def _read_loop(self) -> None:
+        prefix = f"{CHANNEL_PREFIX}:"
+        failures = 0
+        while True:
+            try:
+                msg = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Chat Redis subscription lost (attempt %d): %s", failures + 1, e)
+                await asyncio.sleep(_backoff(failures))
+                failures += 1
+                try:
+                    await self._resubscribe()
+                    log.info("Chat Redis resubscribed to %d rooms", len(self._rooms))
+                    failures = 0
+                except Exception as e:
+                    log.warning("Chat Redis resubscribe failed: %s", e)
+                continue
+            if msg is None:
+                continue
+            channel, data = msg["channel"], msg["data"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            if isinstance(data, bytes):
+                data = data.decode()
+            try:
+                await self._deliver(channel[len(prefix):], data)
+            except Exception:
+                log.exception("Chat delivery failed for room %s", channel[len(prefix):])
+
+    async def publish(self, room_id: str, payload: str) -> None:
+        await self._client.publish(self._channel(room_id), payload)
+
+    async def subscribe(self, room_id: str) -> None:
+        self._rooms.add(room_id)
+        await self._pubsub.subscribe(self._channel(room_id))
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def unsubscribe(self, room_id: str) -> None:
+        self._rooms.discard(room_id)
+        await self._pubsub.unsubscribe(self._channel(room_id))
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        await self._client.aclose()
+
+
+def create_backend(kind: Optional[str] = None) -> PubSubBackend:
+    """Build the backend selected by CHAT_PUBSUB (memory / postgres / redis)."""
+    kind = (kind or os.getenv("CHAT_PUBSUB", "memory")).lower()
+    if kind == "memory":
+        return InProcessPubSub()
+    if kind == "postgres":
+        from database import engine, CONNECT_ARGS
+        url = os.getenv("CHAT_PUBSUB_URL") or engine.url.set(
+            drivername="postgresql"
+        ).render_as_string(hide_password=False)
+        return PostgresPubSub(url, CONNECT_ARGS)
+    if kind == "redis":
+        return RedisPubSub(os.getenv("CHAT_PUBSUB_URL") or os.getenv("REDIS_URL"))
+    raise ValueError(f"Unknown CHAT_PUBSUB backend: {kind}")
@@ -0,0 +1,242 @@
+"""realtime/store.py – write-behind persistence for chat messages.
+
+Relayed messages get a time-ordered id immediately and are buffered in
+memory; a background task writes them with one multi-row INSERT whenever the
+buffer reaches CHAT_FLUSH_BATCH rows or every CHAT_FLUSH_INTERVAL seconds.
+Reads (history, resume) merge the DB with rows that are not flushed yet.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import insert, text
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, engine
+import models
+
+FLUSH_BATCH = int(os.getenv("CHAT_FLUSH_BATCH", "200"))
+FLUSH_INTERVAL = float(os.getenv("CHAT_FLUSH_INTERVAL", "1.0"))
+
+log = logging.getLogger("teamsync.chat")
+
+# ---------- Ids ----------
+# 53-bit ids (safe as JS numbers): ms since 2025-01-01 | 5-bit worker | 7-bit sequence
+
+_ID_EPOCH_MS = 1735689600000
+MAX_WORKERS = 32
+_WORKER_LOCK_SPACE = 0x7C5A  # first key of pg_try_advisory_lock(int, int)
+_worker_lock_conn = None  # holds the claimed slot for the life of the process
+
+
+def claim_worker_id() -> int:
+    """A worker id no other live worker on this database is using.
+
+    CHAT_WORKER_ID (0-31) wins when set. On Postgres each worker otherwise
+    takes the first free slot as a session advisory lock on a connection it
+    keeps open, so workers of one deployment never share an id; elsewhere
+    (SQLite: one process) the id is 0.
+    """
+    global _worker_lock_conn
+    explicit = os.getenv("CHAT_WORKER_ID")
+    if explicit:
+        worker = int(explicit)
+        if not 0 <= worker < MAX_WORKERS:
+            raise ValueError(f"CHAT_WORKER_ID must be between 0 and {MAX_WORKERS - 1}")
+        return worker
+    if engine.dialect.name != "postgresql":
+        return 0
+    conn = engine.connect()
+    for slot in range(MAX_WORKERS):
+        if conn.execute(text("SELECT pg_try_advisory_lock(:space, :slot)"),
+                        {"space": _WORKER_LOCK_SPACE, "slot": slot}).scalar():
+            conn.commit()
+            _worker_lock_conn = conn
+            return slot
+    conn.close()
+    raise RuntimeError(f"All {MAX_WORKERS} chat worker ids are taken; set CHAT_WORKER_ID")
+
+
+class MessageIdGenerator:
+    def __init__(self, worker_id: Optional[int] = None) -> None:
+        self._worker = None if worker_id is None else worker_id & 0x1F
+        self._last_ms = -1
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def worker_id(self) -> Optional[int]:
+        return self._worker
+
+    def claim(self) -> int:
+        """Resolve the worker id (blocking – call from a thread)."""
+        with self._lock:
+            if self._worker is None:
+                self._worker = claim_worker_id()
+                log.info("Chat message ids use worker id %d", self._worker)
+            return self._worker
+
+    def next_id(self) -> int:
+        if self._worker is None:
+            raise RuntimeError("Worker id not claimed yet")
+        with self._lock:
+            now = int(time.time() * 1000) - _ID_EPOCH_MS
+            if now <= self._last_ms:
+                now = self._last_ms
+                self._seq = (self._seq + 1) & 0x7F
+                if self._seq == 0:
+                    # 128 ids used up in this millisecond – borrow the next one
+                    now += 1
+            else:
+                self._seq = 0
+            self._last_ms = now
+            return (now << 12) | (self._worker << 7) | self._seq
+
+
+# ---------- Write-behind buffer ----------
+
+class ChatWriteBehind:
+    def __init__(self, batch_size: int = FLUSH_BATCH,
+                 interval: float = FLUSH_INTERVAL) -> None:
+        self.batch_size = batch_size
+        self.interval = interval
+        self.ids = MessageIdGenerator()
+        self._pending: List[dict] = []
+        self._inflight: List[dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.failed = 0
+
+    async def ready(self) -> None:
+        """Claim the id generator's worker id before the first append."""
+        if self.ids.worker_id is None:
+            await run_in_threadpool(self.ids.claim)
+
+    def append(self, room_id: str, user_id: Optional[int], content: str) -> dict:
+        """Buffer a message and return its row (with id / created_at)."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        row = {
+            "id": self.ids.next_id(),
+            "room_id": room_id,
+            "user_id": user_id,
+            "content": content,
+            "created_at": datetime.now(timezone.utc),
+        }
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return row
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending or self._inflight:
+            return
+        self._inflight, self._pending = self._pending, []
+        try:
+            await run_in_threadpool(self._write, self._inflight)
+        finally:
+            self._inflight = []
+
+    def _write(self, rows: List[dict]) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(insert(models.ChatMessage), rows)
+            db.commit()
+            self.flushed += len(rows)
+        except Exception:
+            db.rollback()
+            # Fall back to row-by-row so one bad row (e.g. id clash) keeps the rest
+            for row in rows:
+                try:
+                    db.execute(insert(models.ChatMessage), [row])
+                    db.commit()
+                    self.flushed += 1
+                except Exception as e:
+                    db.rollback()
+                    self.failed += 1
+                    log.error("Chat message %s in room %s dropped: %s",
+                              row["id"], row["room_id"], e)
+        finally:
+            db.close()
+
+    def unflushed(self, room_id: str, after_id: Optional[int] = None,
+                  before_id: Optional[int] = None) -> List[dict]:
+        """Buffered rows for a room (oldest first) within the id bounds."""
+        return [
+            r for r in self._inflight + self._pending
+            if r["room_id"] == room_id
+            and (after_id is None or r["id"] > after_id)
+            and (before_id is None or r["id"] < before_id)
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending) + len(self._inflight),
+            "flushed": self.flushed,
+            "failed": self.failed,
+        }
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+def _message_out(r) -> dict:
+    return {
+        "id": r["id"], "room_id": r["room_id"], "user_id": r["user_id"],
+        "message": r["content"], "ts": r["created_at"],
+    }
+
+
+def fetch_history(store: ChatWriteBehind, room_id: str,
+                  before_id: Optional[int] = None, after_id: Optional[int] = None,
+                  limit: int = 50) -> List[dict]:
+    """Keyset read over (room_id, id), merged with unflushed rows, oldest first.
+
+    after_id returns the oldest `limit` rows newer than it (resume);
+    otherwise the newest `limit` rows older than before_id (history window).
+    """
+    buffered = store.unflushed(room_id, after_id=after_id, before_id=before_id)
+    db = SessionLocal()
+    try:
+        M = models.ChatMessage
+        q = db.query(M.id, M.room_id, M.user_id, M.content, M.created_at).filter(
+            M.room_id == room_id
+        )
+        if after_id is not None:
+            q = q.filter(M.id > after_id).order_by(M.id.asc())
+        else:
+            if before_id is not None:
+                q = q.filter(M.id < before_id)
+            q = q.order_by(M.id.desc())
+        stored = [r._asdict() for r in q.limit(limit).all()]
+    finally:
+        db.close()
+    # A row can be in both while its batch is being committed
+    merged = {r["id"]: r for r in stored}
+    merged.update((r["id"], r) for r in buffered)
+    rows = sorted(merged.values(), key=lambda r: r["id"])
+    rows = rows[:limit] if after_id is not None else rows[-limit:]
+    return [_message_out(r) for r in rows]
@@ -3,9 +3,11 @@ routers/analytics.py – single source for project analytics
 """
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from database import get_db
 from auth import get_current_user
+import access
 import models
 
 router = APIRouter(prefix="/projects/{project_id}", tags=["Analytics"])
@@ -17,23 +19,17 @@ def project_analytics(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    # Ownership or membership check
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id
-    ).first()
-    if not project:
+    acc = access.for_project(db, current_user.id, project_id)
+    if acc is None:
         raise HTTPException(404, "Project not found")
-
-    if project.owner_id != current_user.id and \
-       not any(m.user_id == current_user.id for m in project.members):
+    if not acc.is_member:
         raise HTTPException(403, "Not authorized")
 
     # Count tasks by status
     counts = {s.value: 0 for s in models.Status}
-    tasks = db.query(models.Task).filter(
+    for status, n in db.query(models.Task.status, func.count(models.Task.id)).filter(
         models.Task.project_id == project_id
-    ).all()
-    for t in tasks:
-        counts[t.status] += 1
+    ).group_by(models.Task.status):
+        counts[status] = n
 
     return counts
@@ -1,23 +1,62 @@
 """routers/assistant.py – AI Assistant endpoints backed by Gemini.
 
 Gracefully returns 503 if GEMINI_API_KEY is missing so the app keeps running.
-Maintains simple per-user in-memory conversation history.
+Per-user conversation history (ai/history_manager.py) is bounded: LRU
+eviction plus a token budget with a running summary of older turns, and
+AI_HISTORY_BACKEND=db persists it so other workers can reload it.
+
+/ai/chat returns the whole reply; /ai/chat/stream relays tokens as
+Server-Sent Events (events: token, done, error). Replies are cached by
+prompt + conversation (ai/cache.py) and identical in-flight requests share
+one upstream call. Signed-in users get the top-k matching task / comment
+snippets from their projects (ai/retrieval.py) added to the system prompt.
+Upstream calls pass through ai/governor.py (concurrency limit, deadline
+queue, retries, circuit breaker); refusals surface as 503 + Retry-After.
+/ai/projects/{id}/summary map-reduces a project's tasks and comments
+(ai/summarizer.py).
 """
 
+import json
+import logging
+import math
 import os
-import traceback
-import httpx
-from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from ai.history_manager import HistoryManager
+from starlette.concurrency import run_in_threadpool
+from auth import get_current_user, get_current_user_optional
+from database import SessionLocal
+import access
+import metrics
+import models
+from ai.history_manager import HistoryManager, DBHistoryStore
+from ai import http_client
+from ai.cache import ResponseCache
+from ai import retrieval, summarizer
+from ai.governor import UpstreamGovernor, UpstreamUnavailable
 
 load_dotenv()
 
 router = APIRouter(prefix="/ai", tags=["AI Assistant"])
+log = logging.getLogger("teamsync.ai")
+
+# Single process-local history manager instance (bounded LRU + token budget);
+# AI_HISTORY_BACKEND=db also persists turns so other workers can reload them.
+history = HistoryManager(
+    store=DBHistoryStore() if os.getenv("AI_HISTORY_BACKEND", "memory") == "db" else None
+)
+
+# Keep project retrieval indexes current from ORM commits
+retrieval.install_listeners()
 
-# Single process-local history manager instance
-history = HistoryManager()
+# Shared limits / breaker for every Gemini call from this worker
+governor = UpstreamGovernor()
+
+# Replies for identical (system prompt, conversation) pairs
+reply_cache = ResponseCache()
 
 # Optional system prompt to make the bot TeamSync-aware. We'll send this via
 # the API's systemInstruction field rather than as a chat message.
@@ -27,63 +66,279 @@ SYSTEM_PROMPT = (
 )
 
 
+# GEMINI_BASE_URL can point at a local stand-in (bench/fake_gemini.py) for load tests
+GEMINI_BASE_URL = os.getenv(
+    "GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta"
+).rstrip("/")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+GEMINI_MODEL_URL = f"{GEMINI_BASE_URL}/models/{GEMINI_MODEL}"
+
+
+class SummaryResponse(BaseModel):
+    project_id: int
+    summary: str
+    chunks: int
+    chunks_summarized: int
+    cached: bool
+
+
 class ChatRequest(BaseModel):
     user_id: str
     message: str
+    project_id: Optional[int] = None  # limit grounding to one project
 
 
-@router.post("/chat")
-async def chat(payload: ChatRequest):
+def _project_context(user_id: int, project_id: Optional[int], message: str) -> str:
+    """Top-k snippets from the user's accessible projects (runs in a thread)."""
+    db = SessionLocal()
+    try:
+        project_ids = retrieval.accessible_project_ids(db, user_id)
+        if project_id is not None:
+            if project_id not in project_ids:
+                raise HTTPException(status_code=403, detail="Not authorized for this project")
+            project_ids = [project_id]
+        return retrieval.format_context(retrieval.index.search(db, project_ids, message))
+    finally:
+        db.close()
+
+
+async def _grounding(payload: ChatRequest, user: Optional[models.User]) -> str:
+    if user is None:
+        return ""
+    return await run_in_threadpool(_project_context, user.id, payload.project_id, payload.message)
+
+
+def _require_api_key(payload: ChatRequest) -> str:
     api_key = os.getenv("GEMINI_API_KEY")
     if not payload.message.strip():
         raise HTTPException(status_code=400, detail="Message is empty")
     if not api_key:
         # Service not configured – don't hard-fail the whole app
         raise HTTPException(status_code=503, detail="AI is not configured on this deployment.")
+    return api_key
 
-    # Add user message to history and prepare conversation
-    history.add_message(payload.user_id, "user", payload.message)
-    conversation = history.get_history(payload.user_id)
 
-    headers = {"Content-Type": "application/json"}
-    body = {
-        "systemInstruction": {"parts": [{"text": SYSTEM_PROMPT}]},
+def _request_body(conversation: list, summary: str = "", context: str = "") -> dict:
+    system = SYSTEM_PROMPT
+    if summary:
+        system += "\n\nEarlier in this conversation (condensed):\n" + summary
+    if context:
+        system += "\n\nRelevant items from the user's projects:\n" + context
+    return {
+        "systemInstruction": {"parts": [{"text": system}]},
         "contents": conversation,
     }
 
+
+def _cache_key(body: dict) -> str:
+    return reply_cache.key(body["systemInstruction"]["parts"][0]["text"], body["contents"])
+
+
+def _unavailable(e: UpstreamUnavailable) -> HTTPException:
+    headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+    return HTTPException(status_code=503, detail=e.reason, headers=headers)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _generate(api_key: str, body: dict, message: str) -> str:
+    """One generateContent round trip; returns the reply text."""
+    log.info("Sending to Gemini: %s...", message[:50], extra={"sampled": True})
+    res = await governor.call(lambda remaining: http_client.post(
+        f"{GEMINI_MODEL_URL}:generateContent",
+        params={"key": api_key},
+        headers={"Content-Type": "application/json"},
+        json=body,
+        timeout=http_client.timeout_within(remaining),
+    ))
+    if res.status_code != 200:
+        log.error("Gemini error", extra={"status": res.status_code, "detail": res.text[:500]})
+        raise HTTPException(status_code=res.status_code, detail=f"Gemini Error: {res.text}")
+    data = res.json()
     try:
-        print(f"[AI] Sending to Gemini: {payload.message[:50]}...")
-        async with httpx.AsyncClient(timeout=90.0) as client:
-            res = await client.post(
-                "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent",
-                params={"key": api_key},
-                headers=headers,
-                json=body,
-            )
-        print("[HTTP] Status Code:", res.status_code)
-        if res.status_code != 200:
-            print("[ERROR] Gemini Error:", res.text)
-            raise HTTPException(status_code=res.status_code, detail=f"Gemini Error: {res.text}")
-        data = res.json()
-        try:
-            reply = data["candidates"][0]["content"]["parts"][0]["text"]
-        except (KeyError, IndexError):
-            print("[ERROR] Error parsing Gemini response:", data)
-            raise HTTPException(status_code=500, detail="Could not parse AI response.")
-        print(f"[AI] Gemini Reply: {reply[:100]}...")
-        # Save assistant reply to history
-        history.add_message(payload.user_id, "model", reply)
+        reply = data["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError):
+        log.error("Could not parse Gemini response: %.500s", data)
+        raise HTTPException(status_code=500, detail="Could not parse AI response.")
+    log.info("Gemini reply: %s...", reply[:100], extra={"sampled": True, "status": res.status_code})
+    return reply
+
+
+@router.post("/chat")
+async def chat(
+    payload: ChatRequest,
+    current_user: Optional[models.User] = Depends(get_current_user_optional)
+):
+    api_key = _require_api_key(payload)
+    context = await _grounding(payload, current_user)
+
+    # Add user message to history and prepare conversation
+    await history.add_message(payload.user_id, "user", payload.message)
+    conversation = await history.get_history(payload.user_id)
+    body = _request_body(conversation, await history.get_summary(payload.user_id), context)
+
+    try:
+        reply = await reply_cache.get_or_compute(
+            _cache_key(body), lambda: _generate(api_key, body, payload.message)
+        )
+        # Save assistant reply to history (reloaded if evicted during the call)
+        await history.add_message(payload.user_id, "model", reply)
         return {"reply": reply, "history": conversation}
     except HTTPException:
         raise
+    except UpstreamUnavailable as e:
+        raise _unavailable(e)
     except Exception as e:
-        print("[ERROR] Exception:")
-        traceback.print_exc()
+        log.exception("Assistant request failed")
         raise HTTPException(status_code=500, detail=f"AI error: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def chat_stream(
+    payload: ChatRequest,
+    current_user: Optional[models.User] = Depends(get_current_user_optional)
+):
+    """Stream the reply as SSE via streamGenerateContent.
+
+    The assembled reply is stored in history when the stream ends. If the
+    client disconnects, Starlette cancels this generator, which closes the
+    upstream request; any partial reply is kept so turns stay paired.
+    """
+    api_key = _require_api_key(payload)
+    context = await _grounding(payload, current_user)
+    await history.add_message(payload.user_id, "user", payload.message)
+    body = _request_body(
+        await history.get_history(payload.user_id), await history.get_summary(payload.user_id),
+        context
+    )
+    key = _cache_key(body)
+
+    async def events():
+        parts = []
+        finished = False
+        try:
+            cached = reply_cache.lookup(key)
+            if cached is not None:
+                finished = True
+                await history.add_message(payload.user_id, "model", cached)
+                yield _sse("token", {"text": cached})
+                yield _sse("done", {"reply": cached, "cached": True})
+                return
+            log.info("Streaming from Gemini: %s...", payload.message[:50], extra={"sampled": True})
+            async with governor.slot() as slot, http_client.stream(
+                "POST",
+                f"{GEMINI_MODEL_URL}:streamGenerateContent",
+                params={"key": api_key, "alt": "sse"},
+                json=body,
+            ) as res:
+                slot.report(res)
+                if res.status_code != 200:
+                    detail = (await res.aread()).decode(errors="replace")
+                    log.error("Gemini error", extra={"status": res.status_code, "detail": detail[:500]})
+                    yield _sse("error", {"status": res.status_code, "detail": f"Gemini Error: {detail}"})
+                    return
+                async for line in res.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    try:
+                        chunk = json.loads(line[5:])
+                        text = chunk["candidates"][0]["content"]["parts"][0]["text"]
+                    except (ValueError, KeyError, IndexError):
+                        continue
+                    parts.append(text)
+                    yield _sse("token", {"text": text})
+            finished = True
+            reply = "".join(parts)
+            await history.add_message(payload.user_id, "model", reply)
+            reply_cache.put(key, reply)
+            yield _sse("done", {"reply": reply})
+        except UpstreamUnavailable as e:
+            yield _sse("error", {"status": 503, "detail": e.reason, "retry_after": round(e.retry_after or 0, 1)})
+        except Exception as e:
+            # Transport errors were already counted against the breaker by the slot
+            log.exception("Assistant stream failed")
+            yield _sse("error", {"status": 500, "detail": f"AI error: {str(e)}"})
+        finally:
+            if not finished and parts:
+                # Shielded: this also runs when the client disconnect cancelled us
+                with anyio.CancelScope(shield=True):
+                    await history.add_message(payload.user_id, "model", "".join(parts))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _project_chunks(user_id: int, project_id: int) -> list:
+    db = SessionLocal()
+    try:
+        acc = access.for_project(db, user_id, project_id)
+        if acc is None or not acc.is_member:
+            raise HTTPException(status_code=403, detail="Not authorized for this project")
+        return summarizer.build_chunks(db, project_id)
+    finally:
+        db.close()
+
+
+@router.post("/projects/{project_id}/summary", response_model=SummaryResponse)
+async def summarize_project(
+    project_id: int,
+    current_user: models.User = Depends(get_current_user)
+):
+    """Summarize a project's activity, reusing cached per-chunk summaries."""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=503, detail="AI is not configured on this deployment.")
+    chunks = await run_in_threadpool(_project_chunks, current_user.id, project_id)
+
+    async def generate(prompt: str, text: str) -> str:
+        body = {
+            "systemInstruction": {"parts": [{"text": f"{SYSTEM_PROMPT}\n\n{prompt}"}]},
+            "contents": [{"role": "user", "parts": [{"text": text}]}],
+        }
+        return await _generate(api_key, body, f"summary of project {project_id}")
+
+    try:
+        summary, stats = await summarizer.summarize(chunks, generate, project_id)
+    except HTTPException:
+        raise
+    except UpstreamUnavailable as e:
+        raise _unavailable(e)
+    except Exception as e:
+        log.exception("Assistant request failed")
+        raise HTTPException(status_code=500, detail=f"AI error: {str(e)}")
+    return SummaryResponse(project_id=project_id, summary=summary, **stats)
+
+
 @router.post("/reset")
 async def reset_history(user_id: str = Query(..., description="User ID to clear history for")):
     """Clear history for a user (like a /reset button)."""
     history.clear_history(user_id)
     return {"detail": f"History cleared for user {user_id}"}
+
+
+@router.get("/diagnostics")
+async def diagnostics(request: Request,
+                      user: Optional[models.User] = Depends(get_current_user_optional)):
+    """Upstream latency and connection pool usage for this worker.
+
+    Operator data: needs the METRICS_TOKEN bearer when one is set, else a
+    signed-in user.
+    """
+    if metrics.token_required():
+        if not metrics.authorized(request.headers.get("authorization")):
+            raise HTTPException(401, "Metrics token required")
+    elif user is None:
+        raise HTTPException(401, "Not authenticated")
+    return {
+        "upstream": http_client.snapshot(),
+        "history": history.stats(),
+        "cache": reply_cache.stats(),
+        "retrieval": retrieval.index.stats(),
+        "governor": governor.snapshot(),
+        "summaries": summarizer.cache_stats(),
+    }
@@ -8,66 +8,331 @@ Auth: Accepts JWT signed with SECRET_KEY (HS256). Supports either claim:
  - sub: str/int (common JWT subject field)
 
 If room_id corresponds to a project, only owner or members can join.
+
+Messages are persisted write-behind (realtime/store.py); pass ?last_id=<id>
+on connect to replay what was missed, or page GET /chat/rooms/{room_id}/messages.
+
+Liveness: dead peers are found by protocol-level ping/pong, which browsers
+answer on their own (uvicorn --ws-ping-interval / --ws-ping-timeout). Every
+CHAT_HEARTBEAT_INTERVAL seconds a sweep evicts sockets whose JWT has expired
+and sends {"type": "ping"} to keep proxies from idling the socket out;
+clients need not answer it. CHAT_IDLE_TIMEOUT > 0 additionally evicts
+sockets that send nothing for that long – only for clients that reply to
+the JSON ping (off by default).
+GET /chat/rooms/{room_id}/presence lists users online on this worker.
+
+Broadcasts go through a pub/sub backend (realtime/pubsub.py, CHAT_PUBSUB) so
+rooms span workers; each worker subscribes once per room with local sockets.
 """
 
-from typing import Dict, Set
+import asyncio
+import json
+import os
+import time
+from time import perf_counter
+from typing import Dict, List, Optional, Set, Tuple
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from auth import SECRET_KEY, ALGORITHM
+import access
+from auth import SECRET_KEY, ALGORITHM, get_current_user, get_current_user_optional
 from database import get_db
-import models
+import metrics
+import models, schemas
+from realtime.pubsub import PubSubBackend, create_backend
+from realtime.store import ChatWriteBehind, fetch_history
 
 
 router = APIRouter()
 
+# Outbound buffering per socket. A slow reader only fills its own queue; once
+# full, the policy decides whether to drop messages for it or disconnect it.
+SEND_QUEUE_SIZE = int(os.getenv("CHAT_SEND_QUEUE_SIZE", "256"))
+SLOW_CONSUMER_POLICY = os.getenv("CHAT_SLOW_CONSUMER_POLICY", "drop")  # drop / disconnect
+HIGH_WATER_MARK = int(os.getenv("CHAT_HIGH_WATER_MARK", str(SEND_QUEUE_SIZE)))
+MAX_HISTORY_PAGE = 200
+
+HEARTBEAT_INTERVAL = float(os.getenv("CHAT_HEARTBEAT_INTERVAL", "25"))
+IDLE_TIMEOUT = float(os.getenv("CHAT_IDLE_TIMEOUT", "0"))  # 0 = off
+
+
+class ChatMetrics:
+    """Counters for fan-out behaviour (single event loop, so no locking)."""
 
-class ConnectionManager:
     def __init__(self) -> None:
-        # room_id -> set of websockets
-        self.rooms: Dict[str, Set[WebSocket]] = {}
+        self.published = 0
+        self.publish_errors = 0
+        self.broadcasts = 0
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.idle_evictions = 0
+        self.expired_evictions = 0
+        self.fanout_seconds_total = 0.0
+        self.fanout_seconds_max = 0.0
+        self.delivery_seconds_total = 0.0
+        self.delivery_seconds_max = 0.0
+
+    def observe_fanout(self, seconds: float) -> None:
+        self.broadcasts += 1
+        self.fanout_seconds_total += seconds
+        self.fanout_seconds_max = max(self.fanout_seconds_max, seconds)
+
+    def observe_delivery(self, seconds: float) -> None:
+        self.delivered += 1
+        self.delivery_seconds_total += seconds
+        self.delivery_seconds_max = max(self.delivery_seconds_max, seconds)
+
+
+class _Connection:
+    """A socket plus its bounded outbound queue, writer task and liveness."""
+
+    __slots__ = ("ws", "room_id", "user_id", "token_exp", "last_seen", "queue", "writer")
+
+    def __init__(self, ws: WebSocket, room_id: str, user_id: Optional[int] = None,
+                 token_exp: Optional[float] = None) -> None:
+        self.ws = ws
+        self.room_id = room_id
+        self.user_id = user_id
+        self.token_exp = token_exp
+        self.last_seen = time.monotonic()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.writer: Optional[asyncio.Task] = None
 
-    async def connect(self, room_id: str, ws: WebSocket) -> None:
+
+async def _close_quietly(ws: WebSocket, code: int) -> None:
+    try:
+        await asyncio.wait_for(ws.close(code=code), timeout=5)
+    except Exception:
+        pass
+
+
+class ConnectionManager:
+    def __init__(self, backend: Optional[PubSubBackend] = None) -> None:
+        # room_id -> {websocket: connection}  (local sockets only)
+        self.rooms: Dict[str, Dict[WebSocket, _Connection]] = {}
+        # room_id -> {user_id: open sockets}, maintained on connect/disconnect
+        self.presence: Dict[str, Dict[int, int]] = {}
+        self.metrics = ChatMetrics()
+        self.backend = backend
+        self._started = False
+        self._subscribed: Set[str] = set()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+
+    async def _ensure_started(self) -> None:
+        if self._started:
+            return
+        # Concurrent first connections wait for the backend instead of
+        # subscribing before it exists; a failed start is retried next time
+        async with self._start_lock:
+            if self._started:
+                return
+            if self.backend is None:
+                self.backend = create_backend()
+            await self.backend.start(self._deliver)
+            self._started = True
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self) -> None:
+        if self._started:
+            if self._sweeper is not None:
+                self._sweeper.cancel()
+                self._sweeper = None
+            await self.backend.close()
+            self._started = False
+            self._subscribed.clear()
+
+    async def connect(self, room_id: str, ws: WebSocket, user_id: Optional[int] = None,
+                      token_exp: Optional[float] = None) -> None:
+        await self._ensure_started()
         await ws.accept()
-        self.rooms.setdefault(room_id, set()).add(ws)
+        conn = _Connection(ws, room_id, user_id, token_exp)
+        conn.writer = asyncio.create_task(self._write_loop(conn))
+        self.rooms.setdefault(room_id, {})[ws] = conn
+        if user_id is not None:
+            online = self.presence.setdefault(room_id, {})
+            online[user_id] = online.get(user_id, 0) + 1
+        if room_id not in self._subscribed:
+            self._subscribed.add(room_id)
+            await self.backend.subscribe(room_id)
 
     def disconnect(self, room_id: str, ws: WebSocket) -> None:
         room = self.rooms.get(room_id)
         if room and ws in room:
-            room.remove(ws)
+            conn = room.pop(ws)
+            if conn.writer and conn.writer is not asyncio.current_task():
+                conn.writer.cancel()
+            online = self.presence.get(room_id)
+            if online is not None and conn.user_id in online:
+                online[conn.user_id] -= 1
+                if online[conn.user_id] <= 0:
+                    del online[conn.user_id]
+                if not online:
+                    self.presence.pop(room_id, None)
             if not room:
                 self.rooms.pop(room_id, None)
+                asyncio.get_running_loop().create_task(self._release_room(room_id))
+
+    async def _release_room(self, room_id: str) -> None:
+        # A socket may have rejoined between scheduling and running this
+        if room_id in self.rooms or room_id not in self._subscribed:
+            return
+        self._subscribed.discard(room_id)
+        try:
+            await self.backend.unsubscribe(room_id)
+        except Exception:
+            pass
+
+    async def _write_loop(self, conn: _Connection) -> None:
+        try:
+            while True:
+                text, queued_at = await conn.queue.get()
+                await conn.ws.send_text(text)
+                if queued_at is not None:  # heartbeats are not timed
+                    self.metrics.observe_delivery(perf_counter() - queued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Drop dead connections
+            self.disconnect(conn.room_id, conn.ws)
+
+    def _evict(self, conn: _Connection, code: int) -> None:
+        self.disconnect(conn.room_id, conn.ws)
+        asyncio.create_task(_close_quietly(conn.ws, code))
+
+    def _evict_slow(self, conn: _Connection) -> None:
+        self.metrics.slow_disconnects += 1
+        self._evict(conn, 1013)
+
+    def touch(self, room_id: str, ws: WebSocket) -> None:
+        """Record inbound activity for a socket."""
+        conn = self.rooms.get(room_id, {}).get(ws)
+        if conn is not None:
+            conn.last_seen = time.monotonic()
+
+    async def _sweep_loop(self) -> None:
+        ping = json.dumps({"type": "ping"})
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            self.sweep(ping)
+
+    def sweep(self, ping: Optional[str] = None) -> None:
+        """Evict idle / expired sockets and ping the rest."""
+        now, wall = time.monotonic(), time.time()
+        for room in list(self.rooms.values()):
+            for conn in list(room.values()):
+                if IDLE_TIMEOUT > 0 and now - conn.last_seen > IDLE_TIMEOUT:
+                    self.metrics.idle_evictions += 1
+                    self._evict(conn, 1001)
+                elif conn.token_exp is not None and wall >= conn.token_exp:
+                    self.metrics.expired_evictions += 1
+                    self._evict(conn, 1008)
+                elif ping is not None:
+                    try:
+                        conn.queue.put_nowait((ping, None))
+                    except asyncio.QueueFull:
+                        pass
+
+    def online_users(self, room_id: str) -> List[int]:
+        return sorted(self.presence.get(room_id, {}))
 
     async def broadcast(self, room_id: str, message: dict) -> None:
+        """Publish to every worker; serialized once, same encoding as send_json."""
+        if not self._started:
+            return
+        self.metrics.published += 1
+        payload = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        try:
+            await self.backend.publish(room_id, payload)
+        except Exception:
+            self.metrics.publish_errors += 1
+
+    async def _deliver(self, room_id: str, payload: str) -> None:
+        """Backend callback: enqueue a payload for this worker's sockets."""
         room = self.rooms.get(room_id)
         if not room:
             return
-        for ws in list(room):
+        started = perf_counter()
+        item = (payload, started)
+        for conn in list(room.values()):
+            if SLOW_CONSUMER_POLICY == "disconnect" and conn.queue.qsize() >= HIGH_WATER_MARK:
+                self._evict_slow(conn)
+                continue
             try:
-                await ws.send_json(message)
-            except Exception:
-                # Drop dead connections
-                self.disconnect(room_id, ws)
+                conn.queue.put_nowait(item)
+                self.metrics.enqueued += 1
+            except asyncio.QueueFull:
+                if SLOW_CONSUMER_POLICY == "disconnect":
+                    self._evict_slow(conn)
+                else:
+                    self.metrics.dropped += 1
+        self.metrics.observe_fanout(perf_counter() - started)
+
+    def send_personal(self, room_id: str, ws: WebSocket, message: dict,
+                      timed: bool = True) -> None:
+        """Queue a message for one local socket only (e.g. history replay).
+
+        timed=False keeps control frames (pong) out of the delivery latency.
+        """
+        conn = self.rooms.get(room_id, {}).get(ws)
+        if conn is None:
+            return
+        payload = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        try:
+            conn.queue.put_nowait((payload, perf_counter() if timed else None))
+        except asyncio.QueueFull:
+            self.metrics.dropped += 1
+
+    def stats(self) -> dict:
+        depths = [c.queue.qsize() for room in self.rooms.values() for c in room.values()]
+        m = self.metrics
+        return {
+            "backend": self.backend.name if self.backend else None,
+            "rooms": len(self.rooms),
+            "connections": len(depths),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "queue_size": SEND_QUEUE_SIZE,
+            "slow_consumer_policy": SLOW_CONSUMER_POLICY,
+            "published": m.published,
+            "publish_errors": m.publish_errors,
+            "broadcasts": m.broadcasts,
+            "enqueued": m.enqueued,
+            "delivered": m.delivered,
+            "dropped": m.dropped,
+            "slow_disconnects": m.slow_disconnects,
+            "idle_evictions": m.idle_evictions,
+            "expired_evictions": m.expired_evictions,
+            "fanout_ms_avg": round(1000 * m.fanout_seconds_total / m.broadcasts, 3) if m.broadcasts else 0.0,
+            "fanout_ms_max": round(1000 * m.fanout_seconds_max, 3),
+            "delivery_ms_avg": round(1000 * m.delivery_seconds_total / m.delivered, 3) if m.delivered else 0.0,
+            "delivery_ms_max": round(1000 * m.delivery_seconds_max, 3),
+        }
 
 
 manager = ConnectionManager()
+history_store = ChatWriteBehind()
 
 
-def _decode_token(token: str) -> int:
-    """Decode JWT and return user id (supports 'user_id' or 'sub')."""
+def _decode_claims(token: str) -> Tuple[int, Optional[float]]:
+    """Decode JWT and return (user id, exp timestamp or None)."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         raise
+    exp = payload.get("exp")
     uid = payload.get("user_id")
     if uid is None:
         uid = payload.get("sub")
     if uid is None:
         raise JWTError("Missing user claim")
     try:
-        return int(uid)
+        return int(uid), float(exp) if exp is not None else None
     except (TypeError, ValueError):
         # If it's not an int, that's fine but we can't map to DB user
         # We'll raise to enforce a proper user id
@@ -75,15 +340,69 @@ def _decode_token(token: str) -> int:
 
 
 async def _authorize_project_access(db: Session, project_id: int, user_id: int) -> bool:
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
-    if not project:
-        return False
-    if project.owner_id == user_id:
-        return True
-    return db.query(models.ProjectMember).filter(
-        models.ProjectMember.project_id == project_id,
-        models.ProjectMember.user_id == user_id
-    ).first() is not None
+    # Async callers: keep the role lookup off the event loop
+    acc = await run_in_threadpool(access.for_project, db, user_id, project_id)
+    return acc is not None and acc.is_member
+
+
+@router.get("/chat/metrics")
+def chat_metrics(request: Request, user: Optional[models.User] = Depends(get_current_user_optional)):
+    """Outbound queue depth and fan-out latency for this worker.
+
+    Operator data: needs the METRICS_TOKEN bearer when one is set, else a
+    signed-in user.
+    """
+    if metrics.token_required():
+        if not metrics.authorized(request.headers.get("authorization")):
+            raise HTTPException(401, "Metrics token required")
+    elif user is None:
+        raise HTTPException(401, "Not authenticated")
+    return {**manager.stats(), "history": history_store.stats()}
+
+
+@router.get("/chat/rooms/{room_id}/messages", response_model=List[schemas.ChatMessageOut])
+async def chat_history(
+    room_id: str,
+    response: Response,
+    before_id: Optional[int] = Query(None, description="Return the window older than this message id"),
+    limit: int = Query(50, ge=1, le=MAX_HISTORY_PAGE),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Newest `limit` messages (oldest first); X-Next-Before-Id pages further back."""
+    if room_id.isdigit() and not await _authorize_project_access(db, int(room_id), current_user.id):
+        raise HTTPException(403, "Not authorized")
+    rows = await run_in_threadpool(
+        fetch_history, history_store, room_id, before_id=before_id, limit=limit + 1
+    )
+    if len(rows) > limit:
+        rows = rows[1:]
+        response.headers["X-Next-Before-Id"] = str(rows[0]["id"])
+    return rows
+
+
+@router.get("/chat/rooms/{room_id}/presence")
+async def chat_presence(
+    room_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Users with an open socket to this room on this worker."""
+    if room_id.isdigit() and not await _authorize_project_access(db, int(room_id), current_user.id):
+        raise HTTPException(403, "Not authorized")
+    online = manager.online_users(room_id)
+    return {"room_id": room_id, "online": online, "count": len(online)}
+
+
+async def _replay(room_id: str, websocket: WebSocket, last_id: int) -> None:
+    rows = await run_in_threadpool(
+        fetch_history, history_store, room_id, after_id=last_id, limit=MAX_HISTORY_PAGE
+    )
+    for r in rows:
+        manager.send_personal(room_id, websocket, {
+            "type": "message", "id": r["id"], "user_id": r["user_id"],
+            "message": r["message"], "ts": r["ts"].isoformat(), "replay": True,
+        })
 
 
 @router.websocket("/chat/ws/{room_id}")
@@ -97,7 +416,7 @@ async def chat_ws(websocket: WebSocket, room_id: str):
 
     # Validate token and user
     try:
-        user_id = _decode_token(token)
+        user_id, token_exp = _decode_claims(token)
     except JWTError:
         await websocket.close(code=1008)
         return
@@ -114,16 +433,32 @@ async def chat_ws(websocket: WebSocket, room_id: str):
         db.close()
 
     # Accept and manage connection
-    await manager.connect(room_id, websocket)
+    await history_store.ready()
+    await manager.connect(room_id, websocket, user_id, token_exp)
+    last_id = websocket.query_params.get("last_id")
+    if last_id and last_id.isdigit():
+        # Live messages already flow to this socket; clients dedupe by id
+        await _replay(room_id, websocket, int(last_id))
     await manager.broadcast(room_id, {"type": "join", "user_id": user_id})
     try:
         while True:
             data = await websocket.receive_json()
+            manager.touch(room_id, websocket)
+            if isinstance(data, dict) and data.get("type") in ("ping", "pong"):
+                if data["type"] == "ping":
+                    manager.send_personal(room_id, websocket, {"type": "pong"}, timed=False)
+                continue
             # Minimal relay; clients can send {"message": "..."}
+            text = data.get("message") if isinstance(data, dict) else None
+            if not isinstance(text, str) or not text:
+                continue
+            row = history_store.append(room_id, user_id, text)
             await manager.broadcast(room_id, {
                 "type": "message",
+                "id": row["id"],
                 "user_id": user_id,
-                **({"message": data.get("message")} if isinstance(data, dict) else {})
+                "message": text,
+                "ts": row["created_at"].isoformat(),
             })
     except WebSocketDisconnect:
         pass
@@ -2,15 +2,18 @@
 routers/comments.py – comments endpoints
 """
 
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from database import get_db
 from auth import get_current_user
+import access
 import models, schemas
 
 router = APIRouter(tags=["Comments"])
 
+MAX_PAGE_SIZE = 200
+
 
 @router.post("/tasks/{task_id}/comments", response_model=schemas.CommentOut)
 def add_comment(
@@ -19,11 +22,8 @@ def add_comment(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    task = db.query(models.Task).join(models.Project).filter(
-        models.Task.id == task_id,
-        models.Project.owner_id == current_user.id
-    ).first()
-    if not task:
+    acc = access.for_task(db, current_user.id, task_id)
+    if acc is None or not acc.is_owner:
         raise HTTPException(404, "Task not found or unauthorized")
     new = models.Comment(
         content=comment.content,
@@ -42,24 +42,57 @@ def add_comment(
 @router.get("/tasks/{task_id}/comments", response_model=List[schemas.CommentOut])
 def list_comments(
     task_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE,
+                                 description="Window size; omit for the full thread"),
+    before_id: Optional[int] = Query(None, description="Return the window older than this comment id"),
+    since_id: Optional[int] = Query(None, description="Return only comments newer than this id"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    task = db.query(models.Task).join(models.Project).filter(
-        models.Task.id == task_id,
-        models.Project.owner_id == current_user.id
-    ).first()
-    if not task:
+    """List a task's comments oldest-first.
+
+    - since_id: the oldest `limit` comments after that id (cheap polling
+      after a post); X-Next-Since-Id is set while newer ones remain
+    - limit / before_id: the newest `limit` comments (older than before_id);
+      X-Next-Before-Id carries the cursor for the next older window.
+    """
+    acc = access.for_task(db, current_user.id, task_id)
+    if acc is None or not acc.is_owner:
         raise HTTPException(404, "Task not found or unauthorized")
 
-    comments = db.query(models.Comment).join(models.User).filter(
+    # Plain column rows walk the (task_id, id) index without hydrating ORM objects
+    q = db.query(
+        models.Comment.id, models.Comment.content,
+        models.Comment.timestamp, models.User.name
+    ).join(models.User, models.Comment.user_id == models.User.id).filter(
         models.Comment.task_id == task_id
-    ).order_by(models.Comment.timestamp.asc()).all()
+    )
+
+    if since_id is not None:
+        size = limit or MAX_PAGE_SIZE
+        rows = q.filter(models.Comment.id > since_id).order_by(
+            models.Comment.id.asc()
+        ).limit(size + 1).all()
+        if len(rows) > size:
+            rows = rows[:size]
+            response.headers["X-Next-Since-Id"] = str(rows[-1].id)
+    elif limit is not None or before_id is not None:
+        size = limit or MAX_PAGE_SIZE
+        if before_id is not None:
+            q = q.filter(models.Comment.id < before_id)
+        rows = q.order_by(models.Comment.id.desc()).limit(size + 1).all()
+        if len(rows) > size:
+            rows = rows[:size]
+            response.headers["X-Next-Before-Id"] = str(rows[-1].id)
+        rows.reverse()
+    else:
+        rows = q.order_by(models.Comment.id.asc()).all()
 
     return [
         schemas.CommentOut(
-            id=c.id, content=c.content,
-            timestamp=c.timestamp, user_name=c.user.name
+            id=r.id, content=r.content,
+            timestamp=r.timestamp, user_name=r.name
         )
-        for c in comments
+        for r in rows
     ]
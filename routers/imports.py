@@ -0,0 +1,76 @@
+"""
+routers/imports.py – bulk CSV / NDJSON import of projects & tasks
+"""
+
+import io
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from sqlalchemy.orm import Session
+from database import get_db
+from auth import get_current_user
+import access
+import bulk_import
+import lazyroutes
+import models, schemas
+
+router = APIRouter(tags=["Import"])
+
+
+def _invalidate_retrieval(project_id: Optional[int] = None) -> None:
+    # Core inserts bypass ORM events, so affected indexes rebuild lazily. No
+    # index exists before the assistant loads ai.retrieval; don't import it here.
+    retrieval = lazyroutes.loaded("ai.retrieval")
+    if retrieval is not None:
+        retrieval.index.invalidate(project_id)
+
+
+def _open_upload(file: UploadFile, fmt: Optional[str]):
+    try:
+        fmt = bulk_import.detect_format(file.filename, fmt)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    # Decode the spooled upload lazily instead of reading it into memory
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    return bulk_import.iter_rows(stream, fmt)
+
+
+@router.post("/projects/import", response_model=schemas.ImportReport)
+def import_projects(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or ndjson (defaults to file extension)"),
+    batch_size: int = Query(bulk_import.DEFAULT_BATCH_SIZE, ge=1, le=50000),
+    use_copy: bool = Query(True, description="Stream batches through COPY (Postgres only; ignored elsewhere)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Import tasks into the caller's projects, matched by the `project` column."""
+    rows = _open_upload(file, format)
+    report = bulk_import.import_tasks(
+        db, current_user.id, rows, batch_size=batch_size, use_copy=use_copy
+    )
+    _invalidate_retrieval()
+    return report
+
+
+@router.post("/projects/{project_id}/tasks/import",
+             response_model=schemas.ImportReport)
+def import_project_tasks(
+    project_id: int,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or ndjson (defaults to file extension)"),
+    batch_size: int = Query(bulk_import.DEFAULT_BATCH_SIZE, ge=1, le=50000),
+    use_copy: bool = Query(True, description="Stream batches through COPY (Postgres only; ignored elsewhere)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    acc = access.for_project(db, current_user.id, project_id)
+    if acc is None or not acc.is_owner:
+        raise HTTPException(404, "Project not found")
+    rows = _open_upload(file, format)
+    report = bulk_import.import_tasks(
+        db, current_user.id, rows, project_id=project_id,
+        batch_size=batch_size, use_copy=use_copy
+    )
+    _invalidate_retrieval(project_id)
+    return report
@@ -10,8 +10,9 @@ from fastapi.responses import RedirectResponse
 from jose import jwt, JWTError
 from pydantic import BaseModel
 
+import access
 from database import get_db
-from models import Project, ProjectMember, User
+from models import ProjectMember, User
 from auth import get_current_user, get_current_user_optional, SECRET_KEY, ALGORITHM
 
 router = APIRouter(
@@ -42,30 +43,26 @@ class MemberOut(BaseModel):
 
 # ---------- Helpers ----------
 
-def _project_owned(project_id: int, db, user: User) -> Project:
-    proj = db.query(Project).filter(
-        Project.id == project_id
-    ).first()
-    if not proj:
+def _project_owned(project_id: int, db, user: User) -> access.Access:
+    acc = access.for_project(db, user.id, project_id)
+    if acc is None:
         raise HTTPException(404, "Project not found")
-    if proj.owner_id != user.id:
+    if not acc.is_owner:
         raise HTTPException(403, "Forbidden")
-    return proj
+    return acc
 
 
-def _project_member_or_owner(project_id: int, db, user: User) -> Project:
-    """Return project if the user is owner or a member, else 403.
+def _project_member_or_owner(project_id: int, db, user: User) -> access.Access:
+    """Return the user's access if they are owner or a member, else 403.
 
     Used for read operations that should be visible to any project participant.
     """
-    proj = db.query(Project).filter(Project.id == project_id).first()
-    if not proj:
+    acc = access.for_project(db, user.id, project_id)
+    if acc is None:
         raise HTTPException(404, "Project not found")
-    if proj.owner_id == user.id:
-        return proj
-    if db.query(ProjectMember).filter_by(project_id=project_id, user_id=user.id).first():
-        return proj
-    raise HTTPException(403, "Forbidden")
+    if not acc.is_member:
+        raise HTTPException(403, "Forbidden")
+    return acc
 
 
 # ---------- Endpoints ----------
@@ -77,7 +74,7 @@ def add_member(
     db=Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    proj = _project_owned(project_id, db, current_user)
+    _project_owned(project_id, db, current_user)
     if db.query(ProjectMember).filter_by(
         project_id=project_id, user_id=payload.user_id
     ).first():
@@ -103,7 +100,7 @@ def list_members(
     db=Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    proj = _project_member_or_owner(project_id, db, current_user)
+    _project_member_or_owner(project_id, db, current_user)
     rows = db.query(ProjectMember, User).join(
         User, ProjectMember.user_id == User.id
     ).filter(ProjectMember.project_id == project_id).all()
@@ -122,17 +119,21 @@ def update_member(
     current_user: User = Depends(get_current_user)
 ):
     _project_owned(project_id, db, current_user)
-    mem = db.query(ProjectMember).filter_by(
-        project_id=project_id, user_id=user_id
+    row = db.query(ProjectMember, User).join(
+        User, ProjectMember.user_id == User.id
+    ).filter(
+        ProjectMember.project_id == project_id, ProjectMember.user_id == user_id
     ).first()
-    if not mem:
+    if not row:
         raise HTTPException(404, "Member not found")
+    mem, user = row
     mem.role = payload.role
-    db.commit()
-    user = db.query(User).filter_by(id=user_id).first()
-    return MemberOut(
-        user_id=user.id, name=user.name, email=user.email, role=mem.role
+    # Build the response before commit expires the loaded rows
+    out = MemberOut(
+        user_id=user.id, name=user.name, email=user.email, role=payload.role
     )
+    db.commit()
+    return out
 
 
 @router.delete("/members/{user_id}")
@@ -0,0 +1,48 @@
+"""
+routers/profiles.py – list and download request profiles (admin only)
+
+Requires the `X-Profile-Token: <PROFILE_TOKEN>` header; see profiling.py.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+
+import profiling
+
+router = APIRouter(prefix="/admin/profiles", tags=["Profiling"])
+
+
+def require_profile_admin(x_profile_token: Optional[str] = Header(None)):
+    if not profiling.TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled")
+    if not profiling.authorized(x_profile_token):
+        raise HTTPException(status_code=403, detail="Profile token required")
+
+
+@router.get("", dependencies=[Depends(require_profile_admin)])
+def list_profiles(
+    route: Optional[str] = Query(None, description="route template, e.g. /projects/{project_id}/tasks"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Recent profiles, newest first."""
+    return profiling.list_profiles(route, limit)
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_profile_admin)])
+def get_profile(profile_id: str):
+    """Timings plus the top allocations of one profiled request."""
+    path = profiling.profile_path(profile_id, "json")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json")
+
+
+@router.get("/{profile_id}/folded", dependencies=[Depends(require_profile_admin)])
+def download_folded(profile_id: str):
+    """Collapsed stacks (flamegraph.pl / speedscope input)."""
+    path = profiling.profile_path(profile_id, "folded")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
@@ -10,12 +10,15 @@ from typing import List
 
 from fastapi import (
     APIRouter, Depends, HTTPException,
-    UploadFile, File, Form
+    UploadFile, File, Form, Response
 )
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 from database import get_db
 from auth import get_current_user
+import access
 import models, schemas
+import responses
 
 router = APIRouter(tags=["Projects"])
 UPLOAD_DIR = "uploads"
@@ -99,11 +102,8 @@ def create_task(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id,
-        models.Project.owner_id == current_user.id
-    ).first()
-    if not project:
+    acc = access.for_project(db, current_user.id, project_id)
+    if acc is None or not acc.is_owner:
         raise HTTPException(404, "Project not found")
 
     due = datetime.fromisoformat(due_date) if due_date else None
@@ -132,6 +132,52 @@ def create_task(
     return task
 
 
+def _board(db: Session, project_id: int) -> List[dict]:
+    """TaskOut-shaped dicts for a project in one pass over Core rows.
+
+    Three flat SELECTs (tasks, attachments, comments + author name) instead
+    of ORM entities: no identity map, no relationship loading and no second
+    Pydantic validation, and no row explosion from joining comments and
+    attachments onto tasks.
+    """
+    T, A, C, U = models.Task, models.FileAttachment, models.Comment, models.User
+    rows = db.execute(
+        select(T.id, T.title, T.description, T.status, T.due_date)
+        .where(T.project_id == project_id)
+        .order_by(T.id)
+    ).all()
+    tasks, by_id = [], {}
+    for id_, title, description, status, due_date in rows:
+        task = {"id": id_, "title": title, "description": description, "status": status,
+                "due_date": due_date, "attachments": [], "comments": []}
+        tasks.append(task)
+        by_id[id_] = task
+    if not tasks:
+        return tasks
+
+    for id_, filename, filepath, task_id in db.execute(
+        select(A.id, A.filename, A.filepath, A.task_id)
+        .join(T, T.id == A.task_id)
+        .where(T.project_id == project_id)
+        .order_by(A.id)
+    ):
+        by_id[task_id]["attachments"].append({"id": id_, "filename": filename, "filepath": filepath})
+
+    for id_, content, timestamp, task_id, user_name in db.execute(
+        select(C.id, C.content, C.timestamp, C.task_id, U.name)
+        .join(T, T.id == C.task_id)
+        .join(U, U.id == C.user_id)
+        .where(T.project_id == project_id)
+        .order_by(C.id)
+    ):
+        by_id[task_id]["comments"].append(
+            {"id": id_, "content": content, "timestamp": timestamp, "user_name": user_name}
+        )
+    return tasks
+
+
+# response_model documents the shape; the handler returns encoded bytes
+# directly, so FastAPI does not validate the list a second time
 @router.get("/projects/{project_id}/tasks", response_model=List[schemas.TaskOut])
 def list_tasks(
     project_id: int,
@@ -139,39 +185,8 @@ def list_tasks(
     current_user: models.User = Depends(get_current_user)
 ):
     # Get tasks only for this user's project
-    project = db.query(models.Project).filter_by(id=project_id).first()
-    if not project or project.owner_id != current_user.id:
+    acc = access.for_project(db, current_user.id, project_id)
+    if acc is None or not acc.is_owner:
         raise HTTPException(404, "Project not found or unauthorized")
 
-    # Eager load attachments and comments->user to avoid N+1 lazy loads
-    tasks = (
-        db.query(models.Task)
-        .options(
-            joinedload(models.Task.attachments),
-            joinedload(models.Task.comments).joinedload(models.Comment.user)
-        )
-        .filter_by(project_id=project_id)
-        .all()
-    )
-
-    task_outputs = []
-    for task in tasks:
-        task_outputs.append(schemas.TaskOut(
-            id=task.id,
-            title=task.title,
-            description=task.description,
-            status=task.status,
-            due_date=task.due_date,
-            attachments=task.attachments,
-            comments=[
-                schemas.CommentOut(
-                    id=c.id,
-                    content=c.content,
-                    timestamp=c.timestamp,
-                    user_name=c.user.name  # ✅ Explicitly include user_name
-                )
-                for c in task.comments
-            ]
-        ))
-
-    return task_outputs
+    return Response(responses.dumps(_board(db, project_id)), media_type="application/json")
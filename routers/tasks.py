@@ -10,9 +10,11 @@ from fastapi import (
     APIRouter, Depends, HTTPException,
     UploadFile, File
 )
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from database import get_db
 from auth import get_current_user
+import access
 import models, schemas
 
 router = APIRouter(tags=["Tasks"])
@@ -21,15 +23,16 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
 def _owner_guard(task_id: int, db: Session, user: models.User):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not task:
+    # Role first, in one query with the task's project: a refused caller
+    # never loads the task row
+    acc = access.for_task(db, user.id, task_id)
+    if acc is None:
         raise HTTPException(404, "Task not found")
-    project = db.query(models.Project).filter(
-        models.Project.id == task.project_id,
-        models.Project.owner_id == user.id
-    ).first()
-    if not project:
+    if not acc.is_owner:
         raise HTTPException(403, "Not authorized")
+    task = db.get(models.Task, task_id)
+    if not task:  # deleted since the lookup
+        raise HTTPException(404, "Task not found")
     return task
 
 
@@ -45,7 +48,26 @@ def update_task(
         setattr(task, field, value)
     db.commit()
     db.refresh(task)
-    return task
+    # ORM comments carry no user_name: one SELECT joining each comment's author
+    C, U = models.Comment, models.User
+    comments = db.execute(
+        select(C.id, C.content, C.timestamp, U.name)
+        .join(U, U.id == C.user_id)
+        .where(C.task_id == task.id)
+        .order_by(C.id)
+    ).all()
+    return schemas.TaskOut(
+        id=task.id,
+        title=task.title,
+        description=task.description,
+        status=task.status,
+        due_date=task.due_date,
+        attachments=task.attachments,
+        comments=[
+            schemas.CommentOut(id=id_, content=content, timestamp=timestamp, user_name=user_name)
+            for id_, content, timestamp, user_name in comments
+        ]
+    )
 
 
 @router.delete("/tasks/{task_id}")
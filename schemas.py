@@ -86,6 +86,39 @@ class TaskOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# ---------- Chat ----------
+
+class ChatMessageOut(BaseModel):
+    id: int
+    room_id: str
+    user_id: Optional[int]
+    message: str
+    ts: datetime
+
+
+# ---------- Bulk import ----------
+
+class TaskImportRow(BaseModel):
+    title: str
+    description: Optional[str] = None
+    status: Status = Status.PENDING
+    due_date: Optional[datetime] = None
+    project: Optional[str] = None  # project title; only used without a target project
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    projects_created: int = 0
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = False
+
+
 # ---------- Password & profile ----------
 
 class PasswordReset(BaseModel):
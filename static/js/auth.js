@@ -1,10 +1,20 @@
-// static/js/auth.js
-export function authFetch(url, options = {}) {
-  const token = localStorage.getItem("access_token");
-  const headers = {
-    ...(options.headers || {}),
-    Authorization: `Bearer ${token}`,
-    "Content-Type": "application/json",
-  };
-  return fetch(url, { ...options, headers });
+// static/js/auth.js – shared auth helpers for the app pages
+// Classic script (link with {{ asset_url('js/auth.js') }}); defines globals only.
+
+function getToken() {
+  return localStorage.getItem('access_token');
+}
+
+// Authorization header merged into any extra headers
+function authHeaders(extra = {}) {
+  return { ...extra, Authorization: 'Bearer ' + getToken() };
+}
+
+function authFetch(url, options = {}) {
+  return fetch(url, { ...options, headers: authHeaders(options.headers) });
+}
+
+function logout() {
+  try { localStorage.removeItem('access_token'); } catch (_) {}
+  fetch('/auth/logout', { method: 'POST' }).finally(() => { window.location.href = '/'; });
 }
@@ -0,0 +1,13 @@
+// static/js/theme.js – dark / light theme persisted in localStorage
+
+function applyTheme(isDark) {
+  document.documentElement.classList.toggle('dark', isDark);
+  localStorage.setItem('theme', isDark ? 'dark' : 'light');
+}
+
+// Saved choice, else the OS preference (or `fallbackDark` when given)
+function savedTheme(fallbackDark) {
+  const saved = localStorage.getItem('theme');
+  if (saved) return saved === 'dark';
+  return fallbackDark ?? matchMedia('(prefers-color-scheme: dark)').matches;
+}
@@ -0,0 +1,34 @@
+"""
+Shared fixtures: one app on a throwaway SQLite database for the whole run.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def client():
+    db_path = os.path.join(tempfile.mkdtemp(prefix="teamsync-tests-"), "test.db")
+    os.environ.update(USE_SQLITE="1", SQLITE_PATH=f"sqlite:///{db_path}", LOG_LEVEL="WARNING")
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def signup(client):
+    """signup(name) -> bearer headers for a new user."""
+    def _signup(name: str) -> dict:
+        r = client.post("/auth/signup", json={"name": name, "email": f"{name}@example.com",
+                                              "password": "pw"})
+        assert r.status_code == 200, r.text
+        client.cookies.clear()  # authenticate with the bearer header only
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+    return _signup
@@ -0,0 +1,21 @@
+"""
+Comment pagination: keyset windows and since_id polling.
+"""
+
+
+def test_since_id_pages_with_cursor(client, signup):
+    owner = signup("commenter")
+    pid = client.post("/projects", json={"title": "Thread"}, headers=owner).json()["id"]
+    client.post(f"/projects/{pid}/tasks", data={"title": "talk"}, headers=owner)
+    task_id = client.get(f"/projects/{pid}/tasks", headers=owner).json()[0]["id"]
+    ids = [client.post(f"/tasks/{task_id}/comments", json={"content": f"c{i}"},
+                       headers=owner).json()["id"] for i in range(3)]
+
+    r = client.get(f"/tasks/{task_id}/comments", params={"since_id": 0, "limit": 2}, headers=owner)
+    assert [c["id"] for c in r.json()] == ids[:2]
+    assert r.headers["X-Next-Since-Id"] == str(ids[1])
+
+    r = client.get(f"/tasks/{task_id}/comments",
+                   params={"since_id": r.headers["X-Next-Since-Id"], "limit": 2}, headers=owner)
+    assert [c["id"] for c in r.json()] == ids[2:]
+    assert "X-Next-Since-Id" not in r.headers
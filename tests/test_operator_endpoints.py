@@ -0,0 +1,17 @@
+"""
+Operator diagnostics need METRICS_TOKEN (when set) or a signed-in user.
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize("path", ["/ai/diagnostics", "/chat/metrics"])
+def test_operator_endpoint_requires_auth(client, signup, monkeypatch, path):
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    assert client.get(path).status_code == 401
+    user = signup("operator-" + path.strip("/").replace("/", "-"))
+    assert client.get(path, headers=user).status_code == 200
+
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+    assert client.get(path, headers=user).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer s3cret"}).status_code == 200
@@ -0,0 +1,87 @@
+"""
+Query budgets for the hot endpoints (querytrace.assert_max_queries).
+
+Runs the app on a throwaway SQLite database (tests/conftest.py):
+
+    python -m pytest tests
+"""
+
+import pytest
+
+import querytrace
+
+
+def _budget(method: str, route: str) -> int:
+    return querytrace.ROUTE_BUDGETS[(method, route)]
+
+
+@pytest.fixture(scope="module")
+def board(client, signup):
+    owner, member, outsider = (signup(n) for n in ("owner", "member", "outsider"))
+    pid = client.post("/projects", json={"title": "Board"}, headers=owner).json()["id"]
+    for i in range(5):
+        client.post(f"/projects/{pid}/tasks", data={"title": f"task {i}"}, headers=owner)
+    tasks = client.get(f"/projects/{pid}/tasks", headers=owner).json()
+    member_id = client.get("/users/me", headers=member).json()["id"]
+    r = client.post(f"/projects/{pid}/members", json={"user_id": member_id, "role": "member"},
+                    headers=owner)
+    assert r.status_code < 300, r.text
+    # Comments by two authors, resolved in the same query as the comments
+    r = client.post(f"/tasks/{tasks[0]['id']}/comments", json={"content": "hi"}, headers=owner)
+    assert r.status_code == 200, r.text
+    import models
+    from database import SessionLocal
+    with SessionLocal() as db:  # only owners comment through the API
+        db.add(models.Comment(content="hello", task_id=tasks[0]["id"], user_id=member_id))
+        db.commit()
+    return {"project_id": pid, "task_id": tasks[0]["id"], "member_id": member_id,
+            "owner": owner, "member": member, "outsider": outsider}
+
+
+def test_project_analytics_budget(client, board):
+    for who in ("owner", "member"):
+        # user, role lookup, one GROUP BY – no member list, no per-status queries
+        with querytrace.assert_max_queries(_budget("GET", "/projects/{project_id}/analytics"),
+                                           allow_repeats=False):
+            r = client.get(f"/projects/{board['project_id']}/analytics", headers=board[who])
+        assert r.status_code == 200
+        assert r.json()["pending"] == 5
+
+
+def test_update_member_budget(client, board):
+    # user, membership joined with its user, UPDATE – no re-query of the user
+    with querytrace.assert_max_queries(_budget("PUT", "/projects/{project_id}/members/{user_id}"),
+                                       allow_repeats=False):
+        r = client.put(f"/projects/{board['project_id']}/members/{board['member_id']}",
+                       json={"role": "editor"}, headers=board["owner"])
+    assert r.status_code == 200
+    assert r.json()["role"] == "editor"
+
+
+def test_patch_task_budget(client, board):
+    # user, role lookup via the task, task, UPDATE, reload, attachments, comments
+    with querytrace.assert_max_queries(_budget("PATCH", "/tasks/{task_id}"), allow_repeats=False):
+        r = client.patch(f"/tasks/{board['task_id']}", json={"title": "renamed"},
+                         headers=board["owner"])
+    assert r.status_code == 200
+    assert r.json()["title"] == "renamed"
+    assert [c["user_name"] for c in r.json()["comments"]] == ["owner", "member"]
+
+
+def test_patch_task_denied_budget(client, board):
+    # user, role lookup via the task – refused without loading the task
+    with querytrace.assert_max_queries(2):
+        r = client.patch(f"/tasks/{board['task_id']}", json={"title": "nope"},
+                         headers=board["outsider"])
+    assert r.status_code == 403  # the task exists; the outsider may not change it
+
+
+def test_patch_missing_task(client, board):
+    r = client.patch("/tasks/999999", json={"title": "nope"}, headers=board["owner"])
+    assert r.status_code == 404
+
+
+def test_budget_overrun_fails(client, board):
+    with pytest.raises(querytrace.QueryBudgetExceeded):
+        with querytrace.assert_max_queries(1):
+            client.get(f"/projects/{board['project_id']}/analytics", headers=board["owner"])